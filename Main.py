@@ -2,6 +2,7 @@
 import asyncio
 from detect_platform_and_structure import detect_platform
 from modules import Universal_web_scraper
+from utils.browser_pool import browser_pool
 
 async def handle_scrape():
     url = input("Enter any real estate site URL: ").strip()
@@ -11,13 +12,17 @@ async def handle_scrape():
     platform = detect_platform(url)
     print(f"Platform detected: {platform}")
 
-    if platform == "universal":
-        await Universal_web_scraper.run(url, city, mode)
-    else:
-        use_ids = input("Unknown or unsupported platform. Use fallback Instant Data mode? (y/n): ").strip().lower()
-        if use_ids == 'y':
-            from strategies.instant_like_scraper import run_ids_mode
-            await run_ids_mode(url)
+    try:
+        if platform == "universal":
+            await Universal_web_scraper.run(url, city, mode)
+        else:
+            use_ids = input("Unknown or unsupported platform. Use fallback Instant Data mode? (y/n): ").strip().lower()
+            if use_ids == 'y':
+                from strategies.instant_like_scraper import run_ids_mode
+                await run_ids_mode(url)
+    finally:
+        # the scrapers borrow browsers from the shared pool; close them before the loop ends
+        await browser_pool.stop()
 
 if __name__ == "__main__":
     asyncio.run(handle_scrape())
@@ -1,33 +1,32 @@
 from fastapi import FastAPI, Request, HTTPException, Body
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
 from pydantic import BaseModel
 import asyncio
+import logging
 import os
-import time
-import json
 import uuid
-from pathlib import Path
-from typing import Optional
 
 # your scraper entry point (keep as-is)
 from modules.Universal_web_scraper import run as universal_scraper_run
-
-# subscription guard (file-based)
+from utils.browser_pool import browser_pool
+from utils.extract_pool import start_extract_pool, stop_extract_pool
+from app.auth import extract_username_from_request
+from app import jobs, history, downloads, status_tracker, metrics
+from app.history import record_history_entry, history_compaction_loop
+from utils.progress import snapshot_loop, STATUS_SNAPSHOT_INTERVAL
+from app.jobs import job_queue
+
+# subscription guard (SQLite quota ledger)
 from app.subscription_guard import (
     ensure_user,
     get_user_record,
-    can_consume,
-    consume_quota,
-    _load_users,
-    _save_users,
+    reserve_quota,
+    renew_reservation,
+    release_quota,
+    set_user_tier,
     DEFAULTS
 )
 
-# Files at repo root
-USERS_FILE = Path("users.json")
-HISTORY_FILE = Path("history.json")
-
 app = FastAPI()
 
 # CORS middleware (for extension)
@@ -39,53 +38,107 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.include_router(jobs.router)
+app.include_router(history.router)
+app.include_router(downloads.router)
+app.include_router(status_tracker.router)
+app.include_router(metrics.router)
+
+# Shared browser pool lives as long as the app
+@app.on_event("startup")
+async def start_browser_pool():
+    try:
+        await browser_pool.start()
+    except Exception as e:
+        # browsers will be launched lazily on first use instead
+        logging.warning(f"Browser pool pre-warm failed: {e}")
+
+
+@app.on_event("shutdown")
+async def stop_browser_pool():
+    await browser_pool.stop()
+
+
+# HTML parsing runs in worker processes so it never stalls the API
+@app.on_event("startup")
+async def start_extraction_pool():
+    start_extract_pool()
+
+
+@app.on_event("shutdown")
+async def stop_extraction_pool():
+    stop_extract_pool()
+
+
+# Scrape jobs run in the background; quota and history are settled on completion
+@app.on_event("startup")
+async def start_job_queue():
+    job_queue.configure(universal_scraper_run, on_start=start_scrape_job, on_finish=finish_scrape_job)
+    await job_queue.start()
+
+
+@app.on_event("shutdown")
+async def stop_job_queue():
+    await job_queue.stop()
+    # background loops started below; cancel them so shutdown does not leave pending tasks
+    for name in ("history_compaction", "status_snapshots"):
+        task = getattr(app.state, name, None)
+        if task:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+
+@app.on_event("startup")
+async def start_history_compaction():
+    app.state.history_compaction = asyncio.create_task(history_compaction_loop())
+
+
+# Optional copy of the progress registry on disk (SCOUTAI_STATUS_SNAPSHOT seconds)
+@app.on_event("startup")
+async def start_status_snapshots():
+    if STATUS_SNAPSHOT_INTERVAL > 0:
+        app.state.status_snapshots = asyncio.create_task(snapshot_loop())
+
+
 class ScrapeRequest(BaseModel):
     url: str
     city: str = "none"
     mode: str = "none"
 
 
-def extract_username_from_request(request: Request) -> Optional[str]:
+def start_scrape_job(job) -> None:
     """
-    Accept 'Authorization: Bearer <username>' or 'X-User' header.
-    Temporary simple auth until OAuth is added.
+    Start hook for the job queue: the quota reservation was taken when the job
+    was queued, so restart its expiry clock now that the scrape actually runs.
     """
-    auth = request.headers.get("authorization")
-    if auth and auth.lower().startswith("bearer "):
-        return auth.split(None, 1)[1].strip()
-    return request.headers.get("x-user")
+    if not renew_reservation(job.id):
+        logging.warning(f"Quota reservation for job {job.id} expired while it was queued")
 
 
-def record_history_entry(username: str, url: str, city: str, mode: str,
-                         status: str, rows: int = 0, output_file: Optional[str] = None,
-                         notes: str = "") -> dict:
+def finish_scrape_job(job) -> None:
     """
-    Append a history entry to history.json (latest first).
+    Completion hook for the job queue: settle the quota reservation and log history.
+    Only successful scrapes are charged.
     """
-    entry = {
-        "id": str(uuid.uuid4()),
-        "user": username,
-        "url": url,
-        "city": city,
-        "mode": mode,
-        "timestamp": int(time.time()),
-        "status": status,
-        "rows": rows,
-        "output_file": output_file,
-        "notes": notes
-    }
-    if not HISTORY_FILE.exists():
-        HISTORY_FILE.write_text("[]")
-    arr = json.loads(HISTORY_FILE.read_text())
-    arr.insert(0, entry)
-    HISTORY_FILE.write_text(json.dumps(arr, indent=2))
-    return entry
+    try:
+        release_quota(job.id, consumed=job.state == "finished")
+    except Exception as e:
+        # don't block completion if saving quota fails
+        logging.error(f"Failed to settle quota for job {job.id}: {e}")
+
+    if job.state != "finished":
+        record_history_entry(job.user, job.url, job.city, job.mode, "failure", rows=0, output_file=None, notes=job.error or "",
+                             timings=job.timings)
+        return
+    record_history_entry(job.user, job.url, job.city, job.mode, "success", rows=job.rows, output_file=job.output_file,
+                             timings=job.timings)
 
 
-@app.post("/scrape")
+@app.post("/scrape", status_code=202)
 async def trigger_scrape(req: ScrapeRequest, request: Request):
     """
-    Main scrape endpoint with quota enforcement and history logging.
+    Main scrape endpoint with quota enforcement. The scrape is queued and a job ID
+    is returned immediately; poll GET /jobs/{job_id} for progress.
     Client must provide Authorization: Bearer <github-username> (or X-User).
     """
     username = extract_username_from_request(request)
@@ -93,46 +146,26 @@ async def trigger_scrape(req: ScrapeRequest, request: Request):
         raise HTTPException(status_code=401, detail="Missing user token/header. Provide Authorization: Bearer <github-username>")
 
     # ensure user exists (auto-create as free)
-    rec = get_user_record(username)
+    # the ledger lives in SQLite; keep its calls off the event loop
+    rec = await asyncio.to_thread(get_user_record, username)
     if not rec:
-        ensure_user(username, tier="free")
-        rec = get_user_record(username)
+        await asyncio.to_thread(ensure_user, username, "free")
 
-    # quota check
-    if not can_consume(username):
+    # atomic quota check: hold one unit until the job finishes
+    job_id = str(uuid.uuid4())
+    if not await asyncio.to_thread(reserve_quota, username, job_id):
         raise HTTPException(status_code=403, detail="Monthly scrape quota exceeded. Sponsor: https://github.com/sponsors/akash8860")
 
-    # run the scraper
     try:
-        # If your universal_scraper_run is synchronous, you can run it in a thread:
-        # loop = asyncio.get_event_loop()
-        # result = await loop.run_in_executor(None, universal_scraper_run, req.url, req.city, req.mode)
-        await universal_scraper_run(req.url, req.city, req.mode)
-        status = "success"
-        # optionally compute rows/output_file if your scraper returns them or writes a file
-        output_file = None
-        rows = 0
-    except Exception as e:
-        # record failed history
-        record_history_entry(username, req.url, req.city, req.mode, "failure", rows=0, output_file=None, notes=str(e))
-        raise HTTPException(status_code=500, detail=f"Scrape failed: {str(e)}")
-
-    # on success consume quota and record history
-    try:
-        consume_quota(username, 1)
-    except Exception:
-        # don't block success if saving quota fails; consider logging
-        pass
-
-    # If your scraper produced a named output file, set output_file accordingly.
-    # Here we keep the existing behaviour: static path example (adjust as needed)
-    # e.g., output_file = f"output/{username}_{int(time.time())}.xlsx"
-    # rows = <number of rows extracted>  # if available from your scraper
-    record_history_entry(username, req.url, req.city, req.mode, "success", rows=rows, output_file=output_file)
+        job = job_queue.submit(username, req.url, req.city, req.mode, job_id=job_id)
+    except asyncio.QueueFull:
+        await asyncio.to_thread(release_quota, job_id)
+        raise HTTPException(status_code=503, detail="Scrape queue is full. Please retry shortly.")
 
     return {
-        "status": "scraping_finished",
-        "details": f"Scraping done: {req.url}, City: {req.city}, Mode: {req.mode}"
+        "status": "queued",
+        "job_id": job.id,
+        "details": f"Scrape queued: {req.url}, City: {req.city}, Mode: {req.mode}"
     }
 
 
@@ -159,23 +192,6 @@ async def get_quota(request: Request):
     }
 
 
-@app.get("/history")
-async def get_history(request: Request, limit: int = 50):
-    """
-    Return recent history entries for the authenticated user.
-    """
-    username = extract_username_from_request(request)
-    if not username:
-        raise HTTPException(status_code=401, detail="Missing user token/header")
-
-    if not HISTORY_FILE.exists():
-        return []
-
-    all_entries = json.loads(HISTORY_FILE.read_text())
-    user_entries = [e for e in all_entries if e.get("user") == username]
-    return user_entries[:limit]
-
-
 # Admin endpoint to set a user's tier manually (protected by ADMIN_TOKEN)
 ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "change-me")  # set a secure token in production
 
@@ -193,30 +209,10 @@ async def admin_set_tier(admin_token: str = Body(...), username: str = Body(...)
         raise HTTPException(status_code=400, detail=f"Unknown tier: {tier}. Valid: {list(DEFAULTS.keys())}")
 
     # create or update user
-    users = _load_users()
-    users[username] = {
-        "tier": tier,
-        "monthly_quota": DEFAULTS.get(tier, DEFAULTS["free"]),
-        "used": users.get(username, {}).get("used", 0),
-        "last_reset": int(time.time())
-    }
-    _save_users(users)
+    set_user_tier(username, tier)
     return {"ok": True, "username": username, "tier": tier}
 
 
-# Excel download route (keep your existing behavior)
-@app.get("/download")
-def download_file():
-    file_path = "output/Delhi_buy_paginated.xlsx"
-    if not Path(file_path).exists():
-        raise HTTPException(status_code=404, detail="File not found")
-    return FileResponse(
-        path=file_path,
-        filename="Delhi_buy_paginated.xlsx",
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-    )
-
-
 if __name__ == "__main__":
     import uvicorn
     # Run as app.api_server if this file is in app/ folder
@@ -1,17 +1,26 @@
+import asyncio
+import logging
+import uuid
 from fastapi import FastAPI, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.sessions import SessionMiddleware
-from fastapi.responses import FileResponse
 from pydantic import BaseModel
 from modules.Universal_web_scraper import run as universal_scraper_run
-from app import users, batch_upload, history, status_tracker
+from utils.browser_pool import browser_pool
+from utils.extract_pool import start_extract_pool, stop_extract_pool
+from app import users, batch_upload, history, status_tracker, jobs, downloads, metrics
+from app.auth import extract_username_from_request
+from app.jobs import job_queue
+from app.history import record_history_entry, history_compaction_loop
+from utils.progress import snapshot_loop, STATUS_SNAPSHOT_INTERVAL
 
 # subscription guard (new)
 from app.subscription_guard import (
     ensure_user,
     get_user_record,
-    can_consume,
-    consume_quota,
+    reserve_quota,
+    renew_reservation,
+    release_quota,
 )
 
 app = FastAPI()
@@ -33,6 +42,35 @@ app.include_router(users.router)
 app.include_router(batch_upload.router)
 app.include_router(history.router)
 app.include_router(status_tracker.router)
+app.include_router(jobs.router)
+app.include_router(downloads.router)
+app.include_router(metrics.router)
+
+# Shared browser pool lives as long as the app
+@app.on_event("startup")
+async def start_browser_pool():
+    try:
+        await browser_pool.start()
+    except Exception as e:
+        # browsers will be launched lazily on first use instead
+        logging.warning(f"Browser pool pre-warm failed: {e}")
+
+
+@app.on_event("shutdown")
+async def stop_browser_pool():
+    await browser_pool.stop()
+
+
+# HTML parsing runs in worker processes so it never stalls the API
+@app.on_event("startup")
+async def start_extraction_pool():
+    start_extract_pool()
+
+
+@app.on_event("shutdown")
+async def stop_extraction_pool():
+    stop_extract_pool()
+
 
 # Scrape trigger
 class ScrapeRequest(BaseModel):
@@ -41,22 +79,65 @@ class ScrapeRequest(BaseModel):
     mode: str = "none"
 
 
-def extract_username_from_request(request: Request) -> str:
+def start_scrape_job(job) -> None:
     """
-    Minimal extraction method:
-    1) Authorization: Bearer <username>
-    2) X-User: <username>
-    Temporarily we treat the provided value as the GitHub username / identifier.
-    Replace with OAuth later.
+    Start hook for the job queue: the quota reservation was taken when the job
+    was queued, so restart its expiry clock now that the scrape actually runs.
     """
-    auth = request.headers.get("authorization")
-    if auth and auth.lower().startswith("bearer "):
-        # 'Bearer username' or 'Bearer token' (we use username for now)
-        return auth.split(None, 1)[1].strip()
-    return request.headers.get("x-user")
+    if not renew_reservation(job.id):
+        logging.warning(f"Quota reservation for job {job.id} expired while it was queued")
+
+
+def finish_scrape_job(job) -> None:
+    """
+    Completion hook for the job queue: settle the quota reservation and log history.
+    Only successful scrapes consume quota.
+    """
+    try:
+        release_quota(job.id, consumed=job.state == "finished")
+    except Exception as e:
+        # don't block completion if saving quota fails
+        logging.error(f"Failed to settle quota for job {job.id}: {e}")
+
+    if job.state != "finished":
+        record_history_entry(job.user, job.url, job.city, job.mode, "failure", rows=0, output_file=None, notes=job.error or "",
+                             timings=job.timings)
+    else:
+        record_history_entry(job.user, job.url, job.city, job.mode, "success", rows=job.rows, output_file=job.output_file,
+                             timings=job.timings)
+
+
+# Scrape jobs run in the background and are charged when they finish
+@app.on_event("startup")
+async def start_job_queue():
+    job_queue.configure(universal_scraper_run, on_start=start_scrape_job, on_finish=finish_scrape_job)
+    await job_queue.start()
+
+
+@app.on_event("shutdown")
+async def stop_job_queue():
+    await job_queue.stop()
+    # background loops started below; cancel them so shutdown does not leave pending tasks
+    for name in ("history_compaction", "status_snapshots"):
+        task = getattr(app.state, name, None)
+        if task:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+
+@app.on_event("startup")
+async def start_history_compaction():
+    app.state.history_compaction = asyncio.create_task(history_compaction_loop())
 
 
-@app.post("/scrape")
+# Optional copy of the progress registry on disk (SCOUTAI_STATUS_SNAPSHOT seconds)
+@app.on_event("startup")
+async def start_status_snapshots():
+    if STATUS_SNAPSHOT_INTERVAL > 0:
+        app.state.status_snapshots = asyncio.create_task(snapshot_loop())
+
+
+@app.post("/scrape", status_code=202)
 async def trigger_scrape(req: ScrapeRequest, request: Request = None):
     """
     Enforces monthly quota per user. Client must provide:
@@ -65,8 +146,9 @@ async def trigger_scrape(req: ScrapeRequest, request: Request = None):
       X-User: <github-username>
 
     Behavior:
-    - If user not present in users.json, create with 'free' tier automatically.
-    - If quota exceeded -> 403 with sponsor link message.
+    - If user not present in the quota ledger, create with 'free' tier automatically.
+    - If quota exceeded (counting jobs still queued) -> 403 with sponsor link message.
+    - The scrape is queued and a job ID is returned immediately; poll GET /jobs/{job_id}.
     - On successful scrape, decrement quota by 1.
     """
     # extract username
@@ -82,50 +164,33 @@ async def trigger_scrape(req: ScrapeRequest, request: Request = None):
         )
 
     # ensure user exists (auto-create as free). Change behavior if you want to deny unknowns.
-    rec = get_user_record(username)
+    # the ledger lives in SQLite; keep its calls off the event loop
+    rec = await asyncio.to_thread(get_user_record, username)
     if not rec:
-        ensure_user(username, tier="free")
-        rec = get_user_record(username)
+        await asyncio.to_thread(ensure_user, username, "free")
 
-    # quota enforcement
-    if not can_consume(username):
+    # quota enforcement: atomically reserve one unit until the job finishes
+    job_id = str(uuid.uuid4())
+    if not await asyncio.to_thread(reserve_quota, username, job_id):
         raise HTTPException(
             status_code=403,
             detail="Monthly scrape quota exceeded. Consider sponsoring ScoutAI: https://github.com/sponsors/akash8860"
         )
 
-    # run scraper; only consume quota if scrape succeeds
+    # queue the scrape; quota is only consumed once the job succeeds
     try:
-        # keep using the same call you already had
-        await universal_scraper_run(req.url, req.city, req.mode)
-    except Exception as e:
-        # don't consume quota on failure; return error for client
-        raise HTTPException(status_code=500, detail=f"Scrape failed: {str(e)}")
-
-    # on success, decrement quota
-    try:
-        consume_quota(username, 1)
-    except Exception:
-        # don't block response if saving quota fails; you may want to log this
-        pass
+        job = job_queue.submit(username, req.url, req.city, req.mode, job_id=job_id)
+    except asyncio.QueueFull:
+        await asyncio.to_thread(release_quota, job_id)
+        raise HTTPException(status_code=503, detail="Scrape queue is full. Please retry shortly.")
 
     return {
-        "status": "scraping_finished",
-        "details": f"Scraping done: {req.url}, City: {req.city}, Mode: {req.mode}"
+        "status": "queued",
+        "job_id": job.id,
+        "details": f"Scrape queued: {req.url}, City: {req.city}, Mode: {req.mode}"
     }
 
 
-# Excel download endpoint
-@app.get("/download")
-def download_file():
-    file_path = "output/Delhi_buy_paginated.xlsx"
-    return FileResponse(
-        path=file_path,
-        filename="Delhi_buy_paginated.xlsx",
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-    )
-
-
 # Run server
 if __name__ == "__main__":
     import uvicorn
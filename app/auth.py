@@ -0,0 +1,13 @@
+from typing import Optional
+from fastapi import Request
+
+
+def extract_username_from_request(request: Request) -> Optional[str]:
+    """
+    Accept 'Authorization: Bearer <username>' or 'X-User' header.
+    Temporary simple auth until OAuth is added.
+    """
+    auth = request.headers.get("authorization")
+    if auth and auth.lower().startswith("bearer "):
+        return auth.split(None, 1)[1].strip()
+    return request.headers.get("x-user")
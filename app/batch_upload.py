@@ -1,16 +1,274 @@
-from fastapi import UploadFile, File, APIRouter
-import pandas as pd
+from fastapi import UploadFile, File, APIRouter, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
 from modules.Universal_web_scraper import run as universal_scraper_run
+from app.auth import extract_username_from_request
+from app.history import record_history_entry
+from app.subscription_guard import ensure_user, get_user_record, reserve_quota, release_quota
+from utils.resource_blocker import NetworkStats, current_network_stats, log_network_stats
+from utils.sinks import current_job_id
+from utils.progress import current_progress, progress_registry
+from urllib.parse import urlparse
 import asyncio
+import codecs
+import csv
+import json
+import logging
+import os
+import time
+import uuid
+import weakref
 
 router = APIRouter()
 
+# Configuration (override through environment variables)
+BATCH_CONCURRENCY = int(os.getenv("SCOUTAI_BATCH_CONCURRENCY", "4"))     # URLs scraped at once across all batches
+PER_DOMAIN_CONCURRENCY = int(os.getenv("SCOUTAI_PER_DOMAIN_CONCURRENCY", "1"))  # URLs scraped at once per domain, across all batches
+FINISHED_BATCH_TTL = 60 * 60 * 24  # Keep finished batches queryable for a day
+MAX_FINISHED_BATCHES = int(os.getenv("SCOUTAI_MAX_FINISHED_BATCHES", "200"))  # ...but never more than this many
+
+BATCHES = {}
+_BATCH_TASKS = set()  # keep references so running batches are not garbage collected
+
+# Limits are shared by every batch in the process, so concurrent uploads
+# cannot multiply the load on the browser pool or on a single site
+_global_slots = asyncio.Semaphore(BATCH_CONCURRENCY)
+_domain_slots = weakref.WeakValueDictionary()  # dropped once no batch scrapes the domain
+
+def _domain_slot(domain):
+    slot = _domain_slots.get(domain)
+    if slot is None:
+        slot = _domain_slots[domain] = asyncio.Semaphore(PER_DOMAIN_CONCURRENCY)
+    return slot
+
+
+# ========== Streaming readers ==========
+
+def _iter_xlsx(fileobj):
+    from openpyxl import load_workbook
+    wb = load_workbook(fileobj, read_only=True, data_only=True)
+    try:
+        rows = wb.active.iter_rows(values_only=True)
+        header = [str(h).strip().lower() if h is not None else "" for h in next(rows, [])]
+        for values in rows:
+            yield dict(zip(header, values))
+    finally:
+        wb.close()
+
+def _iter_csv(fileobj):
+    reader = csv.DictReader(codecs.iterdecode(fileobj, "utf-8-sig"))
+    for row in reader:
+        yield {str(k).strip().lower(): v for k, v in row.items() if k is not None}
+
+def _iter_jsonl(fileobj):
+    for line in codecs.iterdecode(fileobj, "utf-8"):
+        line = line.strip()
+        if line:
+            yield {str(k).strip().lower(): v for k, v in json.loads(line).items()}
+
+def iter_upload_rows(fileobj, filename):
+    """
+    Yields one dict per input row without loading the whole upload in memory.
+    Format is picked from the file extension (xlsx, csv, jsonl).
+    """
+    ext = os.path.splitext(filename or "")[1].lower()
+    if ext == ".csv":
+        return _iter_csv(fileobj)
+    if ext in (".jsonl", ".ndjson"):
+        return _iter_jsonl(fileobj)
+    return _iter_xlsx(fileobj)
+
+def _clean(value, default="none"):
+    if value is None:
+        return default
+    value = str(value).strip()
+    return value or default
+
+def read_batch_items(fileobj, filename):
+    """
+    Streams the upload and returns (items, duplicates): one item per unique URL.
+    """
+    items, seen, duplicates = [], set(), 0
+    for row in iter_upload_rows(fileobj, filename):
+        url = _clean(row.get("url"), default="")
+        if not url:
+            continue
+        if url in seen:
+            duplicates += 1
+            continue
+        seen.add(url)
+        items.append({
+            "url": url,
+            "city": _clean(row.get("city")),
+            "mode": _clean(row.get("mode")),
+            "domain": urlparse(url).netloc.lower(),
+            "job_id": None,     # Set when the batch starts; names the item's output directory
+            "state": "queued",  # queued -> running -> finished / failed
+            "rows": 0,
+            "duplicates": 0,
+            "output_file": None,
+            "error": None,
+        })
+    return items, duplicates
+
+
+# ========== Batch runner ==========
+
+def _settle_item(batch, item):
+    """
+    Settles the item's quota reservation and logs it to the owner's history,
+    like finish_scrape_job does for single scrapes.
+    """
+    try:
+        release_quota(item["job_id"], consumed=item["state"] == "finished")
+    except Exception as e:
+        logging.error(f"Failed to settle quota for batch item {item['job_id']}: {e}")
+
+    if item["state"] != "finished":
+        record_history_entry(batch["user"], item["url"], item["city"], item["mode"], "failure", rows=0, output_file=None,
+                             notes=item["error"] or "")
+    else:
+        record_history_entry(batch["user"], item["url"], item["city"], item["mode"], "success", rows=item["rows"],
+                             output_file=item["output_file"])
+
+async def _scrape_item(batch, item):
+    domain_slot = _domain_slot(item["domain"])
+    async with domain_slot, _global_slots:
+        # Each item is charged like a single scrape: reserved when it starts,
+        # consumed only if it succeeds
+        if not await asyncio.to_thread(reserve_quota, batch["user"], item["job_id"]):
+            item["error"] = "Monthly scrape quota exceeded"
+            item["state"] = "failed"
+            return
+        item["state"] = "running"
+        # Each item writes to its own job directory, so items with the same
+        # city and mode neither overwrite nor interleave each other's rows
+        job_token = current_job_id.set(item["job_id"])
+        try:
+            result = await universal_scraper_run(item["url"], item["city"], item["mode"]) or {}
+            item["rows"] = result.get("rows", 0)
+            item["duplicates"] = result.get("duplicates", 0)
+            item["output_file"] = result.get("output_file")
+            item["state"] = "finished"
+        except Exception as e:
+            logging.error(f"Batch {batch['id']} failed on {item['url']}: {e}")
+            batch["progress"].error(f"{item['url']}: {e}")
+            item["error"] = str(e)
+            item["state"] = "failed"
+        finally:
+            current_job_id.reset(job_token)
+        try:
+            await asyncio.to_thread(_settle_item, batch, item)
+        except Exception as e:
+            logging.error(f"Failed to record batch item {item['job_id']}: {e}")
+
+async def _domain_worker(batch, pending):
+    while pending:
+        await _scrape_item(batch, pending.pop(0))
+
+async def run_batch(batch):
+    """
+    Runs every item of the batch, grouped by domain. Each domain is scraped by
+    at most PER_DOMAIN_CONCURRENCY items and the process by BATCH_CONCURRENCY,
+    whichever batches the items belong to.
+    """
+    current_network_stats.set(batch["network"])  # inherited by the worker tasks below
+    current_progress.set(batch["progress"])  # pages of every item count into the batch
+    batch["progress"].set_state("running")
+    by_domain = {}
+    for index, item in enumerate(batch["items"], start=1):
+        item["job_id"] = f"{batch['id']}-{index}"
+        by_domain.setdefault(item["domain"], []).append(item)
+
+    workers = []
+    for pending in by_domain.values():
+        for _ in range(min(PER_DOMAIN_CONCURRENCY, len(pending))):
+            workers.append(_domain_worker(batch, pending))
+    await asyncio.gather(*workers)
+
+    batch["state"] = "finished"
+    batch["finished_at"] = int(time.time())
+    batch["progress"].set_state("finished")
+    logging.info(f"Batch {batch['id']} finished ({len(batch['items'])} URLs)")
+    log_network_stats(f"Batch {batch['id']}", batch["network"])
+
+def prune_batches():
+    """
+    Forgets finished batches older than FINISHED_BATCH_TTL, and the oldest
+    ones beyond MAX_FINISHED_BATCHES, so a long-running server stays bounded.
+    """
+    cutoff = int(time.time()) - FINISHED_BATCH_TTL
+    finished = sorted((b for b in BATCHES.values() if b["state"] == "finished"), key=lambda b: b["finished_at"])
+    excess = max(0, len(finished) - MAX_FINISHED_BATCHES)
+    for i, batch in enumerate(finished):
+        if i < excess or batch["finished_at"] < cutoff:
+            del BATCHES[batch["id"]]
+            progress_registry.discard(batch["id"])
+
+def batch_summary(batch, include_items=True):
+    counts = {"queued": 0, "running": 0, "finished": 0, "failed": 0}
+    for item in batch["items"]:
+        counts[item["state"]] += 1
+    summary = {
+        "batch_id": batch["id"],
+        "state": batch["state"],
+        "total": len(batch["items"]),
+        "duplicates": batch["duplicates"],
+        "created_at": batch["created_at"],
+        "finished_at": batch["finished_at"],
+        "network": batch["network"].to_dict(),
+        "progress": batch["progress"].to_dict(),
+        **counts,
+    }
+    if include_items:
+        summary["items"] = [{k: v for k, v in item.items() if k != "domain"} for item in batch["items"]]
+    return summary
+
+
+# ========== Routes ==========
+
 @router.post("/upload_excel")
-async def upload_excel(file: UploadFile = File(...)):
-    df = pd.read_excel(file.file)
-    for row in df.to_dict(orient="records"):
-        url = row.get("url")
-        city = row.get("city", "none")
-        mode = row.get("mode", "none")
-        await universal_scraper_run(url, city, mode)
-    return {"status": "batch_scraping_done"}
+async def upload_excel(request: Request, file: UploadFile = File(...)):
+    """
+    Accepts an XLSX, CSV or JSONL upload with url/city/mode columns and starts
+    a concurrent batch. Returns a batch ID; poll GET /batches/{batch_id}.
+    Every URL counts against the uploader's monthly quota.
+    """
+    username = extract_username_from_request(request)
+    if not username:
+        raise HTTPException(status_code=401, detail="Missing user token/header")
+    if not await asyncio.to_thread(get_user_record, username):
+        await asyncio.to_thread(ensure_user, username, "free")
+
+    try:
+        items, duplicates = await run_in_threadpool(read_batch_items, file.file, file.filename)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Could not read upload: {e}")
+
+    prune_batches()
+    batch = {
+        "id": str(uuid.uuid4()),
+        "user": username,
+        "state": "running",
+        "items": items,
+        "duplicates": duplicates,
+        "created_at": int(time.time()),
+        "finished_at": None,
+        "network": NetworkStats(),
+    }
+    batch["progress"] = progress_registry.track(batch["id"], username, network=batch["network"])
+    BATCHES[batch["id"]] = batch
+    task = asyncio.create_task(run_batch(batch))
+    _BATCH_TASKS.add(task)
+    task.add_done_callback(_BATCH_TASKS.discard)
+    return {"status": "batch_queued", **batch_summary(batch, include_items=False)}
+
+@router.get("/batches/{batch_id}")
+async def get_batch(batch_id: str, request: Request):
+    username = extract_username_from_request(request)
+    if not username:
+        raise HTTPException(status_code=401, detail="Missing user token/header")
+
+    batch = BATCHES.get(batch_id)
+    if not batch or batch["user"] != username:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return batch_summary(batch)
@@ -0,0 +1,207 @@
+import asyncio
+import importlib.util
+import os
+import re
+import uuid
+import zlib
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from app.auth import extract_username_from_request
+from app.history import find_job_output
+from app.jobs import job_queue
+from utils.sinks import export_rows, output_format
+
+router = APIRouter()
+
+# Configuration (override through environment variables)
+DOWNLOAD_FORMAT = os.getenv("SCOUTAI_DOWNLOAD_FORMAT", "xlsx")  # Used when neither ?format= nor Accept picks one
+CHUNK_SIZE = 64 * 1024
+GZIP_LEVEL = 6
+
+MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "jsonl": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+ACCEPT_ALIASES = {
+    "text/csv": "csv",
+    "application/x-ndjson": "jsonl",
+    "application/jsonl": "jsonl",
+    "application/json-lines": "jsonl",
+    "application/vnd.apache.parquet": "parquet",
+    "application/x-parquet": "parquet",
+    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet": "xlsx",
+}
+TEXT_FORMATS = {"csv", "jsonl"}  # Worth compressing on the wire
+OPTIONAL_FORMATS = {"parquet": "pyarrow"}  # Offered only when the module is installed
+RANGE = re.compile(r"bytes=(\d*)-(\d*)")
+
+
+def format_available(fmt: str) -> bool:
+    module = OPTIONAL_FORMATS.get(fmt)
+    return module is None or importlib.util.find_spec(module) is not None
+
+def _unavailable(fmt: str) -> HTTPException:
+    return HTTPException(status_code=406, detail=f"{fmt} downloads need {OPTIONAL_FORMATS[fmt]} on the server. "
+                                                f"Choose one of {[f for f in MEDIA_TYPES if format_available(f)]}")
+
+def negotiate_format(requested: Optional[str], accept: Optional[str]) -> str:
+    """
+    ?format= wins; otherwise the Accept entry with the highest q that names a
+    known format; otherwise DOWNLOAD_FORMAT. Formats whose optional
+    dependency is missing are refused with 406.
+    """
+    if requested:
+        fmt = requested.lower()
+        if fmt not in MEDIA_TYPES:
+            raise HTTPException(status_code=400, detail=f"Unknown format: {requested}. Choose one of {list(MEDIA_TYPES)}")
+        if not format_available(fmt):
+            raise _unavailable(fmt)
+        return fmt
+    candidates = []
+    for i, part in enumerate((accept or "").split(",")):
+        media, _, params = part.strip().partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if media.lower() in ACCEPT_ALIASES and q > 0:
+            candidates.append((-q, i, ACCEPT_ALIASES[media.lower()]))
+    usable = [c for c in candidates if format_available(c[2])]
+    if candidates and not usable:
+        raise _unavailable(min(candidates)[2])
+    return min(usable)[2] if usable else DOWNLOAD_FORMAT
+
+def _job_output(username: str, job_id: str) -> str:
+    job = job_queue.get(job_id)
+    if job is not None:
+        if job.user != username:
+            raise HTTPException(status_code=404, detail="Job not found")
+        if not job.done:
+            raise HTTPException(status_code=409, detail=f"Job is still {job.state}")
+        source = job.output_file if job.state == "finished" else None
+    else:
+        source = find_job_output(username, job_id)
+    if not source or not os.path.exists(source):
+        raise HTTPException(status_code=404, detail="Job has no output to download")
+    return source
+
+def _modified(path: str) -> float:
+    # A segments directory changes when its manifest does
+    manifest = os.path.join(path, "manifest.json")
+    return os.path.getmtime(manifest if os.path.isdir(path) and os.path.exists(manifest) else path)
+
+async def materialize(source: str, fmt: str) -> str:
+    """
+    The job output as a file in `fmt`: the stored file itself when it already
+    is one, else an export next to it, produced once and reused while it is
+    newer than the source.
+    """
+    if output_format(source) == fmt:
+        return source
+    dest = os.path.splitext(source.rstrip(os.sep))[0] + f".{fmt}"
+    if os.path.exists(dest) and os.path.getmtime(dest) >= _modified(source):
+        return dest
+    # Concurrent requests export to their own temporary file; the last rename wins
+    tmp = f"{dest}.{uuid.uuid4().hex}.tmp"
+    try:
+        await asyncio.to_thread(export_rows, source, tmp, fmt)
+        os.replace(tmp, dest)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return dest
+
+def _parse_range(header: str, size: int):
+    """
+    (start, end) of a single "bytes=" range, inclusive; None to send the whole
+    file (no header, or several ranges).
+    """
+    match = RANGE.fullmatch(header.strip())
+    if not match or not (match.group(1) or match.group(2)):
+        return None
+    if match.group(1):
+        start = int(match.group(1))
+        end = min(int(match.group(2)), size - 1) if match.group(2) else size - 1
+    else:
+        start, end = max(0, size - int(match.group(2))), size - 1
+    if start > end or start >= size:
+        raise HTTPException(status_code=416, detail="Requested range not satisfiable", headers={"Content-Range": f"bytes */{size}"})
+    return start, end
+
+def _iter_file(path: str, start: int = 0, length: Optional[int] = None):
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = length
+        while remaining is None or remaining > 0:
+            chunk = f.read(CHUNK_SIZE if remaining is None else min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            if remaining is not None:
+                remaining -= len(chunk)
+            yield chunk
+
+def _iter_gzip(path: str):
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)  # wbits 31: gzip container
+    for chunk in _iter_file(path):
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+def file_response(request: Request, path: str, fmt: str, filename: str) -> StreamingResponse:
+    """
+    Streams `path` in fixed-size chunks. Honours a single-range Range header
+    (with If-Range) and gzip-compresses text formats when the client accepts it.
+    """
+    stat = os.stat(path)
+    etag = f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+    headers = {
+        "Content-Disposition": f'attachment; filename="{filename}"',
+        "Accept-Ranges": "bytes",
+        "ETag": etag,
+        "Vary": "Accept, Accept-Encoding",
+    }
+    if_range = request.headers.get("if-range")
+    byte_range = None
+    if request.headers.get("range") and (not if_range or if_range == etag):
+        byte_range = _parse_range(request.headers["range"], stat.st_size)
+
+    if byte_range:
+        start, end = byte_range
+        headers["Content-Range"] = f"bytes {start}-{end}/{stat.st_size}"
+        headers["Content-Length"] = str(end - start + 1)
+        return StreamingResponse(_iter_file(path, start, end - start + 1), status_code=206,
+                                 media_type=MEDIA_TYPES[fmt], headers=headers)
+    # Ranges always address the uncompressed bytes, so only whole files are compressed
+    if fmt in TEXT_FORMATS and "gzip" in request.headers.get("accept-encoding", "").lower():
+        headers["Content-Encoding"] = "gzip"
+        headers["ETag"] = etag[:-1] + '-gz"'  # A different representation of the same file
+        return StreamingResponse(_iter_gzip(path), media_type=MEDIA_TYPES[fmt], headers=headers)
+    headers["Content-Length"] = str(stat.st_size)
+    return StreamingResponse(_iter_file(path), media_type=MEDIA_TYPES[fmt], headers=headers)
+
+
+@router.get("/download/{job_id}")
+async def download_job(job_id: str, request: Request, format: Optional[str] = None):
+    """
+    Download the output of one of the requester's jobs as CSV, JSONL, Parquet or
+    XLSX (?format=, or the Accept header). Rows are streamed from the stored
+    output; Range requests resume interrupted downloads.
+    """
+    username = extract_username_from_request(request)
+    if not username:
+        raise HTTPException(status_code=401, detail="Missing user token/header")
+
+    source = _job_output(username, job_id)
+    fmt = negotiate_format(format, request.headers.get("accept"))
+    path = await materialize(source, fmt)
+    name = os.path.splitext(os.path.basename(source.rstrip(os.sep)))[0]
+    return file_response(request, path, fmt, f"{name}.{fmt}")
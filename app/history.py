@@ -1,27 +1,227 @@
-import json, os
-from fastapi import APIRouter
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
 from datetime import datetime
+from pathlib import Path
+from threading import Lock
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Request
+from app.auth import extract_username_from_request
+from app.storage import get_connection, transaction
+from utils.sinks import JOB_OUTPUT_DIR
 
 router = APIRouter()
-HISTORY_FILE = "history.json"
 
-def save_history(user, url, city, mode, file_path):
-    log = {
-        "user": user,
+# Legacy JSON history at repo root; imported into the store once
+HISTORY_FILE = Path("history.json")
+
+# Retention policy (override through environment variables)
+HISTORY_RETENTION_DAYS = int(os.getenv("SCOUTAI_HISTORY_RETENTION_DAYS", "365"))
+HISTORY_MAX_PER_USER = int(os.getenv("SCOUTAI_HISTORY_MAX_PER_USER", "10000"))
+COMPACTION_INTERVAL = 60 * 60  # seconds between background compactions
+MAX_PAGE_SIZE = 500
+
+# Rows are only ever appended; `seq` gives insertion order and doubles as the
+# pagination cursor, so listing a page is one index range scan.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scrape_history (
+    seq         INTEGER PRIMARY KEY AUTOINCREMENT,
+    id          TEXT NOT NULL UNIQUE,
+    user        TEXT,
+    url         TEXT,
+    city        TEXT,
+    mode        TEXT,
+    timestamp   INTEGER NOT NULL,
+    status      TEXT,
+    rows        INTEGER NOT NULL DEFAULT 0,
+    output_file TEXT,
+    notes       TEXT,
+    timings     TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_history_user_seq ON scrape_history(user, seq);
+CREATE INDEX IF NOT EXISTS idx_history_timestamp ON scrape_history(timestamp);
+CREATE TABLE IF NOT EXISTS history_meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+COLUMNS = ("id", "user", "url", "city", "mode", "timestamp", "status", "rows", "output_file", "notes")
+# Stage timings of the job as JSON (see utils.metrics); added after the first release
+ENTRY_COLUMNS = COLUMNS + ("timings",)
+
+LOCK = Lock()
+_schema_ready = False
+
+
+def _db():
+    global _schema_ready
+    conn = get_connection()
+    if not _schema_ready:
+        with LOCK:
+            if not _schema_ready:
+                conn.executescript(SCHEMA)
+                _add_timings_column(conn)
+                _migrate_history_json(conn)
+                _schema_ready = True
+    return conn
+
+def _legacy_timestamp(value) -> int:
+    if isinstance(value, (int, float)):
+        return int(value)
+    try:
+        return int(datetime.fromisoformat(str(value)).timestamp())
+    except Exception:
+        return 0
+
+def _add_timings_column(conn) -> None:
+    columns = {row["name"] for row in conn.execute("PRAGMA table_info(scrape_history)")}
+    if "timings" not in columns:
+        conn.execute("ALTER TABLE scrape_history ADD COLUMN timings TEXT")
+
+def _migrate_history_json(conn) -> None:
+    """
+    One-time import of history.json, accepting both legacy entry schemas.
+    """
+    with transaction(conn):
+        if conn.execute("SELECT 1 FROM history_meta WHERE key = 'history_json_migrated'").fetchone():
+            return
+        entries = []
+        if HISTORY_FILE.exists():
+            try:
+                entries = json.loads(HISTORY_FILE.read_text(encoding="utf-8"))
+            except Exception:
+                entries = []
+        rows = []
+        for e in entries if isinstance(entries, list) else []:
+            if not isinstance(e, dict):
+                continue
+            rows.append((
+                e.get("id") or str(uuid.uuid4()), e.get("user"), e.get("url"), e.get("city"), e.get("mode"),
+                _legacy_timestamp(e.get("timestamp")), e.get("status", "success"), int(e.get("rows") or 0),
+                e.get("output_file") or e.get("file"), e.get("notes", ""),
+            ))
+        rows.sort(key=lambda r: r[5])  # oldest first so seq follows time
+        conn.executemany(
+            f"INSERT OR IGNORE INTO scrape_history ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+            rows,
+        )
+        conn.execute("INSERT INTO history_meta (key, value) VALUES ('history_json_migrated', ?)", (str(int(time.time())),))
+    if rows:
+        logging.info(f"Imported {len(rows)} history entries from {HISTORY_FILE}")
+
+def record_history_entry(username: str, url: str, city: str, mode: str,
+                         status: str, rows: int = 0, output_file: Optional[str] = None,
+                         notes: str = "", timings: Optional[dict] = None) -> dict:
+    """
+    Append a history entry. A single indexed INSERT, independent of history size.
+    `timings` holds the job's seconds per scrape stage.
+    """
+    entry = {
+        "id": str(uuid.uuid4()),
+        "user": username,
         "url": url,
         "city": city,
         "mode": mode,
-        "file": file_path,
-        "timestamp": datetime.now().isoformat()
+        "timestamp": int(time.time()),
+        "status": status,
+        "rows": rows,
+        "output_file": output_file,
+        "notes": notes,
+        "timings": timings or None,
     }
-    data = []
-    if os.path.exists(HISTORY_FILE):
-        data = json.load(open(HISTORY_FILE))
-    data.append(log)
-    with open(HISTORY_FILE, "w") as f:
-        json.dump(data, f, indent=2)
+    values = [entry[c] for c in COLUMNS] + [json.dumps(timings) if timings else None]
+    _db().execute(
+        f"INSERT INTO scrape_history ({', '.join(ENTRY_COLUMNS)}) VALUES ({', '.join('?' * len(ENTRY_COLUMNS))})",
+        values,
+    )
+    return entry
+
+def save_history(user, url, city, mode, file_path):
+    return record_history_entry(user, url, city, mode, "success", output_file=file_path)
+
+def list_history(username: str, limit: int = 50, cursor: Optional[int] = None):
+    """
+    Latest-first page of a user's history. Returns (entries, next_cursor);
+    pass next_cursor back to get the following page, None means no more rows.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    sql = f"SELECT seq, {', '.join(ENTRY_COLUMNS)} FROM scrape_history WHERE user = ?"
+    params = [username]
+    if cursor is not None:
+        sql += " AND seq < ?"
+        params.append(cursor)
+    sql += " ORDER BY seq DESC LIMIT ?"
+    params.append(limit + 1)
+
+    rows = _db().execute(sql, params).fetchall()
+    entries = [{**{c: r[c] for c in COLUMNS}, "timings": json.loads(r["timings"]) if r["timings"] else None}
+               for r in rows[:limit]]
+    next_cursor = rows[limit - 1]["seq"] if len(rows) > limit else None
+    return entries, next_cursor
+
+def find_job_output(username: str, job_id: str) -> Optional[str]:
+    """
+    Output of a user's successful job by job ID, for jobs the queue no longer
+    tracks. Job outputs live in the job's own directory (see utils.sinks.output_path).
+    """
+    prefix = os.path.join(JOB_OUTPUT_DIR, job_id, "")
+    row = _db().execute(
+        "SELECT output_file FROM scrape_history WHERE user = ? AND status = 'success' "
+        "AND substr(output_file, 1, ?) = ? ORDER BY seq DESC LIMIT 1",
+        (username, len(prefix), prefix),
+    ).fetchone()
+    return row["output_file"] if row else None
+
+def compact_history() -> int:
+    """
+    Applies the retention policy: drops entries older than HISTORY_RETENTION_DAYS
+    and keeps at most HISTORY_MAX_PER_USER entries per user. Returns rows deleted.
+    """
+    conn = _db()
+    cutoff = int(time.time()) - HISTORY_RETENTION_DAYS * 24 * 60 * 60
+    deleted = 0
+    with transaction(conn):
+        deleted += conn.execute("DELETE FROM scrape_history WHERE timestamp < ?", (cutoff,)).rowcount
+        heavy = conn.execute(
+            "SELECT user FROM scrape_history GROUP BY user HAVING COUNT(*) > ?", (HISTORY_MAX_PER_USER,)
+        ).fetchall()
+        for row in heavy:
+            deleted += conn.execute(
+                "DELETE FROM scrape_history WHERE user = ? AND seq <= "
+                "(SELECT seq FROM scrape_history WHERE user = ? ORDER BY seq DESC LIMIT 1 OFFSET ?)",
+                (row["user"], row["user"], HISTORY_MAX_PER_USER),
+            ).rowcount
+    if deleted:
+        logging.info(f"History compaction removed {deleted} entries")
+    return deleted
+
+async def history_compaction_loop():
+    """
+    Background task started by the API servers.
+    """
+    while True:
+        try:
+            await asyncio.to_thread(compact_history)
+        except Exception as e:
+            logging.error(f"History compaction failed: {e}")
+        await asyncio.sleep(COMPACTION_INTERVAL)
 
 @router.get("/history")
-def get_history():
-    if not os.path.exists(HISTORY_FILE): return []
-    return json.load(open(HISTORY_FILE))
+async def get_history(request: Request, limit: int = 50, cursor: Optional[int] = None, paginate: bool = False):
+    """
+    Return recent history entries for the authenticated user, latest first, as a list.
+    With `paginate=true` (or a `cursor`) the response is {"entries", "next_cursor"};
+    pass `next_cursor` back as `cursor` for older entries.
+    """
+    username = extract_username_from_request(request)
+    if not username:
+        raise HTTPException(status_code=401, detail="Missing user token/header")
+
+    entries, next_cursor = await asyncio.to_thread(list_history, username, limit, cursor)
+    if not paginate and cursor is None:
+        return entries
+    return {"entries": entries, "next_cursor": next_cursor}
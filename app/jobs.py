@@ -0,0 +1,288 @@
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from typing import Callable, Optional
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from app.auth import extract_username_from_request
+from utils.resource_blocker import NetworkStats, current_network_stats, log_network_stats
+from utils.sinks import current_job_id, RowTail
+from utils.progress import current_progress, progress_registry
+from utils.metrics import current_timings
+
+# Configuration (override through environment variables)
+JOB_WORKERS = int(os.getenv("SCOUTAI_JOB_WORKERS", "2"))           # Scrapes running at the same time
+MAX_QUEUED_JOBS = int(os.getenv("SCOUTAI_MAX_QUEUED_JOBS", "100"))  # Waiting jobs before /scrape returns 503
+FINISHED_JOB_TTL = 60 * 60 * 24                                     # Keep finished jobs queryable for a day
+STREAM_BATCH = 200       # Rows per "rows" event
+STREAM_POLL = 0.5        # Seconds between checks for new rows while a job runs
+STREAM_KEEPALIVE = 15.0  # Seconds of silence before a keep-alive comment is sent
+
+router = APIRouter()
+
+
+class Job:
+    def __init__(self, username, url, city, mode, job_id=None):
+        self.id = job_id or str(uuid.uuid4())
+        self.user = username
+        self.url = url
+        self.city = city
+        self.mode = mode
+        self.state = "queued"  # queued -> running -> finished / failed
+        self.rows = 0
+        self.duplicates = 0  # rows dropped by the sink's dedup stage
+        self.output_file = None
+        self.error = None
+        self.created_at = int(time.time())
+        self.started_at = None
+        self.finished_at = None
+        self.network = NetworkStats()  # requests blocked / bytes saved by the browser pool
+        self.progress = progress_registry.track(self.id, username, self.network)  # live counters for /status
+        self.timings = {}  # seconds per stage (see utils.metrics)
+
+    @property
+    def done(self) -> bool:
+        return self.state in ("finished", "failed")
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "state": self.state,
+            "url": self.url,
+            "city": self.city,
+            "mode": self.mode,
+            "rows": self.rows,
+            "duplicates": self.duplicates,
+            "output_file": self.output_file,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "network": self.network.to_dict(),
+            "progress": self.progress.to_dict(),
+            "timings": self.timings,
+        }
+
+
+class JobQueue:
+    """
+    In-process scrape queue drained by a fixed number of async workers.
+
+    `runner(url, city, mode)` performs the scrape and may return
+    {"rows": ..., "duplicates": ..., "output_file": ...}. `on_start(job)` is called when a job
+    leaves the queue and `on_finish(job)` once per job after it finished or failed, which is
+    where quota and history are settled. Both hooks run in a worker thread.
+    """
+
+    def __init__(self, workers=JOB_WORKERS, maxsize=MAX_QUEUED_JOBS):
+        self.workers = workers
+        self.maxsize = maxsize
+        self.runner = None
+        self.on_start = None
+        self.on_finish = None
+        self._jobs = {}
+        self._queue = None
+        self._tasks = []
+
+    def configure(self, runner: Callable, on_start: Optional[Callable] = None, on_finish: Optional[Callable] = None) -> None:
+        self.runner = runner
+        self.on_start = on_start
+        self.on_finish = on_finish
+
+    async def start(self) -> None:
+        self._queue = asyncio.Queue(maxsize=self.maxsize)
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        logging.info(f"Job queue started with {self.workers} workers")
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, username: str, url: str, city: str, mode: str, job_id: Optional[str] = None) -> Job:
+        """
+        Enqueue a scrape. Raises asyncio.QueueFull when the backlog is at capacity.
+        """
+        if self._queue is None:
+            raise RuntimeError("Job queue is not started")
+        self._prune()
+        job = Job(username, url, city, mode, job_id=job_id)
+        self._queue.put_nowait(job)
+        self._jobs[job.id] = job
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def _prune(self) -> None:
+        cutoff = int(time.time()) - FINISHED_JOB_TTL
+        for job_id in [j.id for j in self._jobs.values() if j.done and j.finished_at < cutoff]:
+            del self._jobs[job_id]
+            progress_registry.discard(job_id)
+
+    async def _worker(self, worker_id: int) -> None:
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._run(job)
+            finally:
+                self._queue.task_done()
+
+    async def _hook(self, hook: Optional[Callable], job: Job, name: str) -> None:
+        # Hooks touch SQLite, so they are kept off the event loop
+        if not hook:
+            return
+        try:
+            await asyncio.to_thread(hook, job)
+        except Exception as e:
+            logging.error(f"Job {job.id} {name} hook failed: {e}")
+
+    async def _run(self, job: Job) -> None:
+        await self._hook(self.on_start, job, "start")
+        job.state = "running"
+        job.started_at = int(time.time())
+        job.progress.set_state("running")
+        logging.info(f"Job {job.id} started → {job.url}")
+        # Browser contexts opened while this job runs count into job.network
+        token = current_network_stats.set(job.network)
+        job_token = current_job_id.set(job.id)  # outputs go to the job's own directory
+        progress_token = current_progress.set(job.progress)
+        timings_token = current_timings.set(job.timings)
+        try:
+            result = await self.runner(job.url, job.city, job.mode) or {}
+            job.rows = result.get("rows", 0)
+            job.duplicates = result.get("duplicates", 0)
+            job.output_file = result.get("output_file")
+            job.state = "finished"
+        except Exception as e:
+            logging.error(f"Job {job.id} failed: {e}")
+            job.error = str(e)
+            job.state = "failed"
+        finally:
+            current_network_stats.reset(token)
+            current_job_id.reset(job_token)
+            current_progress.reset(progress_token)
+            current_timings.reset(timings_token)
+        job.finished_at = int(time.time())
+        job.progress.set_state(job.state, job.error or "")
+        log_network_stats(f"Job {job.id}", job.network)
+
+        await self._hook(self.on_finish, job, "completion")
+
+
+# Shared queue used by both API servers
+job_queue = JobQueue()
+
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str, request: Request):
+    """
+    Return state, row count and output path of a scrape job owned by the requester.
+    """
+    username = extract_username_from_request(request)
+    if not username:
+        raise HTTPException(status_code=401, detail="Missing user token/header")
+
+    job = job_queue.get(job_id)
+    if not job or job.user != username:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+
+def _job_outputs(job: Job) -> list:
+    # A job can move to a new output midway (e.g. a fallback strategy); the
+    # stream goes through them in order
+    outputs = list(job.progress.outputs)
+    if job.output_file and job.output_file not in outputs:
+        outputs.append(job.output_file)
+    return outputs
+
+def parse_stream_position(value: Optional[str]) -> tuple:
+    """
+    (output index, row offset in that output) from an event ID "<index>:<offset>";
+    a bare number is an offset in the first output.
+    """
+    index, _, offset = (value or "").strip().rpartition(":")
+    if not offset.isdigit() or not (index.isdigit() or index == ""):
+        return 0, 0
+    return int(index or 0), int(offset)
+
+def _sse(event: str, data, event_id=None) -> str:
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{head}event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+async def stream_job_events(job: Job, position: tuple = (0, 0)):
+    """
+    Server-sent events for one job: "rows" batches read from the job's output
+    as it grows, "progress" whenever the scraper reports a page, and a final
+    "done" with the job record. Event IDs are "<output index>:<row offset>"
+    (a job that switches to a new output restarts at offset 0 in it), so a
+    reconnecting client (Last-Event-ID or ?offset=) resumes where it stopped.
+    When a retry recreates or truncates the output, a "reset" event gives the
+    offset the rows continue from; rows sent beyond it were retracted.
+
+    Rows are read from disk only when the previous event has been sent, so a
+    slow client holds back the reader instead of buffering rows in memory.
+    """
+    index, offset = position
+    tail, version = None, -1
+    last_sent = time.monotonic()
+    while True:
+        done = job.done  # read before the rows: everything written by then is on disk
+        outputs = _job_outputs(job)
+        while index < len(outputs):
+            if tail is None or tail.path != outputs[index]:
+                tail = RowTail(outputs[index], offset)
+            current = index == len(outputs) - 1
+            while True:
+                # Earlier outputs are no longer written to, so they are read to the end
+                rows = await asyncio.to_thread(tail.read, STREAM_BATCH, done or not current)
+                if tail.reset_to is not None:
+                    offset, tail.reset_to = tail.reset_to, None
+                    yield _sse("reset", {"output": index, "offset": offset}, f"{index}:{offset}")
+                    last_sent = time.monotonic()
+                if not rows:
+                    break
+                yield _sse("rows", {"output": index, "offset": offset, "rows": rows}, f"{index}:{offset + len(rows)}")
+                offset += len(rows)
+                last_sent = time.monotonic()
+            if current:
+                break
+            index, offset, tail = index + 1, 0, None
+        if job.progress.version != version:
+            version = job.progress.version
+            yield _sse("progress", job.progress.to_dict())
+            last_sent = time.monotonic()
+        if done:
+            yield _sse("done", job.to_dict(), f"{index}:{offset}")
+            return
+        if time.monotonic() - last_sent >= STREAM_KEEPALIVE:
+            yield ": keep-alive\n\n"
+            last_sent = time.monotonic()
+        await asyncio.sleep(STREAM_POLL)
+
+
+@router.get("/jobs/{job_id}/stream")
+async def stream_job(job_id: str, request: Request, offset: Optional[str] = None):
+    """
+    Stream a job's rows and progress as server-sent events while it runs.
+    Resume after a disconnect with ?offset=<last event ID> or Last-Event-ID.
+    """
+    username = extract_username_from_request(request)
+    if not username:
+        raise HTTPException(status_code=401, detail="Missing user token/header")
+
+    job = job_queue.get(job_id)
+    if not job or job.user != username:
+        raise HTTPException(status_code=404, detail="Job not found")
+    position = parse_stream_position(offset if offset is not None else request.headers.get("last-event-id"))
+    return StreamingResponse(
+        stream_job_events(job, position),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
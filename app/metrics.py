@@ -0,0 +1,25 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from utils.http_cache import http_cache_stats
+from utils.metrics import render_prometheus
+from utils.progress import progress_registry
+
+router = APIRouter()
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """
+    Prometheus text exposition: per-platform, per-stage timing histograms, the
+    number of jobs in each state and the HTTP cache counters.
+    """
+    counts = {}
+    for progress in progress_registry.jobs():
+        counts[progress.state] = counts.get(progress.state, 0) + 1
+    lines = ["# HELP scoutai_jobs Jobs known to this process by state.", "# TYPE scoutai_jobs gauge"]
+    lines += [f'scoutai_jobs{{state="{state}"}} {n}' for state, n in sorted(counts.items())]
+    lines += ["# HELP scoutai_http_cache_events_total HTTP cache lookups and writes by outcome.",
+              "# TYPE scoutai_http_cache_events_total counter"]
+    lines += [f'scoutai_http_cache_events_total{{event="{event}"}} {n}' for event, n in sorted(http_cache_stats().items())]
+    return PlainTextResponse(render_prometheus() + "\n".join(lines) + "\n",
+                             media_type="text/plain; version=0.0.4")
@@ -1,16 +1,27 @@
-from fastapi import APIRouter
-import json, os
+from fastapi import APIRouter, Request
+from app.auth import extract_username_from_request
+from utils.progress import current_progress, progress_registry
 
 router = APIRouter()
-STATUS_FILE = "status.json"
+
 
 @router.get("/status")
-def get_status():
-    if not os.path.exists(STATUS_FILE):
-        return {"status": "Idle"}
-    with open(STATUS_FILE, "r") as f:
-        return json.load(f)
+def get_status(request: Request, events: bool = False):
+    """
+    Live progress from the in-memory registry (no disk access). With a user
+    header, that user's jobs are listed with counters and rates (and their
+    recent events with ?events=true); without one, only overall counts.
+    """
+    username = extract_username_from_request(request)
+    if not username:
+        snapshot = progress_registry.snapshot()
+        return {"status": snapshot["status"], "running": snapshot["running"], "queued": snapshot["queued"]}
+    return progress_registry.snapshot(user=username, events=events)
 
 def update_status(message: str):
-    with open(STATUS_FILE, "w") as f:
-        json.dump({"status": message}, f)
+    """
+    Adds a status message to the running job's recent events.
+    """
+    progress = current_progress.get()
+    if progress is not None:
+        progress.note(message)
@@ -0,0 +1,50 @@
+# app/storage.py
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+# Embedded database shared by the quota ledger and other app state
+DB_PATH = Path(os.getenv("SCOUTAI_DB", "scoutai.db"))
+BUSY_TIMEOUT_MS = 30000
+
+_local = threading.local()
+
+
+def get_connection(path: Path = None) -> sqlite3.Connection:
+    """
+    Returns this thread's connection to the database, opening it on first use.
+
+    Connections run in WAL mode so readers never block the writer, and in
+    autocommit mode so callers control transactions with `transaction()`.
+    Safe to use from several threads and several uvicorn worker processes.
+    """
+    path = str(path or DB_PATH)
+    conns = getattr(_local, "conns", None)
+    if conns is None:
+        conns = _local.conns = {}
+    conn = conns.get(path)
+    if conn is None:
+        conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+        conns[path] = conn
+    return conn
+
+
+@contextmanager
+def transaction(conn: sqlite3.Connection):
+    """
+    BEGIN IMMEDIATE ... COMMIT block. Takes the write lock up front so a
+    read-modify-write inside it cannot interleave with another writer.
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
@@ -1,80 +1,216 @@
 # app/subscription_guard.py
 import json
+import logging
 import time
 from pathlib import Path
 from threading import Lock
 from typing import Optional
 
-# USERS_FILE placed at repo root
+from app.storage import get_connection, transaction
+
+# Legacy JSON store at repo root; imported into the ledger once
 USERS_FILE = Path("users.json")
 LOCK = Lock()
 
 # Default monthly quotas per tier
 DEFAULTS = {"free": 50, "pro": 1000, "enterprise": 10000}
 
-def _load_users() -> dict:
+MONTH_SECONDS = 60 * 60 * 24 * 30
+CACHE_TTL = 1.0                     # seconds a cached quota record may be served
+RESERVATION_TTL = 60 * 60 * 6       # reservations of crashed jobs expire after 6h
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS quota_users (
+    username      TEXT PRIMARY KEY,
+    tier          TEXT NOT NULL,
+    monthly_quota INTEGER NOT NULL,
+    used          INTEGER NOT NULL DEFAULT 0,
+    last_reset    INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS quota_reservations (
+    id         TEXT PRIMARY KEY,
+    username   TEXT NOT NULL,
+    n          INTEGER NOT NULL,
+    created_at INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_quota_reservations_user ON quota_reservations(username);
+CREATE TABLE IF NOT EXISTS quota_meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+_schema_ready = False
+_cache = {}
+
+
+def _db():
     """
-    Load users.json from repo root. Creates an empty file if missing.
+    Connection with the ledger schema in place (and users.json imported).
     """
-    if not USERS_FILE.exists():
-        USERS_FILE.write_text(json.dumps({}))
-    with open(USERS_FILE, "r", encoding="utf-8") as f:
-        try:
-            return json.load(f)
-        except Exception:
-            return {}
-
-def _save_users(data: dict) -> None:
-    with LOCK:
-        with open(USERS_FILE, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
-
-def _reset_if_needed(entry: dict) -> None:
-    now = int(time.time())
+    global _schema_ready
+    conn = get_connection()
+    if not _schema_ready:
+        with LOCK:
+            if not _schema_ready:
+                conn.executescript(SCHEMA)
+                _migrate_users_json(conn)
+                _schema_ready = True
+    return conn
+
+def _migrate_users_json(conn) -> None:
+    """
+    One-time import of users.json. Guarded by a flag row so only the first
+    worker to start performs it.
+    """
+    with transaction(conn):
+        if conn.execute("SELECT 1 FROM quota_meta WHERE key = 'users_json_migrated'").fetchone():
+            return
+        now = int(time.time())
+        data = {}
+        if USERS_FILE.exists():
+            try:
+                data = json.loads(USERS_FILE.read_text(encoding="utf-8"))
+            except Exception:
+                data = {}
+        rows = [
+            (name, e.get("tier", "free"), int(e.get("monthly_quota", DEFAULTS.get(e.get("tier"), DEFAULTS["free"]))),
+             int(e.get("used", 0)), int(e.get("last_reset", now)))
+            for name, e in data.items() if isinstance(e, dict)
+        ]
+        conn.executemany(
+            "INSERT OR IGNORE INTO quota_users (username, tier, monthly_quota, used, last_reset) VALUES (?, ?, ?, ?, ?)",
+            rows,
+        )
+        conn.execute("INSERT INTO quota_meta (key, value) VALUES ('users_json_migrated', ?)", (str(now),))
+    if rows:
+        logging.info(f"Imported {len(rows)} quota records from {USERS_FILE}")
+
+def _invalidate(username: str) -> None:
+    _cache.pop(username, None)
+
+def _reset_if_needed(conn, username: str, now: int) -> None:
     # reset monthly if >30 days since last_reset (simple heuristic)
-    if now - entry.get("last_reset", 0) > 60 * 60 * 24 * 30:
+    conn.execute(
+        "UPDATE quota_users SET used = 0, last_reset = ? WHERE username = ? AND ? - last_reset > ?",
+        (now, username, now, MONTH_SECONDS),
+    )
+
+def _load_record(conn, username: str) -> Optional[dict]:
+    row = conn.execute(
+        "SELECT tier, monthly_quota, used, last_reset FROM quota_users WHERE username = ?", (username,)
+    ).fetchone()
+    if not row:
+        return None
+    now = int(time.time())
+    reserved = conn.execute(
+        "SELECT COALESCE(SUM(n), 0) FROM quota_reservations WHERE username = ? AND created_at > ?",
+        (username, now - RESERVATION_TTL),
+    ).fetchone()[0]
+    entry = dict(row)
+    if now - entry["last_reset"] > MONTH_SECONDS:
+        # reported as reset; persisted on the next write
         entry["used"] = 0
         entry["last_reset"] = now
+    entry["reserved"] = reserved
+    return entry
 
 def ensure_user(username: str, tier: str = "free") -> None:
-    users = _load_users()
-    if username not in users:
-        users[username] = {
-            "tier": tier,
-            "monthly_quota": DEFAULTS.get(tier, DEFAULTS["free"]),
-            "used": 0,
-            "last_reset": int(time.time())
-        }
-        _save_users(users)
+    conn = _db()
+    conn.execute(
+        "INSERT OR IGNORE INTO quota_users (username, tier, monthly_quota, used, last_reset) VALUES (?, ?, ?, 0, ?)",
+        (username, tier, DEFAULTS.get(tier, DEFAULTS["free"]), int(time.time())),
+    )
+    _invalidate(username)
 
 def get_user_record(username: str) -> Optional[dict]:
-    users = _load_users()
-    entry = users.get(username)
+    """
+    Returns {"tier", "monthly_quota", "used", "reserved", "last_reset"} or None.
+    Served from a short-lived per-process cache; writes always hit the ledger.
+    """
+    now = time.monotonic()
+    cached = _cache.get(username)
+    if cached and cached[0] > now:
+        return dict(cached[1])
+    entry = _load_record(_db(), username)
     if entry:
-        _reset_if_needed(entry)
-    return entry
+        _cache[username] = (now + CACHE_TTL, entry)
+        return dict(entry)
+    return None
 
 def can_consume(username: str) -> bool:
     rec = get_user_record(username)
     if not rec:
         return False
-    return rec.get("used", 0) < rec.get("monthly_quota", 0)
+    return rec.get("used", 0) + rec.get("reserved", 0) < rec.get("monthly_quota", 0)
+
+def reserve_quota(username: str, reservation_id: str, n: int = 1) -> bool:
+    """
+    Atomic check-and-reserve: holds `n` units for a queued job if the user
+    still has room once used and outstanding reservations are counted.
+    Settle the reservation with `release_quota` when the job ends.
+    """
+    conn = _db()
+    now = int(time.time())
+    with transaction(conn):
+        _reset_if_needed(conn, username, now)
+        conn.execute("DELETE FROM quota_reservations WHERE username = ? AND created_at <= ?", (username, now - RESERVATION_TTL))
+        row = conn.execute(
+            "SELECT u.monthly_quota - u.used - COALESCE(SUM(r.n), 0) AS remaining "
+            "FROM quota_users u LEFT JOIN quota_reservations r ON r.username = u.username "
+            "WHERE u.username = ? GROUP BY u.username",
+            (username,),
+        ).fetchone()
+        if not row or row["remaining"] < n:
+            return False
+        conn.execute(
+            "INSERT INTO quota_reservations (id, username, n, created_at) VALUES (?, ?, ?, ?)",
+            (reservation_id, username, n, now),
+        )
+    _invalidate(username)
+    return True
+
+def renew_reservation(reservation_id: str) -> bool:
+    """
+    Restarts the reservation's RESERVATION_TTL clock, so a job that waited in the
+    queue keeps its hold for the whole run. Returns False if it already expired.
+    """
+    conn = _db()
+    with transaction(conn):
+        cur = conn.execute("UPDATE quota_reservations SET created_at = ? WHERE id = ?", (int(time.time()), reservation_id))
+    return cur.rowcount > 0
+
+def release_quota(reservation_id: str, consumed: bool = False) -> None:
+    """
+    Drops a reservation. With consumed=True its units are charged to `used`.
+    """
+    conn = _db()
+    with transaction(conn):
+        row = conn.execute("SELECT username, n FROM quota_reservations WHERE id = ?", (reservation_id,)).fetchone()
+        if not row:
+            return
+        conn.execute("DELETE FROM quota_reservations WHERE id = ?", (reservation_id,))
+        if consumed:
+            _reset_if_needed(conn, row["username"], int(time.time()))
+            conn.execute("UPDATE quota_users SET used = used + ? WHERE username = ?", (row["n"], row["username"]))
+    _invalidate(row["username"])
 
 def consume_quota(username: str, n: int = 1) -> None:
-    users = _load_users()
-    if username not in users:
+    conn = _db()
+    with transaction(conn):
+        _reset_if_needed(conn, username, int(time.time()))
+        cur = conn.execute("UPDATE quota_users SET used = used + ? WHERE username = ?", (n, username))
+    _invalidate(username)
+    if cur.rowcount == 0:
         raise KeyError("user missing")
-    users[username]["used"] = users[username].get("used", 0) + n
-    _save_users(users)
 
 # Optional helper to set a user's tier and quota
 def set_user_tier(username: str, tier: str) -> None:
-    users = _load_users()
-    used = users.get(username, {}).get("used", 0)
-    users[username] = {
-        "tier": tier,
-        "monthly_quota": DEFAULTS.get(tier, DEFAULTS["free"]),
-        "used": used,
-        "last_reset": int(time.time())
-    }
-    _save_users(users)
+    conn = _db()
+    conn.execute(
+        "INSERT INTO quota_users (username, tier, monthly_quota, used, last_reset) VALUES (?, ?, ?, 0, ?) "
+        "ON CONFLICT(username) DO UPDATE SET tier = excluded.tier, monthly_quota = excluded.monthly_quota, "
+        "last_reset = excluded.last_reset",
+        (username, tier, DEFAULTS.get(tier, DEFAULTS["free"]), int(time.time())),
+    )
+    _invalidate(username)
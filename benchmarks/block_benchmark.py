@@ -0,0 +1,70 @@
+"""
+Generic content extraction: old nested-div dump vs. single-pass block extractor.
+
+The old pagination/scroll code called get_text() twice on every <div>, so
+each piece of text was re-emitted once per enclosing div. This prints row
+count, output size and the median time of repeated runs (with min-max spread)
+of both approaches on the same page. The row and size reduction is the
+deterministic gain; timings vary from run to run, so compare medians.
+
+Usage (from the repo root):
+    python -m benchmarks.block_benchmark
+    python -m benchmarks.block_benchmark --page saved/listing.html
+"""
+import argparse
+import json
+import statistics
+import time
+
+from utils.html_parser import make_soup
+from utils.block_extractor import extract_content_blocks
+
+def extract_div_text(html):
+    # Previous generic extractor, kept here for comparison
+    soup = make_soup(html)
+    cards = soup.find_all("div")
+    return [{"Text": card.get_text(strip=True)} for card in cards if card.get_text(strip=True)]
+
+def synthetic_page(cards=200, depth=8):
+    def card(i):
+        inner = (f"<div class='title'><a href='/p/{i}'>Flat {i}</a></div>"
+                 f"<div class='price'>₹{i},00,000</div><div class='meta'><span>2 BHK</span> <span>{i} sqft</span></div>")
+        for d in range(depth):
+            inner = f"<div class='wrap-{d}'>{inner}</div>"
+        return f"<div class='card'>{inner}</div>"
+    listing = "".join(card(i) for i in range(cards))
+    for d in range(depth):
+        listing = f"<div class='layout-{d}'>{listing}</div>"
+    return f"<html><body><header><nav><a href='/'>Home</a></nav></header>{listing}<footer>© Site</footer></body></html>"
+
+def measure(extract, html, repeat):
+    rows = extract(html)  # warm-up run, also gives the rows
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        extract(html)
+        times.append((time.perf_counter() - start) * 1000)
+    size = len(json.dumps(rows, ensure_ascii=False).encode("utf-8"))
+    return statistics.median(times), min(times), max(times), len(rows), size
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--page", help="path of a saved HTML page")
+    parser.add_argument("--repeat", type=int, default=21, help="timed runs per extractor")
+    args = parser.parse_args()
+
+    if args.page:
+        with open(args.page, encoding="utf-8") as f:
+            html = f.read()
+    else:
+        html = synthetic_page()
+
+    print(f"page: {len(html) // 1024} KB")
+    print(f"{'extractor':<16} {'median ms':>10} {'min-max ms':>14} {'rows':>8} {'output KB':>10}")
+    for name, extract in [("nested divs", extract_div_text), ("content blocks", extract_content_blocks)]:
+        median, fastest, slowest, rows, size = measure(extract, html, args.repeat)
+        spread = f"{fastest:.1f}-{slowest:.1f}"
+        print(f"{name:<16} {median:>10.1f} {spread:>14} {rows:>8} {size // 1024:>10}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Parse + extract time per page for each HTML parser backend.
+
+Runs the platform extractors on synthetic listing pages (or on saved pages)
+with every installed backend, and checks that each backend produces exactly
+the same rows as the original full-tree html.parser extraction.
+
+Usage (from the repo root):
+    python -m benchmarks.parse_benchmark
+    python -m benchmarks.parse_benchmark --page housing=saved/housing.html --repeat 20
+"""
+import argparse
+import json
+import time
+
+from utils import html_parser
+from modules.Housing_scraper import extract_selected_fields as extract_housing
+from modules.Squaretest_updated import extract_selected_fields as extract_squareyards
+from modules.Magicbrick_updated import parse_page as extract_magicbricks
+
+EXTRACTORS = {
+    "housing": extract_housing,
+    "squareyards": extract_squareyards,
+    "magicbricks": extract_magicbricks,
+}
+
+# Unrelated markup around the listings, as on real pages
+FILLER = "".join(
+    f"<div class='nav-{i}'><ul><li><a href='/l/{i}'>Link {i}</a></li><li><span>Menu {i}</span></li></ul></div>"
+    for i in range(300)
+)
+
+def synthetic_page(platform, cards=200):
+    if platform == "housing":
+        body = "".join(
+            f"<div data-pos='srp-{i}'><a href='/in/buy/{i}'><h2>Flat {i} &amp; more</h2></a>"
+            f"<div class='T_contactBar'>Agent {i}</div><div class='T_price'>₹{i},00,000</div></div>"
+            for i in range(cards)
+        )
+    elif platform == "squareyards":
+        body = "".join(
+            f"<article class='listing-card horizontal two-line-description'>"
+            f"<h2 class='heading'><a href='https://www.squareyards.com/p/{i}'>Tower {i}</a></h2>"
+            f"<div class='listing-body' data-url='/p/{i}'><p class='location'><span>Sector {i}</span></p>"
+            f"<p class='listing-price'>₹ {i} Lac</p><ul class='listing-information'><li>2 BHK</li><li>{i} sqft</li></ul>"
+            f"<div class='description redirectReadMore'>Spacious flat number {i}</div></div></article>"
+            for i in range(cards)
+        )
+    else:
+        # Every fifth card is a premium one with a second class, as on the site
+        body = "".join(
+            f"<div class='mb-srp__card{' mb-srp__card--premium' if i % 5 == 0 else ''}'><h2 class='mb-srp__card--title'>Office {i}</h2>"
+            f"<div class='mb-srp__card__summary__list--item' data-summary='carpet-area'>"
+            f"<div class='mb-srp__card__summary--label'>Carpet Area</div><div class='mb-srp__card__summary--value'>{i} sqft</div></div>"
+            f"<div class='mb-srp__card__estimate'><div class='mb-srp__card__price--amount'>₹{i} Lac</div>"
+            f"<div class='mb-srp__card__price--size'>₹{i} per sqft</div></div></div>"
+            for i in range(cards)
+        )
+    return f"<html><head><title>{platform}</title></head><body>{FILLER}<main>{body}</main>{FILLER}</body></html>"
+
+def time_extractor(extract, html, backend, repeat, partial=True):
+    html_parser.PARSER_BACKEND = backend
+    html_parser.PARTIAL_PARSE = partial
+    rows = extract(html)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        extract(html)
+    return (time.perf_counter() - start) / repeat * 1000, rows
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--page", action="append", default=[], help="platform=path of a saved HTML page")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--cards", type=int, default=200, help="listings per synthetic page")
+    args = parser.parse_args()
+
+    pages = {}
+    for spec in args.page:
+        platform, path = spec.split("=", 1)
+        with open(path, encoding="utf-8") as f:
+            pages[platform] = f.read()
+    if not pages:
+        pages = {p: synthetic_page(p, args.cards) for p in EXTRACTORS}
+
+    backends = html_parser.available_backends()
+    columns = ["html.parser full"] + backends
+    print(f"{'platform':<12} {'KB':>7} {'rows':>6} " + " ".join(f"{c + ' ms':>20}" for c in columns) + "  identical")
+    for platform, html in pages.items():
+        extract = EXTRACTORS[platform]
+        results = [time_extractor(extract, html, "html.parser", args.repeat, partial=False)]
+        results += [time_extractor(extract, html, b, args.repeat) for b in backends]
+        reference = json.dumps(results[0][1], ensure_ascii=False)
+        identical = all(json.dumps(rows, ensure_ascii=False) == reference for _, rows in results)
+        print(f"{platform:<12} {len(html) // 1024:>7} {len(results[0][1]):>6} "
+              + " ".join(f"{ms:>20.2f}" for ms, _ in results) + f"  {identical}")
+
+if __name__ == "__main__":
+    main()
@@ -68,6 +68,99 @@ function renderQuota(q) {
   scrapeBtn.disabled = used >= limit;
 }
 
+// Poll /jobs/{id} until the scrape finishes or fails
+const JOB_POLL_MS = 2000;
+async function waitForJob(username, jobId) {
+  while (true) {
+    const res = await fetch(`${backendURL}/jobs/${jobId}`, {
+      headers: { "Authorization": "Bearer " + username }
+    });
+    if (!res.ok) throw new Error("job lookup failed: " + res.status);
+    const job = await res.json();
+    if (job.state === "finished" || job.state === "failed") return job;
+    statusEl.textContent = job.state === "running" ? "Scraping..." : "Queued...";
+    await new Promise(r => setTimeout(r, JOB_POLL_MS));
+  }
+}
+
+// Parse one server-sent event block ("event: ...\ndata: ...")
+function parseEvent(block) {
+  let type = "message", data = "";
+  for (const line of block.split("\n")) {
+    if (line.startsWith("event: ")) type = line.slice(7);
+    else if (line.startsWith("data: ")) data += line.slice(6);
+  }
+  return data ? { type, data: JSON.parse(data) } : null;
+}
+
+// Show live progress from the stream
+function renderProgress(p, rows) {
+  const eta = p.eta_s != null ? ` • ETA ${Math.ceil(p.eta_s)}s` : "";
+  statusEl.textContent = `Scraping... page ${p.last_page ?? 0} • ${rows} rows${eta}`;
+}
+
+// Follow /jobs/{id}/stream: rows arrive as each page is extracted. On a
+// dropped connection, reconnect from the last position ("<output>:<offset>")
+// received; fall back to polling if streaming keeps failing.
+const STREAM_RETRIES = 5;
+async function streamJob(username, jobId, onRows) {
+  let position = "0:0", received = 0;
+  for (let attempt = 0; attempt < STREAM_RETRIES; attempt++) {
+    try {
+      const res = await fetch(`${backendURL}/jobs/${jobId}/stream?offset=${position}`, {
+        headers: { "Authorization": "Bearer " + username }
+      });
+      if (!res.ok) throw new Error("stream failed: " + res.status);
+      const reader = res.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = "";
+      while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        let sep;
+        while ((sep = buffer.indexOf("\n\n")) >= 0) {
+          const event = parseEvent(buffer.slice(0, sep));
+          buffer = buffer.slice(sep + 2);
+          if (!event) continue;
+          if (event.type === "rows") {
+            position = `${event.data.output}:${event.data.offset + event.data.rows.length}`;
+            received += event.data.rows.length;
+            onRows(event.data.rows, received);
+          } else if (event.type === "reset") {
+            // A retry rewrote the output: rows past this offset were retracted
+            const [output, offset] = position.split(":").map(Number);
+            if (output === event.data.output) received -= offset - event.data.offset;
+            position = `${event.data.output}:${event.data.offset}`;
+          } else if (event.type === "progress") {
+            renderProgress(event.data, received);
+          } else if (event.type === "done") {
+            return event.data;
+          }
+        }
+      }
+    } catch (err) {
+      console.warn("stream interrupted", err);
+    }
+    await new Promise(r => setTimeout(r, JOB_POLL_MS));
+  }
+  return waitForJob(username, jobId);
+}
+
+// Download a finished job's output; the auth header rules out a plain link
+async function downloadJob(username, jobId, format = "xlsx") {
+  const res = await fetch(`${backendURL}/download/${jobId}?format=${format}`, {
+    headers: { "Authorization": "Bearer " + username }
+  });
+  if (!res.ok) throw new Error("download failed: " + res.status);
+  const blob = await res.blob();
+  const link = document.createElement("a");
+  link.href = URL.createObjectURL(blob);
+  link.download = `scoutai_${jobId}.${format}`;
+  link.click();
+  setTimeout(() => URL.revokeObjectURL(link.href), 10000);
+}
+
 // Show login overlay
 function showLogin() {
   overlay.style.display = "flex";
@@ -141,12 +234,20 @@ async function startScrapeFlow() {
     }
 
     const json = await res.json();
-    statusEl.textContent = json.details || "Scrape finished";
+    statusEl.textContent = json.details || "Scrape queued";
+    const job = await streamJob(username, json.job_id, (rows, total) => {
+      statusEl.textContent = `Scraping... ${total} rows so far`;
+    });
+    if (job.state === "failed") {
+      statusEl.textContent = "Scrape failed: " + (job.error || "unknown error");
+      return;
+    }
+    statusEl.textContent = `Scrape finished: ${job.rows} rows`;
     // update quota display after success
     const updated = await fetchQuota(username);
     renderQuota(updated);
-    // optionally open download
-    setTimeout(()=> window.open(`${backendURL}/download`, "_blank"), 900);
+    // optionally start the download
+    setTimeout(() => downloadJob(username, job.id).catch(err => console.warn("download error", err)), 900);
   } catch (err) {
     console.error(err);
     statusEl.textContent = "Connection failed. Is backend running?";
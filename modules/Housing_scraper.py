@@ -1,55 +1,40 @@
 import asyncio
 import logging
 import os
-import json
-import pandas as pd
-from bs4 import BeautifulSoup
-from playwright.async_api import async_playwright
+from utils.html_parser import make_soup, SoupStrainer
+from utils.browser_pool import browser_pool
+from utils.headless_switcher import run_headless_first
+from utils.sinks import open_sink, output_path, export_rows
+from utils.dedup import dedup_key
+from utils.readiness import wait_until_ready
+from utils.scroll_harvester import harvest_scroll
+from utils.browser_extract import rows_from_cards
+from utils.checkpoints import Checkpoint
+from utils.progress import report_page, report_error, page_count
+from utils.metrics import timed, current_platform
 
 # Configuration
 BATCH_SIZE = 100
-MAX_SCROLLS = 6
+MAX_SCROLLS = 20  # Ceiling per page; scrolling stops once no new cards load
 DEBUG_MODE = True  # Capture screenshots
-HEADLESS = False   # Set to True to run headless
+HEADLESS = True    # First mode tried; the headless policy falls back to headful
 
 # ========== Utilities ==========
 
-def save_resume_page(city, mode, page_number):
-    fname = f"{mode}_{city.replace(' ', '_').lower()}_state.json"
-    with open(fname, 'w') as f:
-        json.dump({"last_page": page_number}, f)
-
-def get_resume_page(city, mode):
-    fname = f"{mode}_{city.replace(' ', '_').lower()}_state.json"
-    if os.path.exists(fname):
-        with open(fname, 'r') as f:
-            return json.load(f).get("last_page", 1)
-    return 1
-
-def save_batch(city, mode, data, batch_num):
-    if not data or not isinstance(data, list) or not isinstance(data[0], dict):
-        logging.warning("Invalid batch, skipping save.")
-        return
-    df = pd.DataFrame(data)
-    fname = f"{mode}_{city.replace(' ', '_').lower()}_batch_{batch_num}.xlsx"
-    df.to_excel(fname, index=False)
-    logging.info(f"Saved batch {batch_num} ({len(df)} rows) → {fname}")
-
-def combine_batches(city, mode):
-    prefix = f"{mode}_{city.replace(' ', '_').lower()}"
-    files = sorted(f for f in os.listdir() if f.startswith(f"{prefix}_batch_") and f.endswith('.xlsx'))
-    try:
-        combined = pd.concat([pd.read_excel(f) for f in files], ignore_index=True)
-        combined.to_excel(f"{prefix}.xlsx", index=False)
-        for f in files:
-            os.remove(f)
-        logging.info(f"Combined into → {prefix}.xlsx")
-    except Exception as e:
-        logging.error(f"Failed to combine batches: {e}")
+def open_output(city, mode, resume=None):
+    # With a checkpoint, rows written after it are dropped and the rest appended to
+    fname = resume["output_file"] if resume and resume.get("output_file") else \
+        output_path(f"{mode}_{city.replace(' ', '_').lower()}.segments")
+    return open_sink(fname, append=resume is not None, resume_rows=resume and resume.get("rows_flushed", 0),
+                     flush_every=BATCH_SIZE, dedup_key=dedup_key("housing", city, mode))
+
+# Only listing cards are needed from the page
+LISTING_STRAINER = SoupStrainer("div", attrs={"data-pos": True})
+LISTING_SELECTOR = "div[data-pos^='srp-']"
 
 def extract_selected_fields(html):
-    soup = BeautifulSoup(html, 'html.parser')
-    listings = soup.select("div[data-pos^='srp-']")
+    soup = make_soup(html, only=LISTING_STRAINER)
+    listings = soup.select(LISTING_SELECTOR)
     results = []
 
     for item in listings:
@@ -69,13 +54,44 @@ def extract_selected_fields(html):
         results.append(data)
     return results
 
-async def scroll_and_load(page, screenshot_prefix):
-    for i in range(MAX_SCROLLS):
-        await page.mouse.wheel(0, 3000)
-        await page.wait_for_timeout(2500)
+# Same fields as extract_selected_fields, evaluated inside the page
+CARD_JS = """
+(card) => {
+    const link = card.querySelector("a[href]");
+    const title = card.querySelector("h2") || card.querySelector("div.T_cardV1Title");
+    return {
+        URL: link ? "https://housing.com" + link.getAttribute("href") : "",
+        Title: text(title),
+        Seller: text(card.querySelector("div.T_contactBar")),
+        Price: text(card.querySelector("div.T_price")),
+    };
+}
+"""
+
+async def scroll_and_load(page, screenshot_prefix, sink):
+    """
+    Scrolls the current results page, extracting cards as they are inserted.
+    Returns the number of rows written to `sink`.
+    """
+    written = 0
+
+    async def on_cards(cards):
+        nonlocal written
+        rows = await rows_from_cards(cards, extract_selected_fields)
+        sink.write_rows(rows)
+        written += len(rows)
+
+    async def screenshot(i):
         if DEBUG_MODE:
             await page.screenshot(path=f"{screenshot_prefix}_scroll_{i + 1}.png")
 
+    await harvest_scroll(page, LISTING_SELECTOR, on_cards, max_scrolls=MAX_SCROLLS, after_scroll=screenshot, card_js=CARD_JS)
+    return written
+
+async def wait_for_listings(page):
+    # After a click: new cards are rendered and their requests have settled
+    await wait_until_ready(page, selector=LISTING_SELECTOR, count_selector=LISTING_SELECTOR, network_idle=True)
+
 # ========== Pagination Handler ==========
 
 async def paginate(page, page_number):
@@ -85,77 +101,80 @@ async def paginate(page, page_number):
             label = await link.inner_text()
             if label.strip() == str(page_number + 1):
                 await link.click()
-                await page.wait_for_timeout(3000)
+                await wait_for_listings(page)
                 return True
 
         next_button = await page.query_selector("button[aria-label='Next']")
         if next_button:
             await next_button.click()
-            await page.wait_for_timeout(3000)
+            await wait_for_listings(page)
             return True
 
         fallback_button = await page.query_selector("button[data-testid='buttonId']")
         if fallback_button:
             await fallback_button.click()
-            await page.wait_for_timeout(3000)
+            await wait_for_listings(page)
             return True
 
     except Exception as e:
         logging.warning(f"Pagination interaction failed: {e}")
+        report_error(f"Pagination interaction failed: {e}")
     return False
 
 # ========== Main Scraper ==========
 
-async def scrape_city(city, mode, url_prefix, playwright):
-    page_number = get_resume_page(city, mode)
-    batch, batch_num = [], 1
+async def skip_to_page(page, page_number):
+    # The search always opens on page 1; click through to the resume page
+    for current in range(1, page_number):
+        if not await paginate(page, current):
+            raise RuntimeError(f"Could not reach page {page_number} to resume (stopped at {current})")
+
+async def scrape_city(city, mode, url_prefix, headless=HEADLESS):
+    current_platform.set("housing")
     city_slug = city.strip().lower().replace(" ", "_")
     full_url = url_prefix + city_slug
+    checkpoint = Checkpoint("housing", city, mode, url=full_url)
+    resume = checkpoint.load()
+    page_number = resume["page"] + 1 if resume else 1
+    sink = open_output(city, mode, resume)
 
     try:
-        browser = await playwright.chromium.launch(headless=HEADLESS)
-        context = await browser.new_context()
-        page = await context.new_page()
-        logging.info(f"Navigating to {full_url}")
-        await page.goto(full_url)
-
-        await page.wait_for_selector("input[placeholder*='locality']", timeout=10000)
-        await page.get_by_role("button", name="Search").click()
-        await page.wait_for_timeout(3000)
+        async with browser_pool.page(headless=headless) as page:
+            logging.info(f"Navigating to {full_url}")
+            with timed("goto"):
+                await page.goto(full_url)
 
-        while True:
-            logging.info(f"Scraping Page {page_number} of {city} ({mode})")
-            await scroll_and_load(page, f"screenshots/{city_slug}_{mode}_page_{page_number}")
-            html = await page.content()
-            new_data = extract_selected_fields(html)
+            await page.wait_for_selector("input[placeholder*='locality']", timeout=10000)
+            await page.get_by_role("button", name="Search").click()
+            await wait_for_listings(page)
+            await skip_to_page(page, page_number)
 
-            if not new_data:
-                logging.warning("Empty listing. Ending scrape.")
-                break
+            while True:
+                logging.info(f"Scraping Page {page_number} of {city} ({mode})")
+                written = await scroll_and_load(page, f"screenshots/{city_slug}_{mode}_page_{page_number}", sink)
 
-            batch.extend(new_data)
-            if len(batch) >= BATCH_SIZE:
-                save_batch(city, mode, batch, batch_num)
-                batch = []
-                batch_num += 1
+                if not written:
+                    logging.warning("Empty listing. Ending scrape.")
+                    break
 
-            save_resume_page(city, mode, page_number)
+                checkpoint.save(page_number, sink)
+                report_page(page_number, sink, total_pages=await page_count(page, "button.T_paginationButton"))
 
-            success = await paginate(page, page_number)
-            if not success:
-                logging.info("No more pages or failed to navigate.")
-                break
+                success = await paginate(page, page_number)
+                if not success:
+                    logging.info("No more pages or failed to navigate.")
+                    break
 
-            page_number += 1
+                page_number += 1
 
-        if batch:
-            save_batch(city, mode, batch_num)
-
-        await browser.close()
-        combine_batches(city, mode)
+        sink.close()
+        checkpoint.clear()
+        return {"rows": sink.rows_written, "duplicates": sink.rows_dropped, "output_file": sink.path}
 
     except Exception as e:
+        sink.abort()
         logging.error(f"Fatal scraping error: {e}")
+        report_error(f"Fatal scraping error: {e}")
 
 # ========== Fallbacks and Runner ==========
 
@@ -204,7 +223,13 @@ if __name__ == "__main__":
         exit(1)
 
     async def runner():
-        async with async_playwright() as playwright:
-            await scrape_city(city, mode_input, url_prefix, playwright)
+        try:
+            return await run_headless_first(url_prefix, lambda headless: scrape_city(city, mode_input, url_prefix, headless=headless))
+        finally:
+            await browser_pool.stop()
+
+    result = asyncio.run(runner())
+    if result and result.get("output_file"):
+        # Rows are stored as segments; the spreadsheet is produced once, here
+        export_rows(result["output_file"], f"{mode_input}_{city.replace(' ', '_').lower()}.xlsx")
 
-    asyncio.run(runner())
@@ -1,12 +1,21 @@
 import os  # File and directory operations
 import importlib.util  # Check if a module is installed
-import pandas as pd  # Data manipulation and Excel export
+import pandas as pd  # Read city mappings from Excel
 import re  # Regex for sanitizing filenames
-import requests  # Fetching HTML pages
-import time  # Sleep between requests
-import json  # Read/write resume state
-from bs4 import BeautifulSoup  # HTML parser
+import asyncio  # Concurrent page fetching
+import logging  # Progress messages when run from the API
+from utils.html_parser import make_soup, class_strainer  # HTML parser (configurable backend)
 from bs4.element import Tag  # Type check for HTML tags
+from utils.sinks import open_sink, output_path, OUTPUT_FORMAT  # Streaming row output
+from utils.http_fetcher import get_fetcher, DEFAULT_HEADERS  # Pooled keep-alive HTTP client
+from utils.extract_pool import run_extractor  # Off-loop HTML parsing
+from utils.checkpoints import Checkpoint  # Resume cursors
+from utils.dedup import dedup_key  # Rows remembered across runs of a city/mode
+from utils.progress import report_page, result_count  # Live job progress
+from utils.metrics import timed  # Stage timings
+
+# Pages fetched concurrently per window
+FETCH_WINDOW = int(os.getenv("SCOUTAI_MAGICBRICKS_WINDOW", "5"))
 
 # Fallback mapping using if-elif logic
 # This module scrapes property listings from MagicBricks and handles city name fallbacks
@@ -36,56 +45,25 @@ def sanitize_filename(name):
     return re.sub(r'[^a-zA-Z0-9_-]', '_', name)
 
 # Mimic a browser
-headers = {
-    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64)'  
-}
+headers = DEFAULT_HEADERS
 
-# Get HTML content from a URL
+# Get HTML content from a URL (shared keep-alive session)
 def fetch_webpage(url):  
-    try:
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-        return response.text
-    except Exception as e:
-        print(f"Error fetching {url}: {e}")
-        return None
-
-# Generate filename for storing progress
-def get_state_filename(city):  
-    return f"magicbricks_{sanitize_filename(city).lower()}_state.json"
-
-# Ask user if resume is needed and return saved page
-def get_resume_page(city):  
-    state_file = get_state_filename(city)
-    if os.path.exists(state_file):
-        choice = input(f"Resume scraping {city} from last saved page? (yes/no): ").strip().lower()
-        if choice == 'yes':
-            try:
-                with open(state_file, "r") as f:
-                    state = json.load(f)
-                    return state.get("last_page", 1)
-            except:
-                return 1
-        else:
-            os.remove(state_file)
-    return 1
-
-# Save the current page number
-def save_resume_page(city, page_number):  
-    state_file = get_state_filename(city)
-    try:
-        with open(state_file, "w") as f:
-            json.dump({"last_page": page_number}, f)
-    except Exception as e:
-        print(f"Could not save resume file: {e}")
+    return get_fetcher().fetch_sync(url)
 
 # Parse listings from one page
 def scrape_page(url):  
     page = fetch_webpage(url)
     if not page:
         return []
+    return parse_page(page)
+
+# Only listing cards are needed from the page (premium cards carry extra classes)
+CARD_STRAINER = class_strainer("div", "mb-srp__card")
 
-    soup = BeautifulSoup(page, "html.parser")
+# Extract listing cards from page HTML
+def parse_page(page):  
+    soup = make_soup(page, only=CARD_STRAINER)
     main_cards = soup.find_all('div', class_='mb-srp__card')
     all_card_data = []
 
@@ -115,26 +93,67 @@ def scrape_page(url):
 
     return all_card_data
 
-# Loop over all paginated pages
-def scrape_multiple_pages(base_url, city):  
+# Results announced in the page title ("560+ Commercial Properties for Rent in ..."), for the ETA
+def announced_results(body):  
+    match = re.search(r"<title[^>]*>(.*?)</title>", body or "", re.IGNORECASE | re.DOTALL)
+    return result_count(match.group(1)) if match else None
+
+# Build the URL of one result page
+def page_url(base_url, page):  
+    sep = "&" if "?" in base_url else "?"
+    return f"{base_url}{sep}page={page}"
+
+# Fetch result pages a window at a time and stop at the first empty page
+# With a sink, rows are streamed into it instead of being collected in memory
+# With a checkpoint, every completed page is recorded together with the sink offset
+async def scrape_pages_async(base_url, city, sink=None, start_page=1, window=FETCH_WINDOW, checkpoint=None):  
+    fetcher = get_fetcher()
     all_results = []
-    page = get_resume_page(city)
+    page = start_page
+    total_rows = None
 
     while True:
-        full_url = f"{base_url}&page={page}"
-        print(f"Scraping page {page}...")
-        page_data = scrape_page(full_url)
-
-        if not page_data:
-            print(f"Finished scraping. Total pages scraped: {page - 1}")
-            break
-
-        all_results.extend(page_data)
-        save_resume_page(city, page)
-        page += 1
-        time.sleep(2)
-
-    return all_results
+        numbers = list(range(page, page + window))
+        logging.info(f"Fetching MagicBricks pages {numbers[0]}-{numbers[-1]}")
+        with timed("fetch"):
+            bodies = await fetcher.fetch_many([page_url(base_url, n) for n in numbers])
+
+        for number, body in zip(numbers, bodies):
+            page_data = await run_extractor(parse_page, body) if body else []
+            if not page_data:
+                logging.info(f"Finished scraping. Total pages scraped: {number - 1}")
+                return all_results
+
+            if sink is not None:
+                sink.write_rows(page_data)
+            else:
+                all_results.extend(page_data)
+            if checkpoint is not None:
+                checkpoint.save(number, sink)
+            total_rows = total_rows or announced_results(body)
+            report_page(number, sink, nbytes=len(body), total_rows=total_rows)
+
+        page += window
+
+# Open a sink that continues after the checkpoint's last flushed row, if any
+def open_resumable_sink(path, resume, city=None, mode=None):  
+    return open_sink(path, append=resume is not None, resume_rows=resume and resume.get("rows_flushed", 0),
+                     dedup_key=dedup_key("magicbricks", city, mode))
+
+# Loop over all paginated pages (blocking wrapper for CLI use)
+def scrape_multiple_pages(base_url, city, sink=None, checkpoint=None, start_page=1):  
+    return asyncio.run(scrape_pages_async(base_url, city, sink=sink, start_page=start_page, checkpoint=checkpoint))
+
+# API entry point: scrape a MagicBricks search URL without a browser
+async def run(url, city, mode, output_format=OUTPUT_FORMAT):  
+    checkpoint = Checkpoint("magicbricks", city, mode, url=url)
+    resume = checkpoint.load()
+    fname = resume["output_file"] if resume and resume.get("output_file") else \
+        output_path(f"magicbricks_{sanitize_filename(city)}_{sanitize_filename(mode)}.{output_format}")
+    with open_resumable_sink(fname, resume, city, mode) as sink:
+        await scrape_pages_async(url, city, sink=sink, start_page=resume["page"] + 1 if resume else 1, checkpoint=checkpoint)
+    checkpoint.clear()
+    return {"rows": sink.rows_written, "duplicates": sink.rows_dropped, "output_file": fname}
 
 # Check if URL is for MagicBricks
 def can_handle(url: str) -> bool:  
@@ -172,13 +191,16 @@ if __name__ == "__main__":
             formatted_city = platform_city.replace(" ", "%20")
             city_url = base_url_template.format(formatted_city)
 
-            city_data = scrape_multiple_pages(city_url, platform_city)
-
-            if city_data:
-                df = pd.DataFrame(city_data)
-                filename = f"{sanitize_filename(original_city)}_Properties.xlsx"
-                full_path = os.path.join(save_dir, filename)
-                df.to_excel(full_path, index=False)
-                print(f"Saved {len(df)} records for {original_city} to {filename}")
+            filename = f"{sanitize_filename(original_city)}_Properties.xlsx"
+            full_path = os.path.join(save_dir, filename)
+            checkpoint = Checkpoint("magicbricks", platform_city, "commercial_rent", url=city_url)
+            resume = checkpoint.load()
+            with open_resumable_sink(full_path, resume, platform_city, "commercial_rent") as sink:
+                scrape_multiple_pages(city_url, platform_city, sink=sink, checkpoint=checkpoint,
+                                      start_page=resume["page"] + 1 if resume else 1)
+            checkpoint.clear()
+
+            if sink.rows_written:
+                print(f"Saved {sink.rows_written} records for {original_city} to {filename}")
             else:
                 print(f"No data collected for {original_city}")
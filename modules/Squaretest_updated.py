@@ -1,10 +1,14 @@
 import asyncio
-import pandas as pd
-import os
-import json
 import logging
-from bs4 import BeautifulSoup
-from playwright.async_api import async_playwright
+from utils.html_parser import make_soup, SoupStrainer
+from utils.browser_pool import browser_pool
+from utils.sinks import open_sink, output_path
+from utils.dedup import dedup_key
+from utils.browser_extract import extract_in_page
+from utils.readiness import wait_until_ready
+from utils.checkpoints import Checkpoint
+from utils.progress import report_page, report_error, page_count
+from utils.metrics import timed, current_platform
 
 # Setup logging to file and console
 def setup_logger():
@@ -20,7 +24,7 @@ def setup_logger():
 setup_logger()
 
 MAX_RETRIES = 1  # Maximum number of retries per city
-BATCH_SIZE = 100  # Number of records per Excel batch
+BATCH_SIZE = 100  # Number of records buffered before each flush
 
 # Detect if the URL is for SquareYards
 def can_handle(url: str) -> bool:
@@ -38,10 +42,14 @@ def get_mode_url_prefix(mode):
     else:
         raise ValueError("Invalid mode. Choose 'rent', 'buy', or 'commercial'.")
 
+# Only listing cards are needed from the page
+LISTING_STRAINER = SoupStrainer("article")
+LISTING_SELECTOR = "article.listing-card.horizontal.two-line-description"
+
 # Extract property listings from HTML content
 def extract_selected_fields(html):
-    soup = BeautifulSoup(html, 'html.parser')
-    listings = soup.select("article.listing-card.horizontal.two-line-description")
+    soup = make_soup(html, only=LISTING_STRAINER)
+    listings = soup.select(LISTING_SELECTOR)
     results = []
 
     for card in listings:
@@ -68,6 +76,23 @@ def extract_selected_fields(html):
         results.append(data)
     return results
 
+# Same fields as extract_selected_fields, evaluated inside the page
+CARD_JS = """
+(card) => {
+    const title = card.querySelector("h2.heading > a");
+    const body = card.querySelector("div.listing-body");
+    return {
+        Title: text(title),
+        URL: title && title.hasAttribute("href") ? title.getAttribute("href") : "",
+        "Listing Page URL": body && body.hasAttribute("data-url") ? body.getAttribute("data-url") : "",
+        Location: text(card.querySelector("p.location > span")),
+        Price: text(card.querySelector("p.listing-price")),
+        Information: text(card.querySelector("ul.listing-information")),
+        Description: text(card.querySelector("div.description.redirectReadMore")),
+    };
+}
+"""
+
 # Return fallback city name using if-elif logic
 def get_fallback_city(city):
     city = city.strip().lower()
@@ -86,143 +111,94 @@ def get_fallback_city(city):
     else:
         return city  # Default: no change
 
-# Resume state filename generator
-def get_state_filename(city, mode):
-    return f"{mode}_{city.replace(' ', '_').lower()}_state.json"
-
-# Delete old resume file
-def delete_resume_file(city, mode):
-    state_file = get_state_filename(city, mode)
-    if os.path.exists(state_file):
-        os.remove(state_file)
-        logging.info(f"Deleted resume state file: {state_file}")
-
-# Ask user whether to resume scraping from last page
-def get_resume_page(city, mode):
-    state_file = get_state_filename(city, mode)
-    if os.path.exists(state_file):
-        choice = input(f"Resume scraping {city} ({mode}) from last saved page? (yes/no): ").strip().lower()
-        if choice == 'yes':
-            try:
-                with open(state_file, "r") as f:
-                    state = json.load(f)
-                    return state.get("last_page", 1)
-            except:
-                return 1
-        else:
-            delete_resume_file(city, mode)
-            return 1
-    return 1
-
-# Save scraping progress
-def save_resume_page(city, mode, page_number):
-    state_file = get_state_filename(city, mode)
-    try:
-        with open(state_file, "w") as f:
-            json.dump({"last_page": page_number}, f)
-    except:
-        pass
-
-# Save a batch of listings to Excel
-def save_batch(city, mode, data, batch_num):
-    filename = f"{mode}_{city.replace(' ', '_').lower()}_batch_{batch_num}.xlsx"
-    try:
-        pd.DataFrame(data).to_excel(filename, index=False)
-        logging.info(f"Saved batch {batch_num} -> {filename} ({len(data)} rows)")
-    except Exception as e:
-        logging.error(f"Failed to save batch {batch_num}: {e}")
-
-# Combine all batch Excel files into one
-def combine_batches(city, mode):
-    city_prefix = f"{mode}_{city.replace(' ', '_').lower()}"
-    all_batches = [f for f in os.listdir() if f.startswith(city_prefix + "_batch_") and f.endswith(".xlsx")]
-    try:
-        combined_data = pd.concat([pd.read_excel(f) for f in sorted(all_batches)], ignore_index=True)
-        final_filename = f"{city_prefix}.xlsx"
-        combined_data.to_excel(final_filename, index=False)
-        logging.info(f"Combined all batches into {final_filename} ({len(combined_data)} rows)")
-        for f in all_batches:
-            try:
-                os.remove(f)
-                logging.info(f"Deleted batch file: {f}")
-            except Exception as e:
-                logging.warning(f"Failed to delete batch file {f}: {e}")
-    except Exception as e:
-        logging.error(f"Failed to combine batches for {city}: {e}")
+# Open the output sink; rows are flushed every BATCH_SIZE records
+# With a checkpoint, rows written after it are dropped and the rest appended to
+def open_output(city, mode, resume=None):
+    fname = resume["output_file"] if resume and resume.get("output_file") else \
+        output_path(f"{mode}_{city.replace(' ', '_').lower()}.segments")
+    return open_sink(fname, append=resume is not None, resume_rows=resume and resume.get("rows_flushed", 0),
+                     flush_every=BATCH_SIZE, dedup_key=dedup_key("squareyards", city, mode))
+
+# Click the numbered page links from page 1 up to the resume page
+async def skip_to_page(page, page_number):
+    for current in range(1, page_number):
+        next_btn = await page.query_selector(f"a[rel='nofollow']:has-text('{current+1}')")
+        if not next_btn:
+            raise RuntimeError(f"Could not reach page {page_number} to resume (stopped at {current})")
+        await next_btn.click()
+        await wait_until_ready(page, selector="article.listing-card", network_idle=True)
 
 # Main async function to scrape city listings
-async def scrape_city(city, mode, url_prefix, playwright):
+async def scrape_city(city, mode, url_prefix, headless=True):
     retries = 0
     original_city = city
-    page_number = get_resume_page(city, mode)
-    batch = []
-    batch_num = (page_number - 1) // BATCH_SIZE + 1
+    current_platform.set("squareyards")
     city_slug = city.strip().lower().replace(" ", "-")
     full_url = url_prefix + city_slug
+    checkpoint = Checkpoint("squareyards", original_city, mode, url=full_url)
 
     while retries < MAX_RETRIES:
+        # Every attempt continues from the last checkpoint, never from a partial page
+        resume = checkpoint.load()
+        page_number = resume["page"] + 1 if resume else 1
+        sink = open_output(original_city, mode, resume)
         try:
-            browser = await playwright.chromium.launch(headless=False, timeout=0)
-            context = await browser.new_context()
-            page = await context.new_page()
-
-            logging.info(f"Navigating to {full_url}")
-            response = await page.goto(full_url, timeout=0)
-
-            try:
-                await page.wait_for_selector("article.listing-card", timeout=10000)
-            except:
-                # Try fallback city if original fails
-                alt_city = get_fallback_city(city)
-                if alt_city and alt_city != city:
-                    logging.info(f"No listings found. Trying fallback city: {alt_city}")
-                    city = alt_city
-                    city_slug = city.strip().lower().replace(" ", "-")
-                    full_url = url_prefix + city_slug
+            async with browser_pool.page(headless=headless) as page:
+                logging.info(f"Navigating to {full_url}")
+                with timed("goto"):
                     response = await page.goto(full_url, timeout=0)
+
+                try:
                     await page.wait_for_selector("article.listing-card", timeout=10000)
-                else:
-                    logging.warning(f"No listings found and no fallback for {city}. Skipping.")
-                    await browser.close()
-                    return
-
-            # Loop over paginated listing pages
-            while True:
-                logging.info(f"Scraping Page {page_number} of {city} ({mode})")
-                html = await page.content()
-                new_data = extract_selected_fields(html)
-
-                if not new_data:
-                    logging.warning("No listings found on this page. Ending scrape.")
-                    break
-
-                batch.extend(new_data)
-                if len(batch) >= BATCH_SIZE:
-                    save_batch(city, mode, batch, batch_num)
-                    batch = []
-                    batch_num += 1
-
-                save_resume_page(city, mode, page_number)
-                logging.info(f"Progress saved at page {page_number}")
-
-                next_btn = await page.query_selector(f"a[rel='nofollow']:has-text('{page_number+1}')")
-                if next_btn:
-                    await next_btn.click()
-                    await page.wait_for_timeout(4000)
-                    page_number += 1
-                else:
-                    logging.info("No more pages.")
-                    break
-
-            if batch:
-                save_batch(city, mode, batch, batch_num)
-
-            await browser.close()
-            combine_batches(city, mode)
-            return
+                except:
+                    # Try fallback city if original fails
+                    alt_city = get_fallback_city(city)
+                    if alt_city and alt_city != city:
+                        logging.info(f"No listings found. Trying fallback city: {alt_city}")
+                        city = alt_city
+                        city_slug = city.strip().lower().replace(" ", "-")
+                        full_url = url_prefix + city_slug
+                        with timed("goto"):
+                            response = await page.goto(full_url, timeout=0)
+                        await page.wait_for_selector("article.listing-card", timeout=10000)
+                    else:
+                        logging.warning(f"No listings found and no fallback for {city}. Skipping.")
+                        sink.close()
+                        return {"rows": 0, "output_file": None}
+
+                await skip_to_page(page, page_number)
+
+                # Loop over paginated listing pages
+                while True:
+                    logging.info(f"Scraping Page {page_number} of {city} ({mode})")
+                    new_data = await extract_in_page(page, LISTING_SELECTOR, CARD_JS, extract_selected_fields)
+
+                    if not new_data:
+                        logging.warning("No listings found on this page. Ending scrape.")
+                        break
+
+                    sink.write_rows(new_data)
+                    checkpoint.save(page_number, sink)
+                    report_page(page_number, sink, total_pages=await page_count(page, "a[rel='nofollow']"))
+                    logging.info(f"Progress saved at page {page_number}")
+
+                    next_btn = await page.query_selector(f"a[rel='nofollow']:has-text('{page_number+1}')")
+                    if next_btn:
+                        await next_btn.click()
+                        await wait_until_ready(page, selector="article.listing-card", network_idle=True)
+                        page_number += 1
+                    else:
+                        logging.info("No more pages.")
+                        break
+
+            sink.close()
+            checkpoint.clear()
+            return {"rows": sink.rows_written, "duplicates": sink.rows_dropped, "output_file": sink.path}
 
         except Exception as e:
+            sink.abort()
             logging.error(f"Error scraping {city} (Retry {retries+1}/{MAX_RETRIES}): {e}")
+            report_error(f"Error scraping {city}: {e}")
         retries += 1
 
     logging.error(f"Failed to scrape {city} after {MAX_RETRIES} retries.")
@@ -2,22 +2,60 @@
 import logging
 from utils.logger import init_logger
 from strategies.pagination_handler import detect_and_paginate
+from strategies.scroll_handler import scroll_and_extract
 from strategies.instant_like_scraper import run_ids_mode
+from strategies.dom_analyzer import analyze_page, get_cached_structure
+from detect_platform_and_structure import detect_platform
+from modules import Magicbrick_updated
+from utils.headless_switcher import run_headless_first
+from utils.browser_pool import browser_pool
+from utils.metrics import timed, current_platform
 
 init_logger("universal_scraper.log")
 
+async def run_strategy(url, city, mode, structure, headless=True, page=None):
+    if structure["structure"] == "scroll":
+        return await scroll_and_extract(url, city, mode, headless=headless, page=page,
+                                        item_selector=structure.get("item_selector"))
+    return await detect_and_paginate(url, city, mode, headless=headless, page=page,
+                                     next_selector=structure.get("next_selector"))
+
+async def scrape_with_structure(url, city, mode, headless=True):
+    """
+    Picks the strategy from the cached DOM classification of the URL pattern.
+    On a cache miss the page loaded for the analysis is handed to the strategy,
+    so each job navigates once.
+    """
+    structure = get_cached_structure(url)
+    if structure:
+        return await run_strategy(url, city, mode, structure, headless=headless)
+
+    async with browser_pool.page(headless=headless) as page:
+        with timed("goto"):
+            await page.goto(url, timeout=60000)
+        structure = await analyze_page(page, url)
+        return await run_strategy(url, city, mode, structure, headless=headless, page=page)
+
 async def run(url, city, mode):
+    """
+    Runs the universal scrape and returns {"rows": <int>, "duplicates": <int>, "output_file": <path>}.
+    """
     print("Universal scraper activated.")
     logging.info(f"Started universal scrape → URL: {url}, City: {city}, Mode: {mode}")
+    platform = detect_platform(url)
+    current_platform.set(platform)  # label for stage timings (utils.metrics)
+
+    if platform == "magicbricks":
+        # Server-rendered listings: plain HTTP, no browser needed
+        return await Magicbrick_updated.run(url, city, mode)
 
     if city.lower() == "none" or mode.lower() == "none":
         logging.info("City or mode is 'none'. Running Instant Data Scraper fallback.")
-        await run_ids_mode(url)
-        return
+        return await run_headless_first(url, lambda headless: run_ids_mode(url, headless=headless))
 
     try:
-        await detect_and_paginate(url, city, mode)
+        return await run_headless_first(url, lambda headless: scrape_with_structure(url, city, mode, headless=headless))
     except Exception as e:
         logging.error(f"Pagination scraping failed: {e}")
         logging.info("Automatically falling back to Instant Data Scraper mode.")
-        await run_ids_mode(url)
+        return await run_headless_first(url, lambda headless: run_ids_mode(url, headless=headless))
@@ -1,17 +1,117 @@
-from playwright.async_api import async_playwright
-
-async def analyze_dom_structure(url):
-    async with async_playwright() as pw:
-        browser = await pw.chromium.launch(headless=True)
-        page = await browser.new_page()
-        await page.goto(url, timeout=60000)
-        html = await page.content()
-
-        if "Load More" in html or "Show More" in html:
-            return "scroll"
-        elif any(p in html for p in ["pagination", "page="]):
-            return "pagination"
-        elif "property-card" in html or "listing" in html:
-            return "scroll"
-        else:
-            return "unknown"
+import json
+import logging
+import os
+import re
+import threading
+import time
+from urllib.parse import urlparse
+from utils.browser_pool import browser_pool
+from utils.metrics import timed
+
+# Configuration (override through environment variables)
+DOM_CACHE_FILE = os.getenv("SCOUTAI_DOM_CACHE", os.path.join(".cache", "dom_structure.json"))
+DOM_CACHE_TTL = int(os.getenv("SCOUTAI_DOM_CACHE_TTL", str(60 * 60 * 24 * 7)))  # Seconds a classification is reused
+
+NEXT_CANDIDATES = ["a[rel='next']", ".pagination-next", "button.next", "button[aria-label='Next']", "a[aria-label='Next']"]
+ITEM_CANDIDATES = ["[class*='property-card']", "[class*='listing-card']", "article", "[class*='card']", "[class*='listing']", "li[class*='item']"]
+MIN_ITEMS = 3  # An item selector must repeat at least this often
+
+# Runs in the page: one pass over the candidate selectors instead of serializing the whole HTML
+CLASSIFY_JS = """
+([nextCandidates, itemCandidates, minItems]) => {
+    const next = nextCandidates.find(s => document.querySelector(s)) || null;
+    const items = itemCandidates.find(s => document.querySelectorAll(s).length >= minItems) || null;
+    const loadMore = [...document.querySelectorAll("button, a")].some(
+        el => /load more|show more/i.test(el.textContent || ""));
+    const pagination = !!document.querySelector("[class*='pagination'], a[href*='page=']");
+    return {next, items, loadMore, pagination};
+}
+"""
+
+_lock = threading.Lock()
+_cache = None
+
+
+def url_pattern(url):
+    """
+    Cache key: domain plus the first two path segments, digits generalised,
+    so every city/page of a listing section shares one classification.
+    """
+    parsed = urlparse(url)
+    host = parsed.hostname or ""
+    host = host[4:] if host.startswith("www.") else host
+    segments = [re.sub(r"\d+", "{n}", s) for s in parsed.path.split("/") if s][:2]
+    return "/".join([host] + segments)
+
+def _load():
+    global _cache
+    if _cache is None:
+        try:
+            with open(DOM_CACHE_FILE, "r", encoding="utf-8") as f:
+                _cache = json.load(f)
+        except (OSError, ValueError):
+            _cache = {}
+    return _cache
+
+def get_cached_structure(url):
+    """
+    Returns the cached classification for the URL's pattern, or None when
+    missing or older than DOM_CACHE_TTL.
+    """
+    with _lock:
+        entry = _load().get(url_pattern(url))
+    if entry and time.time() - entry.get("analyzed_at", 0) < DOM_CACHE_TTL:
+        return entry
+    return None
+
+def store_structure(url, structure):
+    with _lock:
+        _load()[url_pattern(url)] = structure
+        try:
+            folder = os.path.dirname(DOM_CACHE_FILE)
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+            tmp = f"{DOM_CACHE_FILE}.{os.getpid()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(_cache, f, indent=2)
+            os.replace(tmp, DOM_CACHE_FILE)
+        except OSError as e:
+            logging.warning(f"Could not persist DOM classification: {e}")
+
+async def analyze_page(page, url):
+    """
+    Classifies an already loaded page and caches the result for its URL pattern.
+
+    Returns:
+        dict: {"structure": "scroll" | "pagination" | "unknown",
+               "next_selector": str or None, "item_selector": str or None, "analyzed_at": int}
+    """
+    found = await page.evaluate(CLASSIFY_JS, [NEXT_CANDIDATES, ITEM_CANDIDATES, MIN_ITEMS])
+
+    if found["loadMore"]:
+        structure = "scroll"
+    elif found["next"] or found["pagination"]:
+        structure = "pagination"
+    elif found["items"]:
+        structure = "scroll"
+    else:
+        structure = "unknown"
+
+    result = {
+        "structure": structure,
+        "next_selector": found["next"],
+        "item_selector": found["items"],
+        "analyzed_at": int(time.time()),
+    }
+    store_structure(url, result)
+    logging.info(f"Classified {url_pattern(url)} as {structure}")
+    return result
+
+async def analyze_dom_structure(url, headless=True):
+    cached = get_cached_structure(url)
+    if cached:
+        return cached["structure"]
+    async with browser_pool.page(headless=headless) as page:
+        with timed("goto"):
+            await page.goto(url, timeout=60000)
+        return (await analyze_page(page, url))["structure"]
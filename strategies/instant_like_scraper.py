@@ -1,29 +1,31 @@
-import os
-import pandas as pd
-from bs4 import BeautifulSoup
-import pandas as pd
-from playwright.async_api import async_playwright
+from utils.html_parser import make_soup
+from utils.browser_pool import browser_pool
+from utils.sinks import open_sink, output_path, OUTPUT_FORMAT
+from utils.extract_pool import run_extractor
+from utils.progress import report_page
+from utils.metrics import timed
 
-async def run_ids_mode(url):
-    async with async_playwright() as pw:
-        browser = await pw.chromium.launch(headless=False)
-        page = await browser.new_page()
-        await page.goto(url)
+def extract_blocks(html):
+    soup = make_soup(html)
 
-        html = await page.content()
-        soup = BeautifulSoup(html, "html.parser")
+    tables = soup.find_all("table")
+    lists = soup.select("ul, ol")
+    divs = soup.select("div[class*=list], div[class*=card]")
 
-        tables = soup.find_all("table")
-        lists = soup.select("ul, ol")
-        divs = soup.select("div[class*=list], div[class*=card]")
+    elements = tables + lists + divs
+    return [{"Block": el.get_text(strip=True)} for el in elements]
 
-        elements = tables + lists + divs
-        results = [{"Block": el.get_text(strip=True)} for el in elements]
+async def run_ids_mode(url, output_format=OUTPUT_FORMAT, headless=True):
+    fname = output_path(f"instant_data_output.{output_format}")
+    async with browser_pool.page(headless=headless) as page:
+        with timed("goto"):
+            await page.goto(url)
 
-        df = pd.DataFrame(results)
-        fname = "output/instant_data_output.xlsx"
-        os.makedirs("output", exist_ok=True)
-        df.to_excel(fname, index=False)
-        print(f"Saved {len(df)} entries → {fname}")
-
-        await browser.close()
+        with timed("content"):
+            html = await page.content()
+        data = await run_extractor(extract_blocks, html)
+        with open_sink(fname) as sink:
+            sink.write_rows(data)
+            report_page(1, sink, total_pages=1)
+        print(f"Saved {sink.rows_written} entries → {fname}")
+        return {"rows": sink.rows_written, "duplicates": sink.rows_dropped, "output_file": fname}
@@ -1,39 +1,37 @@
-from bs4 import BeautifulSoup
-import pandas as pd
+from utils.template_learner import extract_page_rows
 import logging
-import os
-from playwright.async_api import async_playwright
+from utils.browser_pool import browser_pool
+from utils.sinks import open_sink, output_path, OUTPUT_FORMAT
+from utils.dedup import dedup_key
+from utils.metrics import current_platform
+from utils.readiness import wait_until_ready
+from utils.progress import report_page, page_count, announced_results
 
-async def detect_and_paginate(url, city, mode):
-    async with async_playwright() as pw:
-        browser = await pw.chromium.launch(headless=False)
-        page = await browser.new_page()
-        await page.goto(url)
+NEXT_SELECTOR = "a[rel='next'], .pagination-next, button.next"
 
-        all_data = []
+async def detect_and_paginate(url, city, mode, output_format=OUTPUT_FORMAT, headless=True, page=None, next_selector=None):
+    """
+    Pass `page` to reuse a page already loaded on `url` (e.g. by the DOM analyzer)
+    and `next_selector` when the next-page control is already known.
+    """
+    fname = output_path(f"{city}_{mode}_paginated.{output_format}")
+    async with browser_pool.navigate(url, page=page, headless=headless) as page:
         page_num = 1
+        total_rows = await announced_results(page)
 
-        while True:
-            await page.wait_for_timeout(2000)
-            html = await page.content()
-            soup = BeautifulSoup(html, "html.parser")
+        with open_sink(fname, dedup_key=dedup_key(current_platform.get(), city, mode)) as sink:
+            while True:
+                await wait_until_ready(page, count_selector="body *", network_idle=True)
+                data = await extract_page_rows(page, url)
+                sink.write_rows(data)
+                report_page(page_num, sink, total_pages=await page_count(page), total_rows=total_rows)
 
-            cards = soup.find_all("div")
-            data = [{"Text": card.get_text(strip=True)} for card in cards if card.get_text(strip=True)]
-            all_data.extend(data)
+                next_button = await page.query_selector(next_selector or NEXT_SELECTOR)
+                if next_button:
+                    await next_button.click()
+                    page_num += 1
+                    logging.info(f"Paginated to page {page_num}")
+                else:
+                    break
 
-            next_button = await page.query_selector("a[rel='next'], .pagination-next, button.next")
-            if next_button:
-                await next_button.click()
-                page_num += 1
-                logging.info(f"Paginated to page {page_num}")
-            else:
-                break
-
-        df = pd.DataFrame(all_data)
-        os.makedirs("output", exist_ok=True)
-        fname = f"output/{city}_{mode}_paginated.xlsx"
-        df.to_excel(fname, index=False)
-        logging.info(f"Saved {len(df)} rows → {fname}")
-
-        await browser.close()
\ No newline at end of file
+        return {"rows": sink.rows_written, "duplicates": sink.rows_dropped, "output_file": fname}
@@ -1,28 +1,54 @@
-from bs4 import BeautifulSoup
-import pandas as pd
 import logging
-import os
-from playwright.async_api import async_playwright
+from utils.browser_pool import browser_pool
+from utils.sinks import open_sink, output_path, OUTPUT_FORMAT
+from utils.dedup import dedup_key
+from utils.metrics import current_platform
+from utils.template_learner import extract_listing_rows, extract_page_rows, get_template, template_card_js
+from utils.readiness import wait_for_count, GROWTH_TIMEOUT_MS
+from utils.scroll_harvester import harvest_scroll
+from utils.browser_extract import cards_document
+from utils.progress import report_page, announced_results
 
-async def scroll_and_extract(url, city, mode):
-    async with async_playwright() as pw:
-        browser = await pw.chromium.launch(headless=False)
-        page = await browser.new_page()
-        await page.goto(url)
+MAX_SCROLLS = 10  # Only used when no listing selector is known
 
-        for i in range(10):
-            await page.mouse.wheel(0, 3000)
-            await page.wait_for_timeout(2000)
+async def scroll_and_extract(url, city, mode, output_format=OUTPUT_FORMAT, headless=True, page=None, item_selector=None):
+    """
+    Pass `page` to reuse a page already loaded on `url` and `item_selector`
+    when the listing card selector is already known.
 
-        html = await page.content()
-        soup = BeautifulSoup(html, "html.parser")
+    With a card selector (given, or from the domain's extraction template),
+    cards are harvested incrementally as they are inserted. Otherwise the page
+    is scrolled until it stops growing and serialized once.
+    """
+    fname = output_path(f"{city}_{mode}_scroll_scraped.{output_format}")
+    template = get_template(url) or {}
+    card_js = None
+    if template.get("container"):
+        # Cards of a learned template are extracted inside the page
+        item_selector, card_js = template["container"], template_card_js(template)
+    async with browser_pool.navigate(url, page=page, headless=headless) as page:
+        total_rows = await announced_results(page)
+        with open_sink(fname, dedup_key=dedup_key(current_platform.get(), city, mode)) as sink:
+            if item_selector:
+                async def on_cards(cards):
+                    sink.write_rows([c for c in cards if isinstance(c, dict)])
+                    markup = [c for c in cards if isinstance(c, str)]
+                    if markup:
+                        sink.write_rows(await extract_listing_rows(url, cards_document(markup)))
+                    report_page(sink=sink, total_rows=total_rows)  # one "page" per harvested batch
 
-        blocks = soup.find_all("div")
-        data = [{"Text": b.get_text(strip=True)} for b in blocks if b.get_text(strip=True)]
+                await harvest_scroll(page, item_selector, on_cards, card_js=card_js)
+            else:
+                count = await wait_for_count(page, "body *")
+                for i in range(MAX_SCROLLS):
+                    await page.mouse.wheel(0, 3000)
+                    grown = await wait_for_count(page, "body *", above=count, timeout=GROWTH_TIMEOUT_MS)
+                    if grown <= count:
+                        logging.info(f"Nothing new after scroll {i + 1}; stopping.")
+                        break
+                    count = grown
 
-        df = pd.DataFrame(data)
-        fname = os.path.join("output", f"{city}_{mode}_scroll_scraped.xlsx")
-        os.makedirs("output", exist_ok=True)
-        df.to_excel(fname, index=False)
-        logging.info(f"Saved {len(df)} rows → {fname}")
-        await browser.close()
+                sink.write_rows(await extract_page_rows(page, url))
+                report_page(1, sink, total_pages=1)
+
+        return {"rows": sink.rows_written, "duplicates": sink.rows_dropped, "output_file": fname}
@@ -0,0 +1,17 @@
+import os
+import sys
+
+import pytest
+
+# Tests import the app packages from the repo root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    """
+    Runs each test in its own directory, so relative outputs (output/,
+    .cache/dedup) never land in the repo.
+    """
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
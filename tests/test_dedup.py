@@ -0,0 +1,81 @@
+import os
+
+from utils.dedup import (
+    BloomFilter,
+    RowDeduplicator,
+    ScalableBloomFilter,
+    dedup_key,
+    normalize_url,
+    row_key,
+    state_path_for,
+)
+from utils.sinks import open_sink
+
+
+def test_normalize_url_drops_tracking_params_and_trailing_slash():
+    assert normalize_url(" HTTPS://Example.com/p/1/?utm_source=x&b=2&a=1&fbclid=y#top ") == "https://example.com/p/1?a=1&b=2"
+
+
+def test_row_key_prefers_the_listing_url():
+    assert row_key({"URL": "https://x.com/p/1?gclid=z", "Price": "10"}) == row_key({"url": "https://x.com/p/1", "Price": "12"})
+
+
+def test_row_key_normalizes_values_without_a_url():
+    a = row_key({"Title": "  2 BHK   Flat ", "Price": "10", "Empty": None})
+    b = row_key({"Price": "10", "Title": "2 bhk flat"})
+    assert a == b
+    assert a != row_key({"Title": "2 bhk flat", "Price": "11"})
+
+
+def test_scalable_bloom_filter_grows_past_its_capacity():
+    bloom = ScalableBloomFilter(capacity=100)
+    keys = [f"key-{i}" for i in range(1000)]
+    for key in keys:
+        bloom.add(key)
+
+    assert len(bloom.filters) > 1
+    assert all(f.count <= f.capacity for f in bloom.filters)
+    assert all(key in bloom for key in keys)
+    false_positives = sum(f"other-{i}" in bloom for i in range(10000))
+    assert false_positives < 10
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(capacity=50)
+    for i in range(50):
+        bloom.add(str(i))
+    assert all(str(i) in bloom for i in range(50))
+
+
+def test_deduplicator_state_round_trips():
+    path = state_path_for(dedup_key("site", "Delhi", "buy"))
+    first = RowDeduplicator(path, capacity=10, window=2)
+    for i in range(30):
+        assert not first.is_duplicate({"url": f"https://x.com/{i}"})
+    first.save()
+
+    second = RowDeduplicator(path, resume=True, capacity=10, window=2)
+    assert second.is_duplicate({"url": "https://x.com/5"})
+    assert not second.is_duplicate({"url": "https://x.com/new"})
+    assert second.probable == 1
+
+    second.discard()
+    assert not os.path.exists(path)
+
+
+def test_keyed_dedup_carries_over_to_later_runs():
+    key = dedup_key("site", "delhi", "buy")
+    with open_sink("run1.jsonl", dedup=True, dedup_key=key) as sink:
+        sink.write_rows({"url": f"https://x.com/{i}"} for i in range(5))
+    with open_sink("run2.jsonl", dedup=True, dedup_key=key) as sink:
+        sink.write_rows({"url": f"https://x.com/{i}"} for i in range(8))
+
+    assert sink.rows_written == 3
+    assert sink.rows_dropped == 5
+
+
+def test_unkeyed_dedup_state_is_removed_on_close():
+    with open_sink("out.jsonl", dedup=True) as sink:
+        sink.write({"url": "https://x.com/1"})
+
+    assert not os.path.exists(state_path_for("out.jsonl"))
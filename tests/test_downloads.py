@@ -0,0 +1,70 @@
+import pytest
+from fastapi import HTTPException
+
+from app import downloads
+from app.downloads import _parse_range, negotiate_format
+
+
+def test_format_parameter_wins_over_accept():
+    assert negotiate_format("CSV", "application/x-ndjson") == "csv"
+
+
+def test_unknown_format_parameter_is_rejected():
+    with pytest.raises(HTTPException) as e:
+        negotiate_format("pdf", None)
+    assert e.value.status_code == 400
+
+
+def test_accept_entry_with_highest_q_wins():
+    accept = "text/csv;q=0.5, application/x-ndjson;q=0.9, */*;q=0.1"
+    assert negotiate_format(None, accept) == "jsonl"
+
+
+def test_accept_ties_go_to_the_first_entry():
+    assert negotiate_format(None, "application/x-ndjson, text/csv") == "jsonl"
+
+
+def test_accept_entries_with_q_zero_are_ignored():
+    assert negotiate_format(None, "text/csv;q=0, application/x-ndjson;q=bad") == downloads.DOWNLOAD_FORMAT
+
+
+def test_default_format_without_a_known_accept_entry():
+    assert negotiate_format(None, "*/*") == downloads.DOWNLOAD_FORMAT
+    assert negotiate_format(None, None) == downloads.DOWNLOAD_FORMAT
+
+
+def test_parquet_is_refused_without_pyarrow(monkeypatch):
+    monkeypatch.setattr(downloads, "format_available", lambda fmt: fmt != "parquet")
+
+    with pytest.raises(HTTPException) as e:
+        negotiate_format("parquet", None)
+    assert e.value.status_code == 406
+    with pytest.raises(HTTPException) as e:
+        negotiate_format(None, "application/vnd.apache.parquet")
+    assert e.value.status_code == 406
+    assert negotiate_format(None, "application/vnd.apache.parquet, text/csv;q=0.5") == "csv"
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-99", (0, 99)),
+    ("bytes=100-", (100, 999)),
+    ("bytes=-200", (800, 999)),
+    ("bytes=-5000", (0, 999)),
+    ("bytes=900-5000", (900, 999)),
+    (" bytes=0-0 ", (0, 0)),
+])
+def test_parse_range(header, expected):
+    assert _parse_range(header, 1000) == expected
+
+
+@pytest.mark.parametrize("header", ["bytes=0-10,20-30", "items=0-10", "bytes=-", "bytes=a-b"])
+def test_unsupported_ranges_send_the_whole_file(header):
+    assert _parse_range(header, 1000) is None
+
+
+@pytest.mark.parametrize("header", ["bytes=1000-", "bytes=50-10"])
+def test_unsatisfiable_range(header):
+    with pytest.raises(HTTPException) as e:
+        _parse_range(header, 1000)
+    assert e.value.status_code == 416
+    assert e.value.headers["Content-Range"] == "bytes */1000"
@@ -0,0 +1,63 @@
+import os
+
+from utils.sinks import export_rows, open_sink, read_columns, read_manifest, read_rows
+
+
+def test_rows_roll_over_into_new_segments():
+    with open_sink("out", fmt="segments", dedup=False, segment_rows=3, flush_every=2) as sink:
+        sink.write_rows({"n": i} for i in range(7))
+
+    manifest = read_manifest("out")
+    assert manifest["complete"] is True
+    assert manifest["rows"] == 7
+    assert [s["rows"] for s in manifest["segments"]] == [3, 3, 1]
+    assert [row["n"] for row in read_rows("out")] == list(range(7))
+
+
+def test_resume_truncates_across_segments():
+    sink = open_sink("out", fmt="segments", dedup=False, segment_rows=3, flush_every=1)
+    sink.write_rows({"n": i} for i in range(4))
+    offset = sink.checkpoint()
+    sink.write_rows({"n": i, "late": "x"} for i in range(4, 8))
+    sink.abort()
+    assert read_manifest("out")["complete"] is False
+
+    with open_sink("out", fmt="segments", dedup=False, append=True, resume_rows=offset, segment_rows=3) as sink:
+        sink.write({"n": 100})
+
+    assert [row["n"] for row in read_rows("out")] == [0, 1, 2, 3, 100]
+    assert sorted(os.listdir("out")) == ["manifest.json", "part-00000.jsonl", "part-00001.jsonl"]
+    # the column only brought by dropped rows is forgotten
+    assert read_columns("out") == ["n"]
+
+
+def test_resume_keeps_rows_written_after_the_last_manifest_update():
+    sink = open_sink("out", fmt="segments", dedup=False, segment_rows=10, flush_every=1)
+    sink.write_rows({"n": i} for i in range(3))
+    sink.abort()
+
+    with open_sink("out", fmt="segments", dedup=False, append=True) as sink:
+        sink.write({"n": 3})
+
+    assert read_manifest("out")["rows"] == 4
+    assert [row["n"] for row in read_rows("out")] == [0, 1, 2, 3]
+
+
+def test_reopening_without_append_starts_over():
+    with open_sink("out", fmt="segments", dedup=False) as sink:
+        sink.write({"n": 1})
+    with open_sink("out", fmt="segments", dedup=False) as sink:
+        sink.write({"n": 2})
+
+    assert list(read_rows("out")) == [{"n": 2}]
+
+
+def test_export_to_jsonl_concatenates_segments():
+    with open_sink("out", fmt="segments", dedup=False, segment_rows=2) as sink:
+        sink.write_rows({"n": i} for i in range(5))
+
+    export_rows("out", "out.jsonl")
+    export_rows("out", "out.csv")
+
+    assert [row["n"] for row in read_rows("out.jsonl")] == list(range(5))
+    assert [row["n"] for row in read_rows("out.csv")] == [str(i) for i in range(5)]
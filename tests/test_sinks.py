@@ -0,0 +1,66 @@
+import csv
+import json
+
+from utils.sinks import open_sink, read_rows
+
+
+def read_csv(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        return list(csv.reader(f))
+
+
+def test_csv_header_rewritten_when_a_later_row_adds_a_column():
+    with open_sink("out.csv", dedup=False, flush_every=1) as sink:
+        sink.write({"Title": "Flat 1", "Price": "10"})
+        sink.write({"Title": "Flat 2", "Price": "20", "Area": "900"})
+
+    assert read_csv("out.csv") == [
+        ["Title", "Price", "Area"],
+        ["Flat 1", "10"],
+        ["Flat 2", "20", "900"],
+    ]
+    assert list(read_rows("out.csv"))[1] == {"Title": "Flat 2", "Price": "20", "Area": "900"}
+
+
+def test_csv_header_written_once_when_columns_are_stable():
+    with open_sink("out.csv", dedup=False, flush_every=2) as sink:
+        sink.write_rows({"Title": f"Flat {i}", "Price": str(i)} for i in range(5))
+
+    records = read_csv("out.csv")
+    assert records[0] == ["Title", "Price"]
+    assert len(records) == 6
+
+
+def test_csv_resume_drops_rows_after_the_checkpoint():
+    sink = open_sink("out.csv", dedup=False, flush_every=1)
+    sink.write_rows([{"Title": "A"}, {"Title": "B\nwith a line break"}])
+    offset = sink.checkpoint()
+    sink.write({"Title": "lost"})
+    sink.abort()
+
+    with open_sink("out.csv", dedup=False, append=True, resume_rows=offset) as sink:
+        sink.write({"Title": "C"})
+
+    assert [row["Title"] for row in read_rows("out.csv")] == ["A", "B\nwith a line break", "C"]
+
+
+def test_jsonl_resume_drops_rows_after_the_checkpoint():
+    sink = open_sink("out.jsonl", dedup=False, flush_every=1)
+    sink.write_rows([{"n": 1}, {"n": 2}])
+    offset = sink.checkpoint()
+    sink.write({"n": 3})
+    sink.abort()
+
+    with open_sink("out.jsonl", dedup=False, append=True, resume_rows=offset) as sink:
+        sink.write({"n": 4})
+
+    with open("out.jsonl", encoding="utf-8") as f:
+        assert [json.loads(line)["n"] for line in f] == [1, 2, 4]
+
+
+def test_sink_drops_duplicate_rows():
+    with open_sink("out.jsonl", dedup=True) as sink:
+        sink.write_rows([{"URL": "https://x.com/p/1?utm_source=a"}, {"URL": "https://X.com/p/1/"}, {"URL": "https://x.com/p/2"}])
+
+    assert sink.rows_written == 2
+    assert sink.rows_dropped == 1
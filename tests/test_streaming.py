@@ -0,0 +1,109 @@
+import pytest
+
+from app.jobs import parse_stream_position
+from utils.sinks import RowTail, open_sink
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("2:150", (2, 150)),
+    ("0:0", (0, 0)),
+    ("42", (0, 42)),
+    (" 1:7 ", (1, 7)),
+    (None, (0, 0)),
+    ("", (0, 0)),
+    ("a:5", (0, 0)),
+    ("1:x", (0, 0)),
+    ("-1:5", (0, 0)),
+    ("1:2:3", (0, 0)),
+])
+def test_parse_stream_position(value, expected):
+    assert parse_stream_position(value) == expected
+
+
+@pytest.mark.parametrize("path, options", [("out", {"fmt": "segments", "segment_rows": 3}), ("out.jsonl", {})])
+def test_tail_follows_a_growing_output(path, options):
+    sink = open_sink(path, dedup=False, flush_every=1, **options)
+    tail = RowTail(path)
+    sink.write_rows({"n": i} for i in range(4))
+    assert [row["n"] for row in tail.read(limit=10)] == [0, 1, 2, 3]
+    sink.write_rows({"n": i} for i in range(4, 8))
+    sink.close()
+
+    assert [row["n"] for row in tail.read(limit=3)] == [4, 5, 6]
+    assert [row["n"] for row in tail.read(limit=3)] == [7]
+    assert tail.offset == 8
+    assert tail.reset_to is None
+
+
+def test_tail_resumes_at_an_offset():
+    with open_sink("out", fmt="segments", dedup=False, segment_rows=2) as sink:
+        sink.write_rows({"n": i} for i in range(5))
+
+    tail = RowTail("out", offset=3)
+    assert [row["n"] for row in tail.read()] == [3, 4]
+
+
+def test_tail_leaves_a_half_written_line_for_later():
+    with open("out.jsonl", "w", encoding="utf-8") as f:
+        f.write('{"n": 0}\n{"n": ')
+    tail = RowTail("out.jsonl")
+    assert tail.read() == [{"n": 0}]
+    with open("out.jsonl", "a", encoding="utf-8") as f:
+        f.write('1}\n')
+    assert tail.read() == [{"n": 1}]
+
+
+@pytest.mark.parametrize("fmt, path", [("segments", "out"), ("jsonl", "out.jsonl")])
+def test_tail_restarts_when_the_output_is_recreated(fmt, path):
+    with open_sink(path, fmt=fmt, dedup=False) as sink:
+        sink.write_rows({"n": i} for i in range(5))
+    tail = RowTail(path)
+    assert len(tail.read()) == 5
+
+    with open_sink(path, fmt=fmt, dedup=False) as sink:
+        sink.write_rows({"n": i} for i in range(10, 12))
+
+    assert [row["n"] for row in tail.read()] == [10, 11]
+    assert tail.reset_to == 0
+
+
+@pytest.mark.parametrize("fmt, path", [("segments", "out"), ("jsonl", "out.jsonl")])
+def test_tail_rewinds_to_the_checkpoint_after_truncation(fmt, path):
+    sink = open_sink(path, fmt=fmt, dedup=False, flush_every=1)
+    sink.write_rows({"n": i} for i in range(3))
+    offset = sink.checkpoint()
+    sink.write_rows({"n": i} for i in range(3, 6))
+    sink.abort()
+    tail = RowTail(path)
+    assert len(tail.read()) == 6
+
+    with open_sink(path, fmt=fmt, dedup=False, append=True, resume_rows=offset) as sink:
+        sink.write({"n": 100})
+
+    assert [row["n"] for row in tail.read()] == [100]
+    assert tail.reset_to == 3
+    assert tail.offset == 4
+
+
+def test_tail_keeps_its_offset_when_kept_rows_cover_it():
+    sink = open_sink("out.jsonl", dedup=False, flush_every=1)
+    sink.write_rows({"n": i} for i in range(4))
+    offset = sink.checkpoint()
+    sink.abort()
+    tail = RowTail("out.jsonl")
+    assert len(tail.read(limit=2)) == 2
+
+    with open_sink("out.jsonl", dedup=False, append=True, resume_rows=offset) as sink:
+        sink.write({"n": 4})
+
+    assert [row["n"] for row in tail.read()] == [2, 3, 4]
+    assert tail.reset_to is None
+
+
+def test_tail_reads_other_formats_once_complete():
+    with open_sink("out.csv", dedup=False) as sink:
+        sink.write_rows({"n": i} for i in range(3))
+
+    tail = RowTail("out.csv", offset=1)
+    assert tail.read() == []
+    assert [row["n"] for row in tail.read(complete=True)] == ["1", "2"]
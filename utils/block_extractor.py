@@ -0,0 +1,60 @@
+import re
+from bs4.element import NavigableString, PreformattedString, CData
+from utils.html_parser import make_soup
+
+# Elements that start a new content block; inline tags inside them are folded into their text
+BLOCK_TAGS = {
+    "address", "article", "aside", "blockquote", "dd", "details", "div", "dl", "dt", "fieldset",
+    "figcaption", "figure", "footer", "form", "h1", "h2", "h3", "h4", "h5", "h6", "header", "li",
+    "main", "nav", "ol", "p", "pre", "section", "summary", "table", "tbody", "td", "tfoot", "th",
+    "thead", "tr", "ul", "body",
+}
+# Never contain listing text
+SKIP_TAGS = {"script", "style", "noscript", "template", "svg", "head", "iframe", "select", "option"}
+
+MEANINGFUL = re.compile(r"\w")
+
+def extract_content_blocks(html):
+    """
+    Splits a page into leaf content blocks in a single walk over the tree.
+
+    Every text node is assigned to its nearest block-level ancestor, so each
+    piece of text is emitted exactly once, however deeply the divs nest. Links
+    found inside a block are returned with it. Blocks without any letters or
+    digits (separators, icons) are dropped.
+
+    Returns:
+        list[dict]: {"Text": ..., "Link": ...} rows in document order.
+    """
+    soup = make_soup(html)
+    root = soup.body or soup
+    blocks = []
+    stack = [(root, None)]
+
+    while stack:
+        node, block = stack.pop()
+
+        if isinstance(node, NavigableString):
+            if isinstance(node, PreformattedString) and not isinstance(node, CData):
+                continue  # comments, doctype, processing instructions
+            text = node.strip()
+            if text and block is not None:
+                block["parts"].append(text)
+            continue
+
+        if node.name in SKIP_TAGS:
+            continue
+        if node.name in BLOCK_TAGS or block is None:
+            block = {"parts": [], "links": []}
+            blocks.append(block)
+        if node.name == "a" and node.get("href"):
+            block["links"].append(node["href"])
+
+        stack.extend((child, block) for child in reversed(node.contents))
+
+    rows = []
+    for block in blocks:
+        text = " ".join(block["parts"])
+        if MEANINGFUL.search(text):
+            rows.append({"Text": text, "Link": block["links"][0] if block["links"] else ""})
+    return rows
@@ -0,0 +1,71 @@
+import json
+import logging
+import os
+from utils.extract_pool import run_extractor
+from utils.metrics import timed
+
+# Run field selectors inside the page and ship JSON rows instead of the
+# serialized DOM (SCOUTAI_BROWSER_EXTRACT=0 always parses HTML in Python).
+BROWSER_EXTRACT = os.getenv("SCOUTAI_BROWSER_EXTRACT", "1") != "0"
+
+# In-page equivalent of BeautifulSoup's get_text(sep, strip=True)
+TEXT_JS = """
+(el, sep = "") => {
+    if (!el) return "";
+    const parts = [];
+    const walker = document.createTreeWalker(el, NodeFilter.SHOW_TEXT);
+    for (let n = walker.nextNode(); n; n = walker.nextNode()) {
+        const parent = n.parentElement && n.parentElement.tagName;
+        if (parent === "SCRIPT" || parent === "STYLE" || parent === "TEMPLATE") continue;
+        const t = n.nodeValue.trim();
+        if (t) parts.push(t);
+    }
+    return parts.join(sep);
+}
+"""
+
+
+def cards_document(cards):
+    """
+    Wraps card markup into a document the usual extractors accept.
+    """
+    return "<html><body>" + "".join(cards) + "</body></html>"
+
+def page_rows_js(selector, card_js):
+    """
+    Builds an evaluate() function that maps `card_js` over every element
+    matching `selector`. `card_js` is a JS function `(card) => row` and may
+    call `text(el, sep)`.
+    """
+    return (
+        f"() => {{ const text = {TEXT_JS}; const extract = {card_js}; "
+        f"return Array.from(document.querySelectorAll({json.dumps(selector)})).map(extract); }}"
+    )
+
+async def extract_in_page(page, selector, card_js, fallback, *args):
+    """
+    Extracts rows for every card on the page. Runs `card_js` in the browser
+    when BROWSER_EXTRACT is on; otherwise, or if that fails, serializes the
+    page and runs `fallback(html, *args)` in the extraction pool.
+    """
+    if BROWSER_EXTRACT:
+        try:
+            with timed("extract"):
+                return await page.evaluate(page_rows_js(selector, card_js))
+        except Exception as e:
+            logging.warning(f"In-page extraction failed, parsing HTML instead: {e}")
+    with timed("content"):
+        html = await page.content()
+    return await run_extractor(fallback, html, *args)
+
+async def rows_from_cards(cards, fallback, *args):
+    """
+    Harvested cards are rows already extracted in the page, or outerHTML
+    strings when no in-page extractor was used or it failed on that card;
+    the latter are parsed with `fallback(html, *args)`.
+    """
+    rows = [c for c in cards if isinstance(c, dict)]
+    markup = [c for c in cards if isinstance(c, str)]
+    if markup:
+        rows += await run_extractor(fallback, cards_document(markup), *args)
+    return rows
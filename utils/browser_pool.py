@@ -0,0 +1,168 @@
+import asyncio
+import logging
+import os
+from contextlib import asynccontextmanager
+from playwright.async_api import async_playwright
+from utils.resource_blocker import install_blocking
+from utils.readiness import track_network
+from utils.metrics import timed
+
+# Configuration (override through environment variables)
+MAX_CONTEXTS = int(os.getenv("SCOUTAI_MAX_CONTEXTS", "4"))             # Concurrent contexts across all jobs
+MAX_BROWSER_USES = int(os.getenv("SCOUTAI_MAX_BROWSER_USES", "50"))    # Contexts served before a browser is recycled
+LAUNCH_ARGS = ["--disable-dev-shm-usage"]
+
+
+class _BrowserSlot:
+    """Bookkeeping for one launched Chromium instance."""
+
+    def __init__(self, browser, headless):
+        self.browser = browser
+        self.headless = headless
+        self.uses = 0
+        self.leases = 0
+        self.retired = False
+
+
+class BrowserPool:
+    """
+    Process-wide Playwright browser pool.
+
+    One Chromium per headless/headful flavour is launched once and shared by
+    every job. Each borrower gets its own fresh browser context, so cookies and
+    storage never leak between jobs. A browser is recycled after it has served
+    `max_uses` contexts, or as soon as it disconnects or one of its pages crashes.
+    At most `max_contexts` contexts are open at any time; extra borrowers wait.
+    """
+
+    def __init__(self, max_contexts=MAX_CONTEXTS, max_uses=MAX_BROWSER_USES):
+        self.max_contexts = max_contexts
+        self.max_uses = max_uses
+        self._playwright = None
+        self._slots = {}
+        self._lock = asyncio.Lock()
+        self._semaphore = asyncio.Semaphore(max_contexts)
+
+    async def start(self, headless=True):
+        """
+        Starts Playwright and pre-warms a browser so the first job does not pay launch cost.
+        """
+        async with self._lock:
+            await self._current_slot(headless)
+        logging.info(f"Browser pool ready (headless={headless}, max_contexts={self.max_contexts})")
+
+    async def stop(self):
+        """
+        Closes every browser and stops Playwright.
+        """
+        async with self._lock:
+            for slot in list(self._slots.values()):
+                await self._close_slot(slot)
+            self._slots = {}
+            if self._playwright is not None:
+                await self._playwright.stop()
+                self._playwright = None
+
+    async def _current_slot(self, headless):
+        # Caller must hold self._lock
+        if self._playwright is None:
+            self._playwright = await async_playwright().start()
+
+        slot = self._slots.get(headless)
+        if slot is not None and (slot.retired or not slot.browser.is_connected() or slot.uses >= self.max_uses):
+            self._retire(slot)
+            slot = None
+
+        if slot is None:
+            with timed("browser_launch"):
+                browser = await self._playwright.chromium.launch(headless=headless, args=LAUNCH_ARGS)
+            slot = _BrowserSlot(browser, headless)
+            self._slots[headless] = slot
+            logging.info(f"Launched pooled browser (headless={headless})")
+        return slot
+
+    def _retire(self, slot):
+        slot.retired = True
+        if self._slots.get(slot.headless) is slot:
+            del self._slots[slot.headless]
+        if slot.leases == 0:
+            asyncio.ensure_future(self._close_slot(slot))
+
+    async def _close_slot(self, slot):
+        try:
+            await slot.browser.close()
+        except Exception as e:
+            logging.warning(f"Failed to close pooled browser: {e}")
+
+    async def _acquire(self, headless):
+        async with self._lock:
+            slot = await self._current_slot(headless)
+            slot.uses += 1
+            slot.leases += 1
+            return slot
+
+    async def _release(self, slot, crashed):
+        async with self._lock:
+            slot.leases -= 1
+            if crashed or not slot.browser.is_connected():
+                logging.warning("Pooled browser crashed or disconnected; recycling it.")
+                slot.retired = True
+            if slot.retired or slot.uses >= self.max_uses:
+                self._retire(slot)
+
+    @asynccontextmanager
+    async def context(self, headless=True, block_resources=True, **context_kwargs):
+        """
+        Borrows an isolated browser context. It is closed when the block exits.
+
+        Args:
+            headless (bool): Which browser flavour to borrow from.
+            block_resources (bool): Abort images, fonts, ads etc. (see utils.resource_blocker).
+            **context_kwargs: Passed through to `browser.new_context`.
+        """
+        async with self._semaphore:
+            slot = await self._acquire(headless)
+            crashed = []
+            context = None
+            try:
+                with timed("browser_context"):
+                    context = await slot.browser.new_context(**context_kwargs)
+                if block_resources:
+                    await install_blocking(context)
+                context.on("page", lambda p: p.on("crash", lambda _: crashed.append(p)))
+                yield context
+            finally:
+                if context is not None:
+                    try:
+                        await context.close()
+                    except Exception:
+                        crashed.append(context)
+                await self._release(slot, bool(crashed))
+
+    @asynccontextmanager
+    async def page(self, headless=True, block_resources=True, **context_kwargs):
+        """
+        Shortcut for borrowing a context and opening a single page in it.
+        """
+        async with self.context(headless=headless, block_resources=block_resources, **context_kwargs) as context:
+            page = await context.new_page()
+            track_network(page)
+            yield page
+
+    @asynccontextmanager
+    async def navigate(self, url, page=None, headless=True, **goto_kwargs):
+        """
+        Yields `page` as is when the caller already has it loaded on `url`,
+        otherwise borrows a page and navigates it there.
+        """
+        if page is not None:
+            yield page
+            return
+        async with self.page(headless=headless) as page:
+            with timed("goto"):
+                await page.goto(url, **goto_kwargs)
+            yield page
+
+
+# Shared instance used by strategies, platform modules and the API servers
+browser_pool = BrowserPool()
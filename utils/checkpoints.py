@@ -0,0 +1,194 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import time
+import weakref
+from utils.sinks import JOB_OUTPUT_DIR, current_job_id, output_path
+
+# Configuration (override through environment variables)
+CHECKPOINT_DIR = os.getenv("SCOUTAI_CHECKPOINT_DIR", os.path.join(".cache", "checkpoints"))
+CHECKPOINT_TTL = int(os.getenv("SCOUTAI_CHECKPOINT_TTL_DAYS", "7")) * 24 * 60 * 60  # Abandoned checkpoints expire
+
+# Crawls in progress in this process, by checkpoint file. An entry disappears
+# with its Checkpoint object, i.e. when the scrape that created it returns.
+_active = weakref.WeakValueDictionary()
+
+
+def _slug(value):
+    return re.sub(r"[^a-z0-9]+", "_", str(value).strip().lower()).strip("_") or "_"
+
+def prune_checkpoints(ttl=CHECKPOINT_TTL):
+    """
+    Removes checkpoints not updated within `ttl` seconds (crawls nobody
+    resubmitted). Returns how many were removed.
+    """
+    cutoff, removed = time.time() - ttl, 0
+    try:
+        names = os.listdir(CHECKPOINT_DIR)
+    except FileNotFoundError:
+        return 0
+    for name in names:
+        path = os.path.join(CHECKPOINT_DIR, name)
+        try:
+            if name.endswith(".json") and os.path.getmtime(path) < cutoff and path not in _active:
+                os.remove(path)
+                removed += 1
+        except OSError:
+            pass
+    if removed:
+        logging.info(f"Removed {removed} expired checkpoints")
+    return removed
+
+def _copy_output(source, dest):
+    # The output plus its companions (e.g. the XLSX spool "<name>.spool.jsonl")
+    folder, name = os.path.split(source.rstrip(os.sep))
+    os.makedirs(os.path.dirname(dest) or ".", exist_ok=True)
+    for entry in os.listdir(folder or "."):
+        if not entry.startswith(name):
+            continue
+        src, dst = os.path.join(folder, entry), os.path.join(os.path.dirname(dest), os.path.basename(dest) + entry[len(name):])
+        if os.path.isdir(dst):
+            shutil.rmtree(dst)
+        if os.path.isdir(src):
+            shutil.copytree(src, dst)
+        else:
+            shutil.copy2(src, dst)
+
+
+class Checkpoint:
+    """
+    Resume cursor of one crawl, keyed by platform, city, mode and start URL.
+    Holds the last page whose rows were flushed and the sink's row offset at
+    that point, so a resumed run neither re-fetches pages nor keeps rows
+    written after the checkpoint.
+
+    A job resubmitted after a crash takes the crawl over: the previous job's
+    output is copied into the new job's directory and continued there. While
+    a crawl of the same key is still running in this process, a second one
+    gets a checkpoint of its own and starts from page 1.
+
+    Typical use:
+        checkpoint = Checkpoint("housing", city, mode, url=start_url)
+        state = checkpoint.load()
+        sink = open_sink(path, append=bool(state), resume_rows=state and state["rows_flushed"])
+        ...
+        checkpoint.save(page_number, sink)   # after each page
+        ...
+        checkpoint.clear()                   # when the crawl completed
+    """
+
+    def __init__(self, platform, city, mode, job=None, url=None):
+        self.platform = platform
+        self.city = city
+        self.mode = mode
+        self.job = job if job is not None else current_job_id.get()
+        self.url = url
+        name = "__".join(_slug(part) for part in (platform, city, mode))
+        if url:
+            name += "__" + hashlib.sha1(url.encode("utf-8")).hexdigest()[:12]
+        self.path = os.path.join(CHECKPOINT_DIR, f"{name}.json")
+        if self.path in _active:
+            self.path = os.path.join(CHECKPOINT_DIR, f"{name}__{_slug(self.job or os.getpid())}.json")
+        _active[self.path] = self
+        prune_checkpoints()
+
+    def _owns(self, output_file):
+        # Outputs are only reopened inside the current job's directory (or,
+        # outside a job, anywhere but another job's directory)
+        path = os.path.abspath(output_file)
+        if self.job:
+            job_dir = os.path.abspath(os.path.dirname(output_path("_")))
+            return path.startswith(job_dir + os.sep)
+        return not path.startswith(os.path.abspath(JOB_OUTPUT_DIR) + os.sep)
+
+    def load(self):
+        """
+        Returns the saved state ({"page", "rows_flushed", "output_file", ...})
+        or None when there is nothing to resume for this URL. A crawl left by
+        another job is taken over (see the class docstring).
+        """
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logging.warning(f"Ignoring unreadable checkpoint {self.path}: {e}")
+            return None
+        if state.get("url") != self.url:
+            logging.warning(f"Ignoring checkpoint {self.path} of another URL")
+            return None
+        if state.get("output_file") and not self._owns(state["output_file"]):
+            state = self._take_over(state)
+            if state is None:
+                return None
+        logging.info(f"Resuming {self.platform} {self.city} ({self.mode}) after page {state.get('page')} "
+                     f"with {state.get('rows_flushed', 0)} rows already written")
+        return state
+
+    def _take_over(self, state):
+        # Continue another job's crawl on a copy of its output, so the new job
+        # never writes into the old job's directory
+        source = state["output_file"]
+        dest = output_path(os.path.basename(source.rstrip(os.sep)))
+        try:
+            if not os.path.exists(source):
+                raise FileNotFoundError("output is gone")
+            _copy_output(source, dest)
+        except OSError as e:
+            logging.warning(f"Cannot take over checkpoint {self.path} ({source}: {e}); starting over")
+            return None
+        logging.info(f"Taking over the crawl of job {state.get('job')}: {source} → {dest}")
+        state = {**state, "job": self.job, "output_file": dest}
+        self._write(state)
+        return state
+
+    def resume_page(self, default=1):
+        """
+        The first page still to scrape.
+        """
+        state = self.load()
+        return state["page"] + 1 if state else default
+
+    def save(self, page, sink=None, **extra):
+        """
+        Records `page` as completed. With a sink, its buffered rows are flushed
+        (and the dedup state saved) first, so the stored offset is on disk.
+        """
+        state = {
+            "platform": self.platform,
+            "city": self.city,
+            "mode": self.mode,
+            "job": self.job,
+            "url": self.url,
+            "page": page,
+            "rows_flushed": sink.checkpoint() if sink is not None else 0,
+            "output_file": sink.path if sink is not None else None,
+            "updated_at": int(time.time()),
+            **extra,
+        }
+        self._write(state)
+
+    def _write(self, state):
+        try:
+            os.makedirs(CHECKPOINT_DIR, exist_ok=True)
+            tmp = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(state, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+        except OSError as e:
+            logging.warning(f"Could not save checkpoint {self.path}: {e}")
+
+    def clear(self):
+        """
+        Removes the checkpoint once the crawl completed.
+        """
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,216 @@
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+import time
+from collections import OrderedDict
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+# Configuration (override through environment variables)
+DEDUP_ROWS = os.getenv("SCOUTAI_DEDUP", "1") != "0"
+DEDUP_DIR = os.getenv("SCOUTAI_DEDUP_DIR", os.path.join(".cache", "dedup"))
+DEDUP_TTL = int(os.getenv("SCOUTAI_DEDUP_TTL_DAYS", "30")) * 24 * 60 * 60      # Unused filter states expire
+DEDUP_MAX_BYTES = int(os.getenv("SCOUTAI_DEDUP_MAX_MB", "256")) * 1024 * 1024  # Oldest states go beyond this
+DEDUP_CAPACITY = int(os.getenv("SCOUTAI_DEDUP_CAPACITY", "20000"))  # Distinct rows the first Bloom filter is sized for
+DEDUP_ERROR_RATE = 1e-4   # False-positive rate at capacity (a unique row wrongly dropped)
+GROWTH = 4                # Each further filter holds this many times more rows than the one before
+TIGHTENING = 0.5          # ...at this factor of its error rate, so the chain stays within DEDUP_ERROR_RATE
+EXACT_WINDOW = 10000      # Most recent keys kept exactly; they never cause false positives
+
+# Fields that identify a listing on their own. "Link" is not among them: in
+# generic block dumps many different blocks share one link.
+URL_FIELDS = ("url", "listing page url", "property url")
+TRACKING_PARAMS = re.compile(r"^(utm_|fbclid$|gclid$|ref$|source$)", re.IGNORECASE)
+WHITESPACE = re.compile(r"\s+")
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter over strings (double hashing on one BLAKE2b digest).
+    """
+
+    def __init__(self, capacity=DEDUP_CAPACITY, error_rate=DEDUP_ERROR_RATE, bits=None, hashes=None):
+        self.capacity = capacity
+        self.count = 0
+        self.size = bits or max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = hashes or max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def __contains__(self, key):
+        return all(self.bits[p >> 3] & (1 << (p & 7)) for p in self._positions(key))
+
+    def add(self, key):
+        for p in self._positions(key):
+            self.bits[p >> 3] |= 1 << (p & 7)
+        self.count += 1
+
+
+class ScalableBloomFilter:
+    """
+    Chain of Bloom filters that starts small and adds a larger, stricter one
+    whenever the newest is full, so the memory (and the saved state) follows
+    the number of rows actually seen instead of a worst-case capacity.
+    """
+
+    def __init__(self, capacity=DEDUP_CAPACITY, error_rate=DEDUP_ERROR_RATE, filters=None):
+        self.error_rate = error_rate
+        self.filters = filters or [BloomFilter(capacity, error_rate * (1 - TIGHTENING))]
+
+    def __contains__(self, key):
+        return any(key in f for f in self.filters)
+
+    def add(self, key):
+        newest = self.filters[-1]
+        if newest.count >= newest.capacity:
+            n = len(self.filters)
+            newest = BloomFilter(newest.capacity * GROWTH, self.error_rate * (1 - TIGHTENING) * TIGHTENING ** n)
+            self.filters.append(newest)
+        newest.add(key)
+
+
+def dedup_key(platform, city, mode):
+    """
+    Key under which rows of one crawl target are remembered across runs.
+    """
+    return "/".join(str(part or "none").strip().lower() for part in (platform, city, mode))
+
+def state_path_for(key):
+    """
+    Where the filter state for `key` (a dedup_key(), or else an output file)
+    is kept between runs.
+    """
+    if os.sep in key or key.startswith("."):
+        key = os.path.abspath(key)
+    digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(DEDUP_DIR, f"{digest}.bloom")
+
+def prune_states(ttl=DEDUP_TTL, max_bytes=DEDUP_MAX_BYTES):
+    """
+    Removes filter states unused for `ttl` seconds, then the least recently
+    used ones until the rest fit in `max_bytes`. Returns how many were removed.
+    """
+    try:
+        entries = [e for e in os.scandir(DEDUP_DIR) if e.name.endswith(".bloom")]
+    except FileNotFoundError:
+        return 0
+    stats = sorted(((e.stat().st_mtime, e.stat().st_size, e.path) for e in entries), reverse=True)
+    cutoff, total, removed = time.time() - ttl, 0, 0
+    for mtime, size, path in stats:
+        total += size
+        if mtime < cutoff or total > max_bytes:
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError:
+                pass
+    return removed
+
+def normalize_url(url):
+    parts = urlsplit(url.strip())
+    query = urlencode(sorted((k, v) for k, v in parse_qsl(parts.query) if not TRACKING_PARAMS.match(k)))
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path.rstrip("/"), query, ""))
+
+def row_key(row):
+    """
+    The listing URL when the row has one, else a fingerprint of its
+    whitespace- and case-normalized values.
+    """
+    for name, value in row.items():
+        if str(name).lower() in URL_FIELDS and value:
+            return "u:" + normalize_url(str(value))
+    content = "\x1f".join(
+        f"{name}={WHITESPACE.sub(' ', str(value)).strip().lower()}" for name, value in sorted(row.items()) if value not in (None, "")
+    )
+    return "c:" + hashlib.blake2b(content.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class RowDeduplicator:
+    """
+    Streaming duplicate filter with bounded memory: an exact LRU window of
+    recent keys in front of a Bloom filter for everything seen before.
+
+    With `state_path`, the Bloom filter is saved on `save()` and reloaded when
+    `resume` is set, so a resumed run of the same output skips rows it already
+    wrote, and a keyed state (see dedup_key) carries over to later runs of the
+    same platform/city/mode; `discard()` removes it. Rows matched only by the
+    Bloom filter are counted as `probable`.
+
+    `capacity` is the expected number of distinct rows; the filter grows
+    beyond it when needed.
+    """
+
+    def __init__(self, state_path=None, resume=False, capacity=DEDUP_CAPACITY, window=EXACT_WINDOW):
+        self.state_path = state_path
+        self.window = window
+        self.recent = OrderedDict()
+        self.dropped = 0
+        self.probable = 0
+        if state_path:
+            prune_states()
+        self.bloom = self._load() if (state_path and resume) else None
+        if self.bloom is None:
+            self.bloom = ScalableBloomFilter(capacity)
+            self.discard()
+
+    def is_duplicate(self, row) -> bool:
+        key = row_key(row)
+        if key in self.recent:
+            self.recent.move_to_end(key)
+            self.dropped += 1
+            return True
+        if key in self.bloom:
+            self.dropped += 1
+            self.probable += 1
+            return True
+        self.bloom.add(key)
+        self.recent[key] = None
+        if len(self.recent) > self.window:
+            self.recent.popitem(last=False)
+        return False
+
+    def _load(self):
+        # State: one JSON header line describing the filters, then their bits back to back
+        try:
+            with open(self.state_path, "rb") as f:
+                header = json.loads(f.readline())
+                filters = []
+                for spec in header["filters"]:
+                    bloom = BloomFilter(spec["capacity"], bits=spec["size"], hashes=spec["hashes"])
+                    bloom.count = spec["count"]
+                    bloom.bits = bytearray(f.read(len(bloom.bits)))
+                    if len(bloom.bits) != (bloom.size + 7) // 8:
+                        raise ValueError("truncated state")
+                    filters.append(bloom)
+            return ScalableBloomFilter(filters=filters)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            if os.path.exists(self.state_path):
+                logging.warning(f"Ignoring unreadable dedup state {self.state_path}: {e}")
+            return None
+
+    def save(self):
+        if not self.state_path:
+            return
+        os.makedirs(os.path.dirname(self.state_path) or ".", exist_ok=True)
+        header = {"filters": [{"capacity": f.capacity, "count": f.count, "size": f.size, "hashes": f.hashes}
+                              for f in self.bloom.filters]}
+        tmp = self.state_path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(json.dumps(header).encode("utf-8") + b"\n")
+            for bloom in self.bloom.filters:
+                f.write(bloom.bits)
+        os.replace(tmp, self.state_path)
+
+    def discard(self):
+        """
+        Removes the saved state (nothing will resume or continue from it).
+        """
+        if self.state_path and os.path.exists(self.state_path):
+            os.remove(self.state_path)
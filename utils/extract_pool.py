@@ -0,0 +1,73 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from utils.html_parser import take_parse_seconds
+from utils.metrics import observe
+
+# Configuration (override through environment variables)
+EXTRACT_WORKERS = int(os.getenv("SCOUTAI_EXTRACT_WORKERS", str(os.cpu_count() or 2)))  # 0 = parse on the event loop
+MAX_PENDING_EXTRACTIONS = int(os.getenv("SCOUTAI_MAX_PENDING_EXTRACTIONS", str(max(EXTRACT_WORKERS, 1) * 2)))
+
+_executor = None
+_slots = None
+
+
+def start_extract_pool():
+    """
+    Creates the worker processes. Called on API startup; otherwise the pool
+    starts on first use.
+    """
+    global _executor
+    if _executor is None and EXTRACT_WORKERS > 0:
+        _executor = ProcessPoolExecutor(max_workers=EXTRACT_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        logging.info(f"Extraction pool started with {EXTRACT_WORKERS} processes")
+    return _executor
+
+def stop_extract_pool():
+    global _executor, _slots
+    if _executor is not None:
+        _executor.shutdown(cancel_futures=True)
+        _executor = None
+    _slots = None
+
+def _extract(func, payload, args):
+    # Runs in the worker process; returns the rows with (parse, total) seconds
+    take_parse_seconds()
+    start = time.perf_counter()
+    rows = func(payload.decode("utf-8"), *args)
+    return rows, take_parse_seconds(), time.perf_counter() - start
+
+def _record(result):
+    rows, parse, total = result
+    if parse:
+        observe("parse", parse)
+    observe("extract", max(total - parse, 0.0))
+    return rows
+
+async def run_extractor(func, html, *args):
+    """
+    Runs `func(html, *args)` in the extraction pool and returns its rows.
+
+    The page crosses the process boundary as UTF-8 bytes and only the
+    structured rows come back, so parsing never blocks the event loop. At most
+    MAX_PENDING_EXTRACTIONS pages are in flight; further callers wait here,
+    which slows crawls down instead of piling pages up in memory.
+
+    Args:
+        func: Module-level (picklable) function taking the HTML string.
+        html (str | bytes): Page markup.
+    """
+    global _slots
+    payload = html.encode("utf-8") if isinstance(html, str) else html
+    executor = start_extract_pool()
+    if executor is None:
+        return _record(_extract(func, payload, args))
+
+    if _slots is None:
+        _slots = asyncio.Semaphore(MAX_PENDING_EXTRACTIONS)
+    async with _slots:
+        loop = asyncio.get_running_loop()
+        return _record(await loop.run_in_executor(executor, _extract, func, payload, args))
@@ -1,4 +1,152 @@
-from playwright.async_api import async_playwright
+import json
+import logging
+import os
+import threading
+import time
+from urllib.parse import urlparse
+from utils.browser_pool import browser_pool
+from utils.readiness import current_block_signals
+from utils.metrics import timed
+
+# Configuration (override through environment variables)
+BROWSER_MODE = os.getenv("SCOUTAI_BROWSER_MODE", "auto")  # auto = headless first, headful fallback; or headless / headful
+HEADLESS_MEMORY_FILE = os.getenv("SCOUTAI_HEADLESS_MEMORY", os.path.join(".cache", "headless_policy.json"))
+RELEARN_AFTER = 60 * 60 * 24 * 7  # Seconds before a domain that needed headful gets headless another try
+
+_lock = threading.Lock()
+_memory = None
+
+
+def _domain_of(url):
+    host = urlparse(url).hostname or ""
+    return host[4:] if host.startswith("www.") else host
+
+def _load():
+    global _memory
+    if _memory is None:
+        try:
+            with open(HEADLESS_MEMORY_FILE, "r", encoding="utf-8") as f:
+                _memory = json.load(f)
+        except (OSError, ValueError):
+            _memory = {}
+    return _memory
+
+def _save():
+    # Caller must hold _lock
+    folder = os.path.dirname(HEADLESS_MEMORY_FILE)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    tmp = f"{HEADLESS_MEMORY_FILE}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(_memory, f, indent=2)
+    os.replace(tmp, HEADLESS_MEMORY_FILE)
+
+def choose_modes(url):
+    """
+    Returns the browser modes to try for `url`, in order, as booleans for
+    `headless`. Headless comes first unless this domain is known to need a
+    visible browser; that knowledge expires after RELEARN_AFTER. Headless is
+    then only tried if the visible browser fails too.
+    """
+    if BROWSER_MODE == "headless":
+        return [True]
+    if BROWSER_MODE == "headful":
+        return [False]
+    with _lock:
+        record = _load().get(_domain_of(url), {})
+    if record.get("preferred") == "headful" and time.time() - record.get("headless_failed_at", 0) < RELEARN_AFTER:
+        return [False, True]
+    return [True, False]
+
+def record_attempt(url, headless, success, seconds):
+    """
+    Updates success counts and timings for the domain and, when the outcome
+    says so, which mode it should start with next time.
+    """
+    mode = "headless" if headless else "headful"
+    with _lock:
+        record = _load().setdefault(_domain_of(url), {"preferred": None, "stats": {}})
+        stats = record["stats"].setdefault(mode, {"success": 0, "failure": 0, "total_seconds": 0.0})
+        stats["success" if success else "failure"] += 1
+        stats["total_seconds"] = round(stats["total_seconds"] + seconds, 3)
+        if success:
+            record["preferred"] = mode
+        elif headless:
+            record["headless_failed_at"] = int(time.time())
+        try:
+            _save()
+        except OSError as e:
+            logging.warning(f"Could not persist headless policy: {e}")
+
+def get_headless_stats():
+    """
+    Per-domain preferred mode with success rate and mean duration per mode.
+    """
+    with _lock:
+        memory = json.loads(json.dumps(_load()))
+    for record in memory.values():
+        for stats in record.get("stats", {}).values():
+            runs = stats["success"] + stats["failure"]
+            stats["success_rate"] = round(stats["success"] / runs, 3) if runs else None
+            stats["avg_seconds"] = round(stats["total_seconds"] / runs, 3) if runs else None
+    return memory
+
+def _succeeded(result):
+    # Scrapers report failure by returning None or by finding no rows
+    if result is None:
+        return False
+    if isinstance(result, dict) and "rows" in result:
+        return bool(result["rows"])
+    return True
+
+async def run_headless_first(url, attempt):
+    """
+    Runs `attempt(headless)` under the headless-first policy: the preferred
+    mode is tried first, the other one only if it raised, returned None, or
+    came back empty with a sign of blocking (HTTP 403/429, a captcha, a
+    readiness timeout). The outcome is remembered per domain so known-failing
+    modes are skipped.
+
+    Args:
+        url (str): Page being scraped; its domain keys the policy.
+        attempt (callable): `async attempt(headless: bool)` that does the scraping.
+
+    Returns:
+        Any: Result of the first successful attempt, else of the last one that
+        did not raise.
+    """
+    modes = choose_modes(url)
+    result, have_result = None, False
+    for i, headless in enumerate(modes):
+        mode = "Headless" if headless else "Headful"
+        last = i == len(modes) - 1
+        signals = []
+        token = current_block_signals.set(signals)
+        started = time.monotonic()
+        try:
+            outcome = await attempt(headless)
+        except Exception as e:
+            record_attempt(url, headless, False, time.monotonic() - started)
+            if not last:
+                logging.warning(f"{mode} mode failed: {e}. Retrying in {'headful' if headless else 'headless'} mode...")
+                continue
+            if not have_result:
+                raise
+            # e.g. no display for a visible browser: keep what the first mode found
+            logging.error(f"{mode} retry of {url} failed: {e}. Keeping the earlier result")
+            return result
+        finally:
+            current_block_signals.reset(token)
+        result, have_result = outcome, True
+        # An empty result without any sign of blocking is a legitimately empty page
+        success = _succeeded(result) or (result is not None and not signals)
+        record_attempt(url, headless, success, time.monotonic() - started)
+        if success:
+            return result
+        if not last:
+            reason = ", ".join(signals) or "no result"
+            logging.warning(f"{mode} run of {url} came back empty ({reason}). Retrying in the other mode...")
+    return result
 
 async def try_headless_with_fallback(url, scraper_func):
     """
@@ -9,15 +157,11 @@ async def try_headless_with_fallback(url, scraper_func):
         url (str): The URL to scrape.
         scraper_func (coroutine): The scraping function to call, should accept (page, url).
     """
-    try:
-        return await run_scraper(url, scraper_func, headless=True)
-    except Exception as e:
-        print(f"Headless mode failed: {e}. Retrying in headful mode...")
-        return await run_scraper(url, scraper_func, headless=False)
+    return await run_headless_first(url, lambda headless: run_scraper(url, scraper_func, headless=headless))
 
 async def run_scraper(url, scraper_func, headless=True):
     """
-    Launches Playwright, navigates to URL, and executes the provided scraper function.
+    Borrows a page from the shared browser pool, navigates to URL, and executes the provided scraper function.
 
     Args:
         url (str): The page to scrape.
@@ -27,11 +171,7 @@ async def run_scraper(url, scraper_func, headless=True):
     Returns:
         Any: Whatever the scraper_func returns.
     """
-    async with async_playwright() as pw:
-        browser = await pw.chromium.launch(headless=headless)
-        context = await browser.new_context()
-        page = await context.new_page()
-        await page.goto(url, timeout=60000)
-        result = await scraper_func(page, url)
-        await browser.close()
-        return result
+    async with browser_pool.page(headless=headless) as page:
+        with timed("goto"):
+            await page.goto(url, timeout=60000)
+        return await scraper_func(page, url)
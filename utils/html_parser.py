@@ -0,0 +1,67 @@
+import importlib.util
+import logging
+import os
+import time
+from bs4 import BeautifulSoup, SoupStrainer
+
+# Tree builders BeautifulSoup can run on, fastest first
+BACKENDS = ["lxml", "html.parser"]
+
+def available_backends():
+    """
+    Returns the installed backends, fastest first. html.parser is always available.
+    """
+    return [b for b in BACKENDS if b == "html.parser" or importlib.util.find_spec(b) is not None]
+
+# Backend used by make_soup (override with SCOUTAI_HTML_PARSER=html.parser)
+PARSER_BACKEND = os.getenv("SCOUTAI_HTML_PARSER") or available_backends()[0]
+# Build only the subtrees an extractor asks for (SCOUTAI_PARTIAL_PARSE=0 disables)
+PARTIAL_PARSE = os.getenv("SCOUTAI_PARTIAL_PARSE", "1") != "0"
+
+# Seconds this process spent building trees since the last take_parse_seconds()
+_parse_seconds = 0.0
+
+def take_parse_seconds():
+    """
+    Returns and resets the parse time accumulated by make_soup in this
+    process; the extraction pool reports it as the "parse" stage.
+    """
+    global _parse_seconds
+    seconds, _parse_seconds = _parse_seconds, 0.0
+    return seconds
+
+def class_strainer(tag, css_class):
+    """
+    SoupStrainer for `tag` elements that have `css_class` among their classes.
+    SoupStrainer(tag, class_=...) compares the whole attribute while parsing,
+    so it would miss elements like <div class="card premium">.
+    """
+    def has_class(value):
+        if not value:
+            return False
+        return css_class in (value.split() if isinstance(value, str) else value)
+    return SoupStrainer(tag, attrs={"class": has_class})
+
+def make_soup(html, backend=None, only=None):
+    """
+    Builds a BeautifulSoup tree with the configured backend.
+
+    All extractors go through this so the parser can be swapped in one place;
+    the returned object keeps the usual find/select/get_text API.
+
+    Args:
+        html (str | bytes): Page markup.
+        backend (str): Overrides PARSER_BACKEND for this call.
+        only (SoupStrainer): Keep just the matching elements (and their
+            descendants). Extractors that only read listing cards pass one
+            so the rest of the page never becomes Python objects.
+    """
+    global _parse_seconds
+    backend = backend or PARSER_BACKEND
+    if backend not in available_backends():
+        logging.warning(f"HTML parser backend '{backend}' is not available, using html.parser")
+        backend = "html.parser"
+    start = time.perf_counter()
+    soup = BeautifulSoup(html, backend, parse_only=only if PARTIAL_PARSE else None)
+    _parse_seconds += time.perf_counter() - start
+    return soup
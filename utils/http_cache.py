@@ -0,0 +1,216 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+# Configuration (override through environment variables)
+HTTP_CACHE_ENABLED = os.getenv("SCOUTAI_HTTP_CACHE", "1") != "0"
+HTTP_CACHE_DIR = os.getenv("SCOUTAI_HTTP_CACHE_DIR", os.path.join(".cache", "http"))
+HTTP_CACHE_TTL = int(os.getenv("SCOUTAI_HTTP_CACHE_TTL", str(60 * 60)))               # Seconds a page is served without revalidation
+HTTP_CACHE_MAX_BYTES = int(os.getenv("SCOUTAI_HTTP_CACHE_MAX_MB", "512")) * 1024 * 1024
+HTTP_CACHE_OFFLINE = os.getenv("SCOUTAI_HTTP_CACHE_OFFLINE", "0") == "1"              # Replay from cache, never touch the network
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key           TEXT PRIMARY KEY,
+    url           TEXT NOT NULL,
+    body_hash     TEXT NOT NULL,
+    size          INTEGER NOT NULL,
+    encoding      TEXT,
+    etag          TEXT,
+    last_modified TEXT,
+    fetched_at    REAL NOT NULL,
+    last_access   REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_entries_access ON entries(last_access);
+CREATE INDEX IF NOT EXISTS idx_entries_body ON entries(body_hash);
+"""
+
+
+class HTTPCache:
+    """
+    Content-addressed on-disk cache for GET responses.
+
+    Entries are keyed by URL plus request headers; bodies are stored once per
+    SHA-256 of their content under `<dir>/bodies/`. Fresh entries (younger than
+    `ttl`) are served without a request. Stale ones are revalidated with
+    If-None-Match / If-Modified-Since and refreshed on 304. When the cache
+    grows past `max_bytes`, least recently used entries are evicted.
+
+    In `offline` mode every lookup is answered from disk regardless of age, so
+    extraction changes can be replayed against previously fetched pages.
+    """
+
+    def __init__(self, directory=HTTP_CACHE_DIR, ttl=HTTP_CACHE_TTL, max_bytes=HTTP_CACHE_MAX_BYTES, offline=HTTP_CACHE_OFFLINE):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.offline = offline
+        self.stats = {"hits": 0, "misses": 0, "revalidated": 0, "stored": 0, "evicted": 0}
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(directory, "bodies"), exist_ok=True)
+        self._db = sqlite3.connect(os.path.join(directory, "index.db"), timeout=30,
+                                   check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+
+    @staticmethod
+    def make_key(url, headers=None):
+        parts = [url] + [f"{k.lower()}:{v}" for k, v in sorted((headers or {}).items(), key=lambda kv: kv[0].lower())]
+        return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()
+
+    def _count(self, event):
+        # fetch() runs on worker threads, so counters are only bumped under the lock
+        with self._lock:
+            self.stats[event] += 1
+
+    def stats_snapshot(self):
+        with self._lock:
+            return dict(self.stats)
+
+    def _body_path(self, body_hash):
+        return os.path.join(self.directory, "bodies", body_hash[:2], body_hash)
+
+    def lookup(self, key):
+        """
+        Returns the stored entry as a dict, or None.
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT url, body_hash, size, encoding, etag, last_modified, fetched_at FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+        if not row:
+            return None
+        entry = dict(zip(("url", "body_hash", "size", "encoding", "etag", "last_modified", "fetched_at"), row))
+        entry["fresh"] = time.time() - entry["fetched_at"] < self.ttl
+        return entry
+
+    def read_body(self, entry):
+        try:
+            with open(self._body_path(entry["body_hash"]), "rb") as f:
+                content = f.read()
+        except OSError:
+            return None
+        with self._lock:
+            self._db.execute("UPDATE entries SET last_access = ? WHERE body_hash = ?", (time.time(), entry["body_hash"]))
+        return content.decode(entry["encoding"] or "utf-8", errors="replace")
+
+    def conditional_headers(self, entry):
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def touch(self, key):
+        """
+        Marks an entry as freshly validated (after a 304).
+        """
+        now = time.time()
+        with self._lock:
+            self._db.execute("UPDATE entries SET fetched_at = ?, last_access = ? WHERE key = ?", (now, now, key))
+            self.stats["revalidated"] += 1
+
+    def store(self, key, url, content, encoding=None, etag=None, last_modified=None):
+        body_hash = hashlib.sha256(content).hexdigest()
+        path = self._body_path(body_hash)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(content)
+            os.replace(tmp, path)
+        now = time.time()
+        with self._lock:
+            old = self._db.execute("SELECT body_hash FROM entries WHERE key = ?", (key,)).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries (key, url, body_hash, size, encoding, etag, last_modified, fetched_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, url, body_hash, len(content), encoding, etag, last_modified, now, now),
+            )
+            if old and old[0] != body_hash:
+                self._drop_body_if_unused(old[0])
+            self.stats["stored"] += 1
+            self._evict()
+
+    def _drop_body_if_unused(self, body_hash):
+        # Caller must hold self._lock. Returns True when the body file was removed.
+        if self._db.execute("SELECT 1 FROM entries WHERE body_hash = ? LIMIT 1", (body_hash,)).fetchone():
+            return False
+        try:
+            os.remove(self._body_path(body_hash))
+        except OSError:
+            pass
+        return True
+
+    def _evict(self):
+        # Caller must hold self._lock. Sizes are summed per distinct body.
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM (SELECT DISTINCT body_hash, size FROM entries)").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, body_hash, size in self._db.execute(
+            "SELECT key, body_hash, size FROM entries ORDER BY last_access"
+        ).fetchall():
+            self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self.stats["evicted"] += 1
+            if self._drop_body_if_unused(body_hash):
+                total -= size
+            if total <= self.max_bytes:
+                break
+        logging.info(f"HTTP cache evicted down to {total // 1024} KB")
+
+    def fetch(self, session, url, timeout=None):
+        """
+        GET through the cache with `session` (a requests.Session).
+        Returns the body text, or None when unavailable. Errors propagate.
+        """
+        key = self.make_key(url, dict(session.headers))
+        entry = self.lookup(key)
+
+        if entry and (entry["fresh"] or self.offline):
+            body = self.read_body(entry)
+            if body is not None:
+                self._count("hits")
+                return body
+        if self.offline:
+            self._count("misses")
+            logging.warning(f"Offline replay: {url} is not cached")
+            return None
+
+        headers = self.conditional_headers(entry) if entry else {}
+        response = session.get(url, headers=headers, timeout=timeout)
+        if response.status_code == 304 and entry:
+            body = self.read_body(entry)
+            if body is not None:
+                self.touch(key)
+                self._count("hits")
+                return body
+            response = session.get(url, timeout=timeout)
+
+        response.raise_for_status()
+        self._count("misses")
+        encoding = response.encoding or response.apparent_encoding
+        self.store(key, url, response.content, encoding=encoding,
+                   etag=response.headers.get("ETag"), last_modified=response.headers.get("Last-Modified"))
+        return response.text
+
+
+_shared = None
+
+def get_http_cache():
+    """
+    Process-wide cache instance, or None when SCOUTAI_HTTP_CACHE=0.
+    """
+    global _shared
+    if _shared is None and HTTP_CACHE_ENABLED:
+        _shared = HTTPCache()
+    return _shared
+
+def http_cache_stats():
+    """
+    Counters of the process-wide cache ({} until it is first used).
+    """
+    return _shared.stats_snapshot() if _shared is not None else {}
@@ -0,0 +1,75 @@
+import asyncio
+import logging
+import os
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from utils.http_cache import get_http_cache
+
+# Configuration (override through environment variables)
+FETCH_POOL_SIZE = int(os.getenv("SCOUTAI_FETCH_POOL_SIZE", "10"))   # Keep-alive connections per host
+FETCH_TIMEOUT = float(os.getenv("SCOUTAI_FETCH_TIMEOUT", "20"))     # Seconds per request
+FETCH_RETRIES = 2
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64)'
+}
+
+
+class AsyncFetcher:
+    """
+    HTTP fetcher backed by one pooled, keep-alive `requests.Session`.
+
+    `fetch` is awaitable: requests run on worker threads, so many pages can be
+    in flight from the event loop while reusing the same connections.
+    Transient errors (429/5xx) are retried with backoff. With a `cache`
+    (utils.http_cache.HTTPCache) responses are served from and stored on disk.
+    """
+
+    def __init__(self, headers=None, pool_size=FETCH_POOL_SIZE, timeout=FETCH_TIMEOUT, cache=None):
+        self.timeout = timeout
+        self.cache = cache
+        self.session = requests.Session()
+        self.session.headers.update(headers or DEFAULT_HEADERS)
+        retry = Retry(total=FETCH_RETRIES, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504])
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def fetch_sync(self, url):
+        """
+        Returns the page body, or None on any error.
+        """
+        try:
+            if self.cache is not None:
+                return self.cache.fetch(self.session, url, timeout=self.timeout)
+            response = self.session.get(url, timeout=self.timeout)
+            response.raise_for_status()
+            return response.text
+        except Exception as e:
+            logging.warning(f"Error fetching {url}: {e}")
+            return None
+
+    async def fetch(self, url):
+        return await asyncio.to_thread(self.fetch_sync, url)
+
+    async def fetch_many(self, urls):
+        """
+        Fetches all URLs concurrently; results keep the order of `urls`.
+        """
+        return await asyncio.gather(*(self.fetch(u) for u in urls))
+
+    def close(self):
+        self.session.close()
+
+
+_shared = None
+
+def get_fetcher():
+    """
+    Process-wide fetcher so every caller shares one connection pool.
+    """
+    global _shared
+    if _shared is None:
+        _shared = AsyncFetcher(cache=get_http_cache())
+    return _shared
@@ -0,0 +1,97 @@
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Configuration (override through environment variables)
+METRICS_ENABLED = os.getenv("SCOUTAI_METRICS", "1") != "0"
+# Histogram bucket upper bounds in seconds (Prometheus "le" labels)
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Stages timed across the scrapers:
+#   browser_launch, browser_context, goto, fetch (plain HTTP), wait, content,
+#   parse, extract, export
+# Platform label of the scrape running in this context (set by the runners)
+current_platform = ContextVar("current_platform", default="unknown")
+# Per-job totals {stage: {"count": n, "seconds": s}} (set by the job queue)
+current_timings = ContextVar("current_timings", default=None)
+
+
+class Histogram:
+    """
+    Cumulative-on-export histogram: one counter per bucket, plus sum and count.
+    """
+
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)  # last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+_lock = threading.Lock()
+_histograms = {}  # (platform, stage) -> Histogram
+
+
+def observe(stage, seconds, platform=None):
+    """
+    Records one duration of `stage` for the platform, and into the running job's totals.
+    """
+    if not METRICS_ENABLED:
+        return
+    key = (platform or current_platform.get(), stage)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = Histogram()
+        histogram.observe(seconds)
+    timings = current_timings.get()
+    if timings is not None:
+        total = timings.setdefault(stage, {"count": 0, "seconds": 0.0})
+        total["count"] += 1
+        total["seconds"] = round(total["seconds"] + seconds, 6)
+
+@contextmanager
+def timed(stage, platform=None):
+    """
+    Times the block as `stage`; works around awaits too:
+
+        with timed("goto"):
+            await page.goto(url)
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, time.perf_counter() - start, platform)
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def render_prometheus():
+    """
+    All stage histograms in the Prometheus text exposition format.
+    """
+    with _lock:
+        snapshot = [(key, list(h.counts), h.sum, h.count) for key, h in sorted(_histograms.items())]
+    lines = [
+        "# HELP scoutai_stage_seconds Time spent in each scrape stage.",
+        "# TYPE scoutai_stage_seconds histogram",
+    ]
+    for (platform, stage), counts, total, count in snapshot:
+        labels = f'platform="{_label(platform)}",stage="{_label(stage)}"'
+        cumulative = 0
+        for bound, n in zip(BUCKETS + ("+Inf",), counts):
+            cumulative += n
+            lines.append(f'scoutai_stage_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f"scoutai_stage_seconds_sum{{{labels}}} {total:.6f}")
+        lines.append(f"scoutai_stage_seconds_count{{{labels}}} {count}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,262 @@
+import asyncio
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+
+# Configuration (override through environment variables)
+EVENT_RING = int(os.getenv("SCOUTAI_PROGRESS_EVENTS", "50"))       # Recent events kept per job
+STATUS_SNAPSHOT_FILE = os.getenv("SCOUTAI_STATUS_FILE", "status.json")
+STATUS_SNAPSHOT_INTERVAL = float(os.getenv("SCOUTAI_STATUS_SNAPSHOT", "0"))  # Seconds between snapshots; 0 = off
+FINISHED_PROGRESS_TTL = 60 * 60 * 24  # Finished entries are kept for a day, like finished jobs
+MAX_FINISHED_PROGRESS = int(os.getenv("SCOUTAI_MAX_FINISHED_PROGRESS", "1000"))  # ...but never more than this many
+
+# "1,234 results", "560+ Commercial Properties for Rent", ... as announced by search pages
+RESULT_COUNT = re.compile(
+    r"(\d{1,3}(?:,\d{2,3})+|\d+)\+?\s+(?:(?!bhk\b|rk\b)[a-z-]+\s+){0,3}?"
+    r"(?:results|properties|listings|homes|flats|apartments|offices|shops|projects)\b",
+    re.IGNORECASE,
+)
+# Pagination controls whose labels are page numbers, on pages without a site-specific selector
+PAGINATION_SELECTOR = "[class*='pagination' i] a, [class*='pagination' i] button, nav[aria-label*='pagination' i] a"
+
+# Progress of the job running in this context (set by the job queue); scrapers
+# report through report_page() and never need to know whether a job is listening
+current_progress = ContextVar("current_progress", default=None)
+
+
+class JobProgress:
+    """
+    Live counters of one scrape, read by /status, /jobs/{id} and the row
+    stream. Updates are plain attribute writes on the event loop; `version`
+    increases with every update so readers can tell what changed.
+    """
+
+    def __init__(self, job_id=None, user=None, network=None):
+        self.job_id = job_id
+        self.user = user
+        self.network = network  # NetworkStats of the job's browser traffic, if any
+        self.state = "queued"
+        self.pages = 0
+        self.last_page = None
+        self.total_pages = None  # When the site tells us; enables the ETA
+        self.total_rows = None   # Results the site announces; ETA from the row rate without a page count
+        self.rows = 0
+        self.bytes = 0           # Response bodies fetched outside the browser
+        self.errors = 0
+        self.output_file = None
+        self.outputs = []          # Every output written to, in the order they were first reported
+        self._rows_by_output = {}  # A batch writes several outputs; rows is their sum
+        self.created_at = time.time()
+        self.started_at = None
+        self.updated_at = None
+        self.events = deque(maxlen=EVENT_RING)
+        self.version = 0
+
+    def _event(self, kind, message, **data):
+        self.updated_at = time.time()
+        self.events.append({"at": round(self.updated_at, 3), "kind": kind, "message": message, **data})
+        self.version += 1
+
+    def set_state(self, state, message=""):
+        self.state = state
+        if state == "running":
+            self.started_at = time.time()
+        self._event(state, message or state.capitalize())
+
+    def page_done(self, page=None, rows=None, output_file=None, total_pages=None, nbytes=0, total_rows=None):
+        self.pages += 1
+        self.last_page = page if page is not None else self.pages
+        if output_file:
+            if output_file not in self.outputs:
+                self.outputs.append(output_file)
+            self.output_file = output_file
+            if rows is not None:
+                self._rows_by_output[output_file] = rows
+                rows = sum(self._rows_by_output.values())
+        if rows is not None:
+            self.rows = rows
+        if total_pages:
+            self.total_pages = max(total_pages, self.last_page or 0)
+        if total_rows:
+            self.total_rows = total_rows
+        self.bytes += nbytes
+        self._event("page", f"Page {self.last_page} done", page=self.last_page, rows=self.rows)
+
+    def error(self, message):
+        self.errors += 1
+        self._event("error", message)
+
+    def note(self, message):
+        self._event("status", message)
+
+    @property
+    def bytes_total(self):
+        return self.bytes + (self.network.bytes_received if self.network is not None else 0)
+
+    def to_dict(self, events=False) -> dict:
+        end = self.updated_at if self.state in ("finished", "failed") else time.time()
+        elapsed = max(end - self.started_at, 1e-6) if self.started_at else 0.0
+
+        def rate(n):
+            return round(n / elapsed, 3) if elapsed else 0.0
+
+        eta = None
+        if self.state == "running" and self.pages:
+            if self.total_pages:
+                eta = round(max(self.total_pages - (self.last_page or 0), 0) * elapsed / self.pages, 1)
+            elif self.total_rows and self.rows:
+                eta = round(max(self.total_rows - self.rows, 0) * elapsed / self.rows, 1)
+        result = {
+            "job_id": self.job_id,
+            "state": self.state,
+            "pages": self.pages,
+            "last_page": self.last_page,
+            "total_pages": self.total_pages,
+            "rows": self.rows,
+            "total_rows": self.total_rows,
+            "bytes": self.bytes_total,
+            "errors": self.errors,
+            "pages_per_s": rate(self.pages),
+            "rows_per_s": rate(self.rows),
+            "bytes_per_s": rate(self.bytes_total),
+            "eta_s": eta,
+            "started_at": self.started_at,
+            "updated_at": self.updated_at,
+        }
+        if events:
+            result["events"] = list(self.events)
+        return result
+
+
+class ProgressRegistry:
+    """
+    In-memory progress of every known job, keyed by job ID. Lookups never touch
+    the disk; snapshot_loop() optionally persists a copy for other tools.
+    Finished entries are evicted after FINISHED_PROGRESS_TTL, or oldest first
+    beyond MAX_FINISHED_PROGRESS, whenever a new job is tracked.
+    """
+
+    def __init__(self):
+        self._jobs = {}
+
+    def track(self, job_id, user=None, network=None) -> JobProgress:
+        self.prune()
+        progress = self._jobs[job_id] = JobProgress(job_id, user, network)
+        return progress
+
+    def prune(self):
+        cutoff = time.time() - FINISHED_PROGRESS_TTL
+        finished = sorted((p for p in self._jobs.values() if p.state in ("finished", "failed")),
+                          key=lambda p: p.updated_at or p.created_at)
+        excess = max(0, len(finished) - MAX_FINISHED_PROGRESS)
+        for i, progress in enumerate(finished):
+            if i < excess or (progress.updated_at or progress.created_at) < cutoff:
+                self._jobs.pop(progress.job_id, None)
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def discard(self, job_id):
+        self._jobs.pop(job_id, None)
+
+    def jobs(self, user=None, active_only=False):
+        return [p for p in list(self._jobs.values())
+                if (user is None or p.user == user) and (not active_only or p.state in ("queued", "running"))]
+
+    def snapshot(self, user=None, events=False) -> dict:
+        jobs = self.jobs(user)
+        running = sum(1 for p in jobs if p.state == "running")
+        return {
+            "status": "Running" if running else "Idle",
+            "running": running,
+            "queued": sum(1 for p in jobs if p.state == "queued"),
+            "jobs": [p.to_dict(events=events) for p in jobs],
+        }
+
+    @staticmethod
+    def write_snapshot(snapshot, path=STATUS_SNAPSHOT_FILE):
+        # Takes a snapshot built on the event loop, so it can run in a thread
+        data = json.dumps({**snapshot, "written_at": int(time.time())}, default=str)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+
+# Shared by the job queue, the batch runner and /status
+progress_registry = ProgressRegistry()
+
+
+def report_page(page=None, sink=None, total_pages=None, nbytes=0, total_rows=None):
+    """
+    Marks one page (or harvest batch) as done for the running job, if any.
+    The sink is flushed so the rows can be streamed to clients right away.
+    Pass `total_pages` or `total_rows` when the site shows them (see
+    page_count() and result_count()); they drive the ETA.
+    """
+    progress = current_progress.get()
+    if progress is None:
+        return
+    if sink is not None:
+        sink.flush()
+    progress.page_done(
+        page,
+        rows=sink.rows_written if sink is not None else None,
+        output_file=sink.path if sink is not None else None,
+        total_pages=total_pages,
+        nbytes=nbytes,
+        total_rows=total_rows,
+    )
+
+def result_count(text):
+    """
+    Number of results a search page announces in `text`, or None.
+    """
+    match = RESULT_COUNT.search(text or "")
+    return int(match.group(1).replace(",", "")) if match else None
+
+async def page_count(page, selector=PAGINATION_SELECTOR):
+    """
+    Highest page number among the pagination controls matching `selector`
+    (the last page when the site shows it), or None.
+    """
+    try:
+        labels = await page.eval_on_selector_all(selector, "els => els.map(e => e.textContent.trim())")
+    except Exception:
+        return None
+    numbers = [int(label) for label in labels if label.isdigit()]
+    return max(numbers) if numbers else None
+
+async def announced_results(page):
+    """
+    result_count() of the page title and main heading.
+    """
+    try:
+        text = await page.evaluate("() => document.title + ' ' + (document.querySelector('h1')?.innerText || '')")
+    except Exception:
+        return None
+    return result_count(text)
+
+def report_error(message):
+    """
+    Counts a recoverable error (a failed page, a retry) for the running job, if any.
+    """
+    progress = current_progress.get()
+    if progress is not None:
+        progress.error(message)
+
+async def snapshot_loop(interval=STATUS_SNAPSHOT_INTERVAL):
+    """
+    Background task started by the API servers when snapshots are enabled.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(progress_registry.write_snapshot, progress_registry.snapshot(events=True))
+        except Exception as e:
+            logging.error(f"Status snapshot failed: {e}")
@@ -0,0 +1,149 @@
+import asyncio
+import logging
+import os
+import time
+import weakref
+from contextvars import ContextVar
+from utils.metrics import timed
+
+# Configuration (override through environment variables), all in milliseconds
+READY_TIMEOUT_MS = int(os.getenv("SCOUTAI_READY_TIMEOUT_MS", "10000"))   # Ceiling for any single wait
+GROWTH_TIMEOUT_MS = int(os.getenv("SCOUTAI_GROWTH_TIMEOUT_MS", "3000"))  # How long a scroll may take to load more items
+STABLE_MS = 500         # A count is settled once it has not changed for this long
+NETWORK_IDLE_MS = 500   # Network is settled once nothing has been in flight for this long
+POLL_MS = 100
+
+# Responses that mean the site refused the scrape rather than having no listings
+BLOCK_STATUSES = {403, 429}
+CAPTCHA_SELECTOR = "iframe[src*='captcha'], .g-recaptcha, .h-captcha, #captcha, [id*='captcha' i], [class*='captcha' i]"
+
+# Signs of blocking seen during the running scrape attempt (a list, set by the
+# headless switcher); empty when the site simply had nothing to scrape
+current_block_signals = ContextVar("current_block_signals", default=None)
+
+
+def note_block(reason, signals=None):
+    """
+    Records a sign that the site is blocking the running attempt.
+    """
+    signals = signals if signals is not None else current_block_signals.get()
+    if signals is not None and reason not in signals:
+        signals.append(reason)
+
+
+class _NetworkTracker:
+    """
+    Counts in-flight requests of a page and notes blocked document loads.
+    """
+
+    def __init__(self, page):
+        self.inflight = 0
+        self.last_change = time.monotonic()
+        # Event handlers run outside the scraping task, so the list is bound here
+        self.block_signals = current_block_signals.get()
+        page.on("request", self._started)
+        page.on("requestfinished", self._ended)
+        page.on("requestfailed", self._ended)
+        page.on("response", self._response)
+
+    def _started(self, _):
+        self.inflight += 1
+        self.last_change = time.monotonic()
+
+    def _ended(self, _):
+        self.inflight = max(0, self.inflight - 1)
+        self.last_change = time.monotonic()
+
+    def _response(self, response):
+        if response.request.resource_type != "document":
+            return
+        if response.status in BLOCK_STATUSES:
+            note_block(f"HTTP {response.status}", self.block_signals)
+        elif "captcha" in response.url.lower():
+            note_block("captcha", self.block_signals)
+
+    def idle_for(self) -> float:
+        return 0.0 if self.inflight else time.monotonic() - self.last_change
+
+
+_trackers = weakref.WeakKeyDictionary()
+
+def track_network(page):
+    """
+    Starts counting requests of `page`. Called by the browser pool for every
+    page it opens, so activity started by the first click is seen as well.
+    """
+    tracker = _trackers.get(page)
+    if tracker is None:
+        tracker = _trackers[page] = _NetworkTracker(page)
+    return tracker
+
+async def _count(page, selector):
+    try:
+        return await page.locator(selector).count()
+    except Exception:
+        return 0
+
+async def wait_for_count(page, selector, above=0, timeout=READY_TIMEOUT_MS, stable_ms=STABLE_MS):
+    """
+    Waits until more than `above` elements match `selector` and the number has
+    stopped changing for `stable_ms`. Returns the final count; if nothing new
+    appears before `timeout` the current count is returned.
+    """
+    deadline = time.monotonic() + timeout / 1000
+    count = await _count(page, selector)
+    changed_at = time.monotonic()
+    while time.monotonic() < deadline:
+        await asyncio.sleep(POLL_MS / 1000)
+        current = await _count(page, selector)
+        if current != count:
+            count = current
+            changed_at = time.monotonic()
+        elif count > above and time.monotonic() - changed_at >= stable_ms / 1000:
+            return count
+    return count
+
+async def wait_for_network_idle(page, timeout=READY_TIMEOUT_MS, idle_ms=NETWORK_IDLE_MS):
+    """
+    Waits until the page has had no request in flight for `idle_ms`.
+    Returns False when `timeout` is reached first.
+    """
+    tracker = track_network(page)
+    deadline = time.monotonic() + timeout / 1000
+    while time.monotonic() < deadline:
+        if tracker.idle_for() >= idle_ms / 1000:
+            return True
+        await asyncio.sleep(POLL_MS / 1000)
+    return False
+
+async def wait_until_ready(page, selector=None, count_selector=None, network_idle=False, timeout=READY_TIMEOUT_MS):
+    """
+    Replaces fixed sleeps: returns as soon as every configured condition holds.
+
+    Args:
+        selector (str): An element matching this must be attached.
+        count_selector (str): The number of matches must have stopped changing.
+        network_idle (bool): No request may be in flight.
+        timeout (int): Ceiling in ms for the whole wait; reaching it is not an error.
+
+    Returns:
+        bool: False if the ceiling was hit before the page settled.
+    """
+    deadline = time.monotonic() + timeout / 1000
+
+    def remaining():
+        return max(0, int((deadline - time.monotonic()) * 1000))
+
+    with timed("wait"):
+        try:
+            if selector:
+                await page.wait_for_selector(selector, state="attached", timeout=remaining() or 1)
+            if count_selector:
+                await wait_for_count(page, count_selector, timeout=remaining())
+            if network_idle and not await wait_for_network_idle(page, timeout=remaining()):
+                raise asyncio.TimeoutError
+        except Exception as e:
+            logging.debug(f"Page not settled within {timeout} ms ({type(e).__name__}); continuing")
+            note_block("captcha" if await _count(page, CAPTCHA_SELECTOR) else "readiness timeout")
+            return False
+    return remaining() > 0
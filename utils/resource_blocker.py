@@ -0,0 +1,160 @@
+import contextvars
+import logging
+import os
+import re
+from urllib.parse import urlparse
+
+# Configuration (override through environment variables)
+BLOCK_RESOURCES = os.getenv("SCOUTAI_BLOCK_RESOURCES", "1") != "0"
+
+# Listing pages only need the DOM. Stylesheets stay allowed because the
+# pagination and scroll strategies rely on element visibility.
+DEFAULT_BLOCKED_TYPES = {"image", "media", "font", "beacon", "ping", "csp_report", "imageset", "texttrack"}
+DEFAULT_BLOCKED_PATTERNS = [
+    r"doubleclick\.net", r"googlesyndication\.com", r"google-analytics\.com", r"googletagmanager\.com",
+    r"googleadservices\.com", r"facebook\.(net|com)/tr", r"connect\.facebook\.net", r"hotjar\.com",
+    r"clarity\.ms", r"criteo\.(com|net)", r"taboola\.com", r"outbrain\.com", r"amazon-adsystem\.com",
+    r"moengage\.com", r"webengage\.com", r"clevertap", r"branch\.io", r"scorecardresearch\.com",
+    r"\.(png|jpe?g|gif|webp|avif|svg|ico|woff2?|ttf|otf|mp4|webm)(\?|$)",
+]
+
+# Per-domain profiles for the sites we support; anything else uses the default
+PROFILES = {
+    "housing.com": {"blocked_patterns": [r"housingcdn\.com/.*\.(jpe?g|png|webp)", r"/api/.*(recommend|tracking)"]},
+    "squareyards.com": {"blocked_patterns": [r"img\.squareyards\.com", r"/(chatbot|livechat)/"]},
+    "magicbricks.com": {"blocked_patterns": [r"img\.staticmb\.com", r"/mbtracking/"]},
+}
+
+# Rough transfer size of a blocked request, used to estimate savings
+# (a blocked request is never downloaded, so its real size is unknown).
+ESTIMATED_BYTES = {"image": 40_000, "media": 500_000, "font": 30_000, "script": 25_000, "xhr": 5_000, "fetch": 5_000}
+DEFAULT_ESTIMATED_BYTES = 2_000
+
+
+class NetworkStats:
+    """
+    Request counters for one job (or the whole process).
+    """
+
+    def __init__(self):
+        self.requests_allowed = 0
+        self.requests_blocked = 0
+        self.bytes_received = 0
+        self.bytes_saved_estimate = 0
+        self.blocked_by_type = {}
+
+    def record_blocked(self, resource_type):
+        self.requests_blocked += 1
+        self.bytes_saved_estimate += ESTIMATED_BYTES.get(resource_type, DEFAULT_ESTIMATED_BYTES)
+        self.blocked_by_type[resource_type] = self.blocked_by_type.get(resource_type, 0) + 1
+
+    def to_dict(self) -> dict:
+        return {
+            "requests_allowed": self.requests_allowed,
+            "requests_blocked": self.requests_blocked,
+            "bytes_received": self.bytes_received,
+            "bytes_saved_estimate": self.bytes_saved_estimate,
+            "blocked_by_type": dict(self.blocked_by_type),
+        }
+
+
+# Stats of the job running in the current task; set by the job queue
+current_network_stats = contextvars.ContextVar("current_network_stats", default=None)
+# Process-wide totals
+total_network_stats = NetworkStats()
+
+_compiled = {}
+
+
+def register_profile(domain, blocked_types=None, blocked_patterns=None):
+    """
+    Adds or replaces the blocking profile for `domain` (and its subdomains).
+
+    Args:
+        blocked_types (iterable): Playwright resource types to block; defaults to DEFAULT_BLOCKED_TYPES.
+        blocked_patterns (list): Extra URL regexes blocked on top of DEFAULT_BLOCKED_PATTERNS.
+    """
+    profile = {"blocked_patterns": list(blocked_patterns or [])}
+    if blocked_types is not None:
+        profile["blocked_types"] = set(blocked_types)
+    PROFILES[domain] = profile
+    _compiled.clear()
+
+def _domain_of(url):
+    host = urlparse(url).hostname or ""
+    return host[4:] if host.startswith("www.") else host
+
+def get_profile(site_url):
+    """
+    Returns (blocked_types, compiled_pattern) for the site a page is on.
+    """
+    domain = _domain_of(site_url)
+    key = next((d for d in PROFILES if domain == d or domain.endswith("." + d)), None)
+    if key not in _compiled:
+        profile = PROFILES.get(key, {})
+        patterns = DEFAULT_BLOCKED_PATTERNS + profile.get("blocked_patterns", [])
+        _compiled[key] = (
+            set(profile.get("blocked_types", DEFAULT_BLOCKED_TYPES)),
+            re.compile("|".join(f"(?:{p})" for p in patterns), re.IGNORECASE),
+        )
+    return _compiled[key]
+
+def should_block(site_url, request_url, resource_type):
+    if resource_type == "document":
+        return False
+    blocked_types, pattern = get_profile(site_url)
+    return resource_type in blocked_types or bool(pattern.search(request_url))
+
+def _site_url(request):
+    # The top-level page URL decides the profile; service-worker requests have no frame.
+    try:
+        url = request.frame.page.url
+    except Exception:
+        url = ""
+    return url if url.startswith("http") else request.url
+
+async def install_blocking(context, stats=None):
+    """
+    Intercepts every request of a browser context and aborts the ones the
+    profile of the current site blocks. Counters go to `stats` (the running
+    job's stats by default) and to the process-wide totals.
+    """
+    if not BLOCK_RESOURCES:
+        return
+    stats = stats or current_network_stats.get()
+    targets = [s for s in (stats, total_network_stats) if s is not None]
+
+    async def handle(route):
+        request = route.request
+        if should_block(_site_url(request), request.url, request.resource_type):
+            for s in targets:
+                s.record_blocked(request.resource_type)
+            try:
+                await route.abort("blockedbyclient")
+            except Exception:
+                pass
+            return
+        for s in targets:
+            s.requests_allowed += 1
+        try:
+            await route.continue_()
+        except Exception:
+            pass
+
+    def on_response(response):
+        try:
+            size = int(response.headers.get("content-length", 0))
+        except (TypeError, ValueError):
+            return
+        for s in targets:
+            s.bytes_received += size
+
+    await context.route("**/*", handle)
+    context.on("response", on_response)
+
+def log_network_stats(label, stats):
+    if stats and (stats.requests_allowed or stats.requests_blocked):
+        logging.info(
+            f"{label}: blocked {stats.requests_blocked}/{stats.requests_allowed + stats.requests_blocked} requests, "
+            f"~{stats.bytes_saved_estimate // 1024} KB saved, {stats.bytes_received // 1024} KB received"
+        )
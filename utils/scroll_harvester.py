@@ -0,0 +1,110 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from utils.readiness import GROWTH_TIMEOUT_MS, STABLE_MS, POLL_MS
+from utils.browser_extract import BROWSER_EXTRACT, TEXT_JS
+from utils.metrics import timed
+
+# Configuration (override through environment variables)
+MAX_HARVEST_SCROLLS = int(os.getenv("SCOUTAI_MAX_HARVEST_SCROLLS", "100"))  # Safety ceiling; harvesting stops on its own
+SCROLL_STEP = 3000
+
+# Installed once per document. Every card matching the selector, present now
+# or inserted later, is queued; drain() turns only the queued cards into rows
+# (with an in-page extractor) or markup, so cards a virtualized list removes
+# again are still captured.
+INSTALL_JS = """
+(selector) => {
+    const h = window.__scoutHarvest;
+    if (h && h.selector === selector) return;
+    const state = window.__scoutHarvest = {selector, pending: [], queued: new WeakSet(), keys: new Set()};
+    const add = (node) => {
+        if (!state.queued.has(node)) { state.queued.add(node); state.pending.push(node); }
+    };
+    const scan = (root) => {
+        if (root.nodeType !== 1) return;
+        if (root.matches(selector)) add(root);
+        root.querySelectorAll(selector).forEach(add);
+    };
+    scan(document.body);
+    new MutationObserver((mutations) => {
+        for (const m of mutations) m.addedNodes.forEach(scan);
+    }).observe(document.body, {childList: true, subtree: true});
+    state.drain = (extract) => {
+        const out = [];
+        for (const node of state.pending.splice(0)) {
+            const link = node.querySelector("a[href]");
+            const key = node.getAttribute("data-id") || (link && link.getAttribute("href")) || node.textContent.trim().slice(0, 200);
+            if (!key || state.keys.has(key)) continue;
+            state.keys.add(key);
+            try {
+                out.push(extract ? extract(node) : node.outerHTML);
+            } catch (e) {
+                out.push(node.outerHTML);
+            }
+        }
+        return out;
+    };
+}
+"""
+
+
+async def _wait_for_pending(page, timeout=GROWTH_TIMEOUT_MS):
+    # Until new cards are queued and their number settles, or the timeout
+    deadline = time.monotonic() + timeout / 1000
+    count, changed_at = 0, time.monotonic()
+    while time.monotonic() < deadline:
+        await asyncio.sleep(POLL_MS / 1000)
+        current = await page.evaluate("() => window.__scoutHarvest ? window.__scoutHarvest.pending.length : 0")
+        if current != count:
+            count, changed_at = current, time.monotonic()
+        elif count and time.monotonic() - changed_at >= STABLE_MS / 1000:
+            break
+    return count
+
+async def harvest_scroll(page, item_selector, on_cards, max_scrolls=MAX_HARVEST_SCROLLS, after_scroll=None, card_js=None):
+    """
+    Scrolls an infinite list and hands newly inserted cards to `on_cards` as
+    they appear, instead of serializing the whole page at the end. Stops as
+    soon as a scroll brings no new card.
+
+    Args:
+        page: Loaded Playwright page.
+        item_selector (str): CSS selector of one listing card.
+        on_cards (coroutine): Called with each batch of cards: outerHTML strings,
+            or row dicts for cards `card_js` extracted (see browser_extract.rows_from_cards).
+        max_scrolls (int): Ceiling on scrolls.
+        after_scroll (coroutine): Optional hook called with the scroll index (e.g. screenshots).
+        card_js (str): Optional in-page `(card) => row` extractor.
+
+    Returns:
+        dict: {"cards": ..., "bytes": ..., "scrolls": ...} moved out of the browser.
+    """
+    await page.evaluate(INSTALL_JS, item_selector)
+    stats = {"cards": 0, "bytes": 0, "scrolls": 0}
+    drain_js = f"() => {{ const text = {TEXT_JS}; return window.__scoutHarvest.drain({card_js}); }}" if card_js and BROWSER_EXTRACT \
+        else "() => window.__scoutHarvest.drain()"
+
+    async def drain():
+        with timed("extract" if card_js and BROWSER_EXTRACT else "content"):
+            cards = await page.evaluate(drain_js)
+        if cards:
+            stats["cards"] += len(cards)
+            stats["bytes"] += sum(len(c) if isinstance(c, str) else len(json.dumps(c)) for c in cards)
+            await on_cards(cards)
+        return len(cards)
+
+    await drain()
+    for i in range(max_scrolls):
+        await page.mouse.wheel(0, SCROLL_STEP)
+        stats["scrolls"] += 1
+        with timed("wait"):
+            await _wait_for_pending(page)
+        if after_scroll:
+            await after_scroll(i)
+        if not await drain():
+            break
+    logging.info(f"Harvested {stats['cards']} cards ({stats['bytes'] // 1024} KB) in {stats['scrolls']} scrolls")
+    return stats
@@ -1,9 +1,27 @@
-from bs4 import BeautifulSoup
+import re
+from utils.html_parser import make_soup
 from collections import Counter
 
 def get_top_classes_from_html(html, tag="div", top_n=5):
-    soup = BeautifulSoup(html, "html.parser")
+    soup = make_soup(html)
     tags = soup.find_all(tag)
     classes = [cls[0] for el in tags if el.get("class") for cls in [el.get("class")]]
     most_common = Counter(classes).most_common(top_n)
     return [f".{cls}" for cls, _ in most_common]
+
+SIMPLE_CLASS = re.compile(r"[A-Za-z_][\w-]*")
+
+def get_repeated_selectors(soup, min_count=2):
+    """
+    Groups elements by "tag.first-class" and keeps the groups that repeat at
+    least `min_count` times. Classes that are not plain CSS identifiers are skipped.
+
+    Returns:
+        dict: {"tag.class": [elements]} in document order.
+    """
+    groups = {}
+    for el in soup.find_all(True, class_=True):
+        css_class = el["class"][0]
+        if SIMPLE_CLASS.fullmatch(css_class):
+            groups.setdefault(f"{el.name}.{css_class}", []).append(el)
+    return {sel: els for sel, els in groups.items() if len(els) >= min_count}
@@ -0,0 +1,680 @@
+import csv
+import importlib.util
+import json
+import logging
+import os
+import shutil
+import time
+from contextvars import ContextVar
+from utils.dedup import DEDUP_CAPACITY, DEDUP_ROWS, RowDeduplicator, state_path_for
+from utils.metrics import timed
+
+# Configuration
+OUTPUT_FORMAT = os.getenv("SCOUTAI_OUTPUT_FORMAT", "segments")  # Default format for strategy outputs
+JOB_OUTPUT_DIR = os.getenv("SCOUTAI_JOB_OUTPUT_DIR", os.path.join("output", "jobs"))
+SEGMENT_ROWS = int(os.getenv("SCOUTAI_SEGMENT_ROWS", "50000"))  # Rows per segment file before a new one is started
+FLUSH_EVERY = 100       # Rows buffered in memory before they are written out
+FLUSH_INTERVAL = 10.0   # Seconds; a write after this long forces a flush even below FLUSH_EVERY
+MANIFEST = "manifest.json"
+
+# Id of the job running in this context (set by the job queue); its outputs get their own directory
+current_job_id = ContextVar("current_job_id", default=None)
+
+
+def output_path(name):
+    """
+    Where an output called `name` goes: the running job's directory under
+    JOB_OUTPUT_DIR, or `output/` outside a job.
+    """
+    job_id = current_job_id.get()
+    return os.path.join(JOB_OUTPUT_DIR, job_id, name) if job_id else os.path.join("output", name)
+
+def _count_lines(path):
+    with open(path, "rb") as f:
+        return sum(1 for line in f if line.strip())
+
+
+def _truncate_lines(path, keep):
+    """
+    Keeps the first `keep` lines of a text file (streaming copy); used to drop
+    rows written after the last checkpoint before a resumed run appends.
+    """
+    if not os.path.exists(path):
+        return
+    tmp = path + ".tmp"
+    dropped = 0
+    with open(path, encoding="utf-8") as src, open(tmp, "w", encoding="utf-8") as dst:
+        for i, line in enumerate(src):
+            if i < keep:
+                dst.write(line)
+            else:
+                dropped += 1
+    os.replace(tmp, path)
+    if dropped:
+        logging.info(f"Dropped {dropped} rows written after the last checkpoint → {path}")
+
+
+class RowSink:
+    """
+    Destination for scraped rows (dicts). Strategies push rows as they are
+    extracted; rows are buffered and flushed every `flush_every` rows or
+    `flush_interval` seconds, so memory stays bounded and a crash only loses
+    the unflushed tail.
+
+    Usage:
+        with open_sink("output/delhi_buy.csv") as sink:
+            sink.write_rows(rows)
+
+    Args:
+        path (str): Output file.
+        append (bool): Keep rows already in `path` (e.g. when resuming).
+        dedup (bool): Drop rows already written (see utils.dedup). When
+            resuming, rows written before the last checkpoint count as well.
+        resume_rows (int): With `append`, the row offset returned by the last
+            `checkpoint()`; rows written after it are discarded first.
+        expected_rows (int): Rough number of rows, to size the dedup filter.
+        dedup_key (str): utils.dedup.dedup_key() of the crawl. Rows seen by
+            earlier runs with the same key are dropped too, and the filter
+            is kept after close; without a key it only covers this output.
+    """
+
+    def __init__(self, path, append=False, flush_every=FLUSH_EVERY, flush_interval=FLUSH_INTERVAL, dedup=False,
+                 resume_rows=None, expected_rows=None, dedup_key=None):
+        self.path = path
+        self.append = append
+        self.resume_rows = resume_rows if append else None
+        self.dedup_key = dedup_key
+        self.dedup = RowDeduplicator(state_path_for(dedup_key or path), resume=append or dedup_key is not None,
+                                     capacity=expected_rows or DEDUP_CAPACITY) if dedup else None
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.rows_written = self.resume_rows or 0
+        self.closed = False
+        self._buffer = []
+        self._last_flush = time.monotonic()
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+
+    @property
+    def rows_dropped(self):
+        return self.dedup.dropped if self.dedup is not None else 0
+
+    def write(self, row):
+        if self.dedup is not None and self.dedup.is_duplicate(row):
+            return
+        self._buffer.append(row)
+        if len(self._buffer) >= self.flush_every or time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def write_rows(self, rows):
+        for row in rows:
+            self.write(row)
+
+    def flush(self):
+        if self._buffer:
+            self._write_batch(self._buffer)
+            self.rows_written += len(self._buffer)
+            self._buffer = []
+        self._last_flush = time.monotonic()
+
+    def checkpoint(self):
+        """
+        Flushes buffered rows to disk and saves the dedup state. Returns the
+        row offset to store with a resume cursor (see utils.checkpoints).
+        """
+        self.flush()
+        self._sync()
+        self._save_dedup()
+        return self.rows_written
+
+    def close(self):
+        """
+        Flushes remaining rows and finalizes the file. Returns the output path.
+        A keyed dedup state is saved for later runs; one tied to this output
+        is only needed for resuming, so it is removed.
+        """
+        if not self.closed:
+            self.flush()
+            self._finalize()
+            if self.dedup_key is not None:
+                self._save_dedup()
+            elif self.dedup is not None:
+                self.dedup.discard()
+            self.closed = True
+            dropped = f" ({self.rows_dropped} duplicates dropped)" if self.rows_dropped else ""
+            logging.info(f"Saved {self.rows_written} rows{dropped} → {self.path}")
+        return self.path
+
+    def __enter__(self):
+        return self
+
+    def abort(self):
+        """
+        Flushes and releases the file after a failure. Formats that need a
+        final conversion keep their intermediate state so a resumed run can
+        append to it. The dedup state is left as of the last checkpoint.
+        """
+        if not self.closed:
+            self.flush()
+            self._finalize()
+            self.closed = True
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def _save_dedup(self):
+        if self.dedup is not None:
+            try:
+                self.dedup.save()
+            except OSError as e:
+                logging.warning(f"Could not save dedup state for {self.path}: {e}")
+
+    def _write_batch(self, rows):
+        raise NotImplementedError
+
+    def _sync(self):
+        pass
+
+    def _finalize(self):
+        pass
+
+
+class JSONLSink(RowSink):
+    def __init__(self, path, **kwargs):
+        super().__init__(path, **kwargs)
+        if self.resume_rows is not None:
+            _truncate_lines(path, self.resume_rows)
+        self._fh = open(path, "a" if self.append else "w", encoding="utf-8")
+
+    def _write_batch(self, rows):
+        self._fh.writelines(json.dumps(row, ensure_ascii=False, default=str) + "\n" for row in rows)
+        self._fh.flush()
+
+    def _sync(self):
+        os.fsync(self._fh.fileno())
+
+    def _finalize(self):
+        self._fh.close()
+
+
+class CSVSink(RowSink):
+    """
+    Columns are taken from the rows as they arrive. If a later row brings a new
+    column, the header is rewritten once on close with a streaming copy.
+    """
+
+    def __init__(self, path, **kwargs):
+        super().__init__(path, **kwargs)
+        self.columns = []
+        self._header_dirty = False
+        if self.resume_rows is not None:
+            self._truncate(self.resume_rows)
+        if self.append and os.path.exists(path) and os.path.getsize(path) > 0:
+            with open(path, newline="", encoding="utf-8") as f:
+                self.columns = next(csv.reader(f), [])
+            self._fh = open(path, "a", newline="", encoding="utf-8")
+        else:
+            self._fh = open(path, "w", newline="", encoding="utf-8")
+        self._writer = csv.writer(self._fh)
+
+    def _write_batch(self, rows):
+        header_written = bool(self.columns)
+        for row in rows:
+            for key in row:
+                if key not in self.columns:
+                    self.columns.append(key)
+                    self._header_dirty = header_written
+        if not header_written:
+            self._writer.writerow(self.columns)
+        self._writer.writerows([["" if row.get(c) is None else row.get(c) for c in self.columns] for row in rows])
+        self._fh.flush()
+
+    def _sync(self):
+        os.fsync(self._fh.fileno())
+
+    def _truncate(self, keep):
+        # Header plus `keep` records; quoted fields may span lines, so go through csv
+        if not os.path.exists(self.path):
+            return
+        tmp = self.path + ".tmp"
+        with open(self.path, newline="", encoding="utf-8") as src, open(tmp, "w", newline="", encoding="utf-8") as dst:
+            writer = csv.writer(dst)
+            for i, record in enumerate(csv.reader(src)):
+                if i > keep:
+                    break
+                writer.writerow(record)
+        os.replace(tmp, self.path)
+
+    def _finalize(self):
+        self._fh.close()
+        if self._header_dirty:
+            tmp = self.path + ".tmp"
+            with open(self.path, newline="", encoding="utf-8") as src, open(tmp, "w", newline="", encoding="utf-8") as dst:
+                src.readline()
+                csv.writer(dst).writerow(self.columns)
+                shutil.copyfileobj(src, dst)
+            os.replace(tmp, self.path)
+
+
+class _SpooledSink(RowSink):
+    """
+    Base for formats that cannot be appended to in place. Rows are spooled to a
+    JSONL file next to the output and converted in two streaming passes on
+    close (collect columns, then write), so memory does not grow with row count.
+    """
+
+    def __init__(self, path, **kwargs):
+        super().__init__(path, **kwargs)
+        self.spool_path = path + ".spool.jsonl"
+        self._spool = JSONLSink(self.spool_path, append=self.append, flush_every=1, resume_rows=self.resume_rows)
+
+    def _write_batch(self, rows):
+        self._spool._write_batch(rows)
+
+    def _sync(self):
+        self._spool._sync()
+
+    def _iter_spool(self):
+        with open(self.spool_path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    def _finalize(self):
+        self._spool._finalize()
+        columns = []
+        for row in self._iter_spool():
+            for key in row:
+                if key not in columns:
+                    columns.append(key)
+        with timed("export"):
+            self._convert(columns)
+        os.remove(self.spool_path)
+
+    def abort(self):
+        if not self.closed:
+            self.flush()
+            self._spool._finalize()
+            self.closed = True
+
+    def _convert(self, columns):
+        raise NotImplementedError
+
+
+def write_xlsx(path, columns, rows):
+    """
+    Constant-memory XLSX output through openpyxl's write-only workbook.
+    """
+    from openpyxl import Workbook
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(columns)
+    for row in rows:
+        ws.append([row.get(c) for c in columns])
+    wb.save(path)
+
+def write_parquet(path, columns, rows, chunk_size=FLUSH_EVERY * 10):
+    """
+    Parquet output (all columns as strings), written in row groups of `chunk_size`.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    schema = pa.schema([(c, pa.string()) for c in columns])
+    with pq.ParquetWriter(path, schema) as writer:
+        chunk = []
+        for row in rows:
+            chunk.append({c: None if row.get(c) is None else str(row.get(c)) for c in columns})
+            if len(chunk) >= chunk_size:
+                writer.write_table(pa.Table.from_pylist(chunk, schema=schema))
+                chunk = []
+        if chunk:
+            writer.write_table(pa.Table.from_pylist(chunk, schema=schema))
+
+
+class XLSXSink(_SpooledSink):
+    def _convert(self, columns):
+        write_xlsx(self.path, columns, self._iter_spool())
+
+
+class ParquetSink(_SpooledSink):
+    """
+    Parquet output (all columns as strings). Requires pyarrow.
+    """
+
+    def __init__(self, path, **kwargs):
+        if importlib.util.find_spec("pyarrow") is None:
+            raise ImportError("Parquet output requires pyarrow. Install it using: pip install pyarrow")
+        super().__init__(path, **kwargs)
+
+    def _convert(self, columns):
+        write_parquet(self.path, columns, self._iter_spool())
+
+
+class SegmentSink(RowSink):
+    """
+    Rows go to a directory of JSONL segments of at most `segment_rows` rows,
+    described by a manifest (columns, rows per segment, complete flag).
+    Nothing already written is ever rewritten: appending continues the last
+    segment, and closing only updates the manifest. Other formats are produced
+    on demand by export_rows(), which streams the segments in order.
+    """
+
+    def __init__(self, path, segment_rows=SEGMENT_ROWS, **kwargs):
+        super().__init__(path, **kwargs)
+        self.segment_rows = segment_rows
+        if not self.append and os.path.isdir(path):
+            shutil.rmtree(path)
+        os.makedirs(path, exist_ok=True)
+        self.columns = list((read_manifest(path) or {}).get("columns", []))
+        # [file, rows] per segment, counted from disk: rows written after the
+        # last manifest update are not lost
+        self.segments = [[name, _count_lines(os.path.join(path, name))] for name in _segment_files(path)]
+        if self.resume_rows is not None:
+            self._truncate(self.resume_rows)
+        self._fh = None
+
+    def _truncate(self, keep):
+        kept, dropped = [], False
+        for name, rows in self.segments:
+            file = os.path.join(self.path, name)
+            if keep <= 0:
+                os.remove(file)
+                dropped = True
+                continue
+            if rows > keep:
+                _truncate_lines(file, keep)
+                rows, dropped = keep, True
+            kept.append([name, rows])
+            keep -= rows
+        self.segments = kept
+        if dropped:
+            # Dropped rows may have brought columns of their own
+            self.columns = read_columns(self.path, use_manifest=False)
+
+    def _next_segment(self):
+        if self._fh is not None:
+            self._fh.close()
+        if not self.segments or self.segments[-1][1] >= self.segment_rows:
+            self.segments.append([f"part-{len(self.segments):05d}.jsonl", 0])
+            self._write_manifest(complete=False)
+        self._fh = open(os.path.join(self.path, self.segments[-1][0]), "a", encoding="utf-8")
+
+    def _write_batch(self, rows):
+        for row in rows:
+            for key in row:
+                if key not in self.columns:
+                    self.columns.append(key)
+        start = 0
+        while start < len(rows):
+            if self._fh is None or self.segments[-1][1] >= self.segment_rows:
+                self._next_segment()
+            segment = self.segments[-1]
+            chunk = rows[start:start + self.segment_rows - segment[1]]
+            self._fh.writelines(json.dumps(row, ensure_ascii=False, default=str) + "\n" for row in chunk)
+            segment[1] += len(chunk)
+            start += len(chunk)
+        self._fh.flush()
+
+    def _write_manifest(self, complete):
+        manifest = {
+            "format": "segments",
+            "columns": self.columns,
+            "rows": sum(rows for _, rows in self.segments),
+            "segments": [{"file": name, "rows": rows} for name, rows in self.segments],
+            "complete": complete,
+            "updated_at": int(time.time()),
+        }
+        tmp = os.path.join(self.path, MANIFEST + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp, os.path.join(self.path, MANIFEST))
+
+    def _sync(self):
+        if self._fh is not None:
+            os.fsync(self._fh.fileno())
+        self._write_manifest(complete=False)
+
+    def _finalize(self):
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+        self._write_manifest(complete=True)
+
+    def abort(self):
+        if not self.closed:
+            self.flush()
+            if self._fh is not None:
+                self._fh.close()
+                self._fh = None
+            self._write_manifest(complete=False)
+            self.closed = True
+
+
+SINKS = {
+    "csv": CSVSink,
+    "jsonl": JSONLSink,
+    "parquet": ParquetSink,
+    "segments": SegmentSink,
+    "xlsx": XLSXSink,
+}
+
+
+# Generation of each output opened in this process, with the rows it kept:
+# bumped whenever a sink recreates or truncates the output, so a RowTail
+# following it knows to start over
+_generations = {}
+
+def output_generation(path):
+    """
+    (generation, rows kept) of the output; (0, 0) if no sink reopened it.
+    """
+    return _generations.get(os.path.abspath(path), (0, 0))
+
+def open_sink(path, fmt=None, dedup=DEDUP_ROWS, **kwargs):
+    """
+    Opens a sink for `path`. The format comes from `fmt` or the file extension.
+    Duplicate rows are dropped unless `dedup` is off (SCOUTAI_DEDUP=0).
+    """
+    fmt = (fmt or os.path.splitext(path)[1].lstrip(".")).lower()
+    if fmt not in SINKS:
+        raise ValueError(f"Unsupported output format: {fmt}. Choose one of {list(SINKS)}")
+    sink = SINKS[fmt](path, dedup=dedup, **kwargs)
+    if not sink.append or sink.resume_rows is not None:
+        # Recreated, or truncated to the checkpoint: readers must start over
+        generation = output_generation(path)[0] + 1
+        _generations[os.path.abspath(path)] = (generation, sink.resume_rows or 0)
+    return sink
+
+
+# ========== Reading and export ==========
+
+def _segment_files(path):
+    return sorted(name for name in os.listdir(path) if name.startswith("part-") and name.endswith(".jsonl"))
+
+def read_manifest(path):
+    """
+    The manifest of a segments directory, or None for other outputs.
+    """
+    try:
+        with open(os.path.join(path, MANIFEST), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def output_format(path):
+    return "segments" if os.path.isdir(path) else os.path.splitext(path)[1].lstrip(".").lower()
+
+def read_rows(path):
+    """
+    Streams the rows of a stored output (any format open_sink writes) as dicts.
+    """
+    fmt = output_format(path)
+    if fmt == "segments":
+        for name in _segment_files(path):
+            yield from read_rows(os.path.join(path, name))
+    elif fmt == "jsonl":
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    elif fmt == "csv":
+        with open(path, newline="", encoding="utf-8") as f:
+            yield from csv.DictReader(f)
+    elif fmt == "xlsx":
+        from openpyxl import load_workbook
+        wb = load_workbook(path, read_only=True)
+        try:
+            rows = wb.active.iter_rows(values_only=True)
+            columns = next(rows, ())
+            for values in rows:
+                yield {c: v for c, v in zip(columns, values) if v is not None}
+        finally:
+            wb.close()
+    elif fmt == "parquet":
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches():
+            for row in batch.to_pylist():
+                yield {c: v for c, v in row.items() if v is not None}
+    else:
+        raise ValueError(f"Unsupported output format: {fmt}. Choose one of {list(SINKS)}")
+
+def read_columns(path, use_manifest=True):
+    """
+    Column names of a stored output, in first-seen order.
+    """
+    manifest = read_manifest(path) if use_manifest and os.path.isdir(path) else None
+    if manifest and manifest.get("columns"):
+        return manifest["columns"]
+    columns = []
+    for row in read_rows(path):
+        for key in row:
+            if key not in columns:
+                columns.append(key)
+    return columns
+
+def export_rows(source, dest, fmt=None):
+    """
+    Converts a stored output to `dest` in one streaming pass over the rows
+    (two when the columns are not known up front). This is where XLSX and
+    Parquet files are produced from segment outputs. Segments exported as
+    JSONL are concatenated byte for byte.
+
+    Returns:
+        str: `dest`.
+    """
+    fmt = (fmt or os.path.splitext(dest)[1].lstrip(".")).lower()
+    folder = os.path.dirname(dest)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    with timed("export"):
+        if fmt == "jsonl" and output_format(source) == "segments":
+            with open(dest, "wb") as dst:
+                for name in _segment_files(source):
+                    with open(os.path.join(source, name), "rb") as src:
+                        shutil.copyfileobj(src, dst)
+        elif fmt == "xlsx":
+            write_xlsx(dest, read_columns(source), read_rows(source))
+        elif fmt == "parquet":
+            write_parquet(dest, read_columns(source), read_rows(source))
+        else:
+            with open_sink(dest, fmt=fmt, dedup=False) as sink:
+                sink.write_rows(read_rows(source))
+    logging.info(f"Exported {source} → {dest}")
+    return dest
+
+class RowTail:
+    """
+    Incremental reader over an output that may still be written to. Each
+    read() returns the complete rows appended since the previous call,
+    starting at row `offset`. Segment and JSONL outputs are followed while
+    they grow (a half-written last line is left for the next call); other
+    formats can only be read once the output is `complete`.
+
+    When a sink recreates or truncates the output (see output_generation),
+    or a file shrinks under the reader, reading starts over: at the same
+    offset if those rows were kept, else at the last kept row. `reset_to`
+    then holds the new offset until the caller clears it.
+    """
+
+    def __init__(self, path, offset=0):
+        self.path = path
+        self.reset_to = None
+        self._generation = output_generation(path)[0]
+        self._restart(offset)
+
+    def _restart(self, offset):
+        self.offset = offset
+        self._skip = offset
+        self._index = 0
+        self._pos = 0
+        self._rows = None  # read_rows() iterator for formats that cannot be followed
+
+    def _check_generation(self):
+        generation, kept = output_generation(self.path)
+        if generation != self._generation:
+            self._generation = generation
+            offset = min(self.offset, kept)
+            if offset != self.offset:
+                self.reset_to = offset
+            self._restart(offset)
+
+    def _files(self):
+        fmt = output_format(self.path)
+        if fmt == "segments":
+            return [os.path.join(self.path, name) for name in _segment_files(self.path)] if os.path.isdir(self.path) else []
+        return [self.path] if os.path.exists(self.path) else []
+
+    def read(self, limit=FLUSH_EVERY, complete=False):
+        self._check_generation()
+        if output_format(self.path) not in ("segments", "jsonl"):
+            return self._read_finished(limit, complete)
+        rows = []
+        while len(rows) < limit:
+            files = self._files()
+            if self._index >= len(files):
+                break
+            with open(files[self._index], "rb") as f:
+                if os.fstat(f.fileno()).st_size < self._pos:
+                    # Truncated by a writer this process does not know about
+                    self.reset_to = 0
+                    self._restart(0)
+                    rows = []
+                    continue
+                f.seek(self._pos)
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break
+                    self._pos += len(line)
+                    if not line.strip():
+                        continue
+                    if self._skip:
+                        self._skip -= 1
+                        continue
+                    rows.append(json.loads(line))
+                    if len(rows) >= limit:
+                        break
+            if len(rows) >= limit or self._index + 1 >= len(files):
+                break
+            self._index, self._pos = self._index + 1, 0  # later segments exist, so this one is full
+        self.offset += len(rows)
+        return rows
+
+    def _read_finished(self, limit, complete):
+        if self._rows is None:
+            if not complete or not os.path.exists(self.path):
+                return []
+            self._rows = read_rows(self.path)
+        rows = []
+        for row in self._rows:
+            if self._skip:
+                self._skip -= 1
+                continue
+            rows.append(row)
+            if len(rows) >= limit:
+                break
+        self.offset += len(rows)
+        return rows
@@ -0,0 +1,257 @@
+import json
+import logging
+import os
+import re
+import statistics
+import threading
+import time
+from urllib.parse import urljoin, urlparse
+from utils.html_parser import make_soup, class_strainer, SoupStrainer
+from utils.selector_helpers import get_repeated_selectors, SIMPLE_CLASS
+from utils.extract_pool import run_extractor
+from utils.block_extractor import extract_content_blocks
+from utils.browser_extract import BROWSER_EXTRACT, page_rows_js
+from utils.metrics import timed
+
+# Configuration (override through environment variables)
+TEMPLATE_FILE = os.getenv("SCOUTAI_TEMPLATE_FILE", os.path.join(".cache", "extraction_templates.json"))
+MIN_CARDS = 4          # A container must repeat at least this often to be a listing card
+FIELD_SUPPORT = 0.6    # Share of cards a sub-selector must appear in to become a field
+MAX_FIELDS = 12
+MAX_CARD_TEXT = 600    # Longer cards stop scoring higher (page sections are not cards)
+RELEARN_AFTER = 60 * 60 * 24  # Seconds before a domain where learning failed is tried again
+MAX_CANDIDATES = 5     # Containers tried, best first, until one yields fields
+CHROME_PENALTY = 0.1   # Score factor for containers inside nav/header/footer
+
+SITE_CHROME = {"nav", "header", "footer"}
+
+SKIP_TAGS = {"script", "style", "noscript", "template", "svg", "head", "iframe", "select", "option"}
+HEADINGS = ["h1", "h2", "h3", "h4"]
+
+_lock = threading.Lock()
+_templates = None
+
+
+def _text(el):
+    return el.get_text(" ", strip=True)
+
+def _field_name(css_class, taken):
+    # "mb-srp__card__price--size" -> "Price Size"
+    words = [w for w in re.split(r"[_\-]+", css_class) if w and not w.isdigit()]
+    name = " ".join(words[-2:]).title() if len(words) > 1 and len(words[-1]) < 4 else (words[-1].title() if words else css_class)
+    base, i = name, 2
+    while name in taken:
+        name, i = f"{base} {i}", i + 1
+    return name
+
+def _in_chrome(el):
+    return any(parent.name in SITE_CHROME for parent in el.parents)
+
+def _rank_containers(soup):
+    """
+    Repeating elements that carry a link in most occurrences, best first: most
+    text per occurrence (capped) times occurrences, with elements inside
+    nav/header/footer scored down. Ties go to the outermost element.
+    """
+    ranked = []
+    for selector, elements in get_repeated_selectors(soup, min_count=MIN_CARDS).items():
+        lengths = [len(_text(el)) for el in elements]
+        median = statistics.median(lengths)
+        if median < 20:
+            continue
+        linked = sum(1 for el in elements if el.find("a", href=True)) / len(elements)
+        if linked < 0.5:
+            continue
+        depth = len(list(elements[0].parents))
+        score = len(elements) * min(median, MAX_CARD_TEXT)
+        if sum(1 for el in elements if _in_chrome(el)) * 2 > len(elements):
+            score *= CHROME_PENALTY
+        ranked.append(((score, -depth), selector))
+    ranked.sort(reverse=True)
+    return [selector for _, selector in ranked]
+
+def _infer_fields(cards):
+    """
+    {name: css} of the sub-selectors present in most cards whose text varies
+    between cards; empty when there are none.
+    """
+    card_texts = [_text(card) for card in cards]
+
+    # selector -> texts seen in each card (first match per card), in document order
+    seen = {}
+    for card in cards:
+        found = {}
+        for heading in HEADINGS:
+            el = card.find(heading)
+            if el is not None:
+                found.setdefault(heading, _text(el))
+                break
+        for el in card.find_all(True, class_=True):
+            css_class = el["class"][0]
+            if el.name in SKIP_TAGS or not SIMPLE_CLASS.fullmatch(css_class):
+                continue
+            found.setdefault(f"{el.name}.{css_class}", _text(el))
+        for selector, text in found.items():
+            seen.setdefault(selector, []).append(text)
+
+    fields, taken_texts = {}, set()
+    for selector, texts in seen.items():
+        non_empty = [t for t in texts if t]
+        if len(non_empty) < FIELD_SUPPORT * len(cards) or len(set(non_empty)) < 2:
+            continue  # rare, empty, or a constant label like "Contact"
+        if sum(1 for t, card_text in zip(texts, card_texts) if t == card_text) * 2 > len(cards):
+            continue  # a wrapper holding the whole card
+        signature = tuple(texts)
+        if signature in taken_texts:
+            continue  # same text as a field we already have (nested wrapper)
+        taken_texts.add(signature)
+        name = "Title" if selector in HEADINGS and "Title" not in fields else _field_name(selector.split(".", 1)[-1], fields)
+        fields[name] = selector
+        if len(fields) >= MAX_FIELDS:
+            break
+    return fields
+
+def learn_template(html):
+    """
+    Finds the repeating listing-card container on a page and the sub-selectors
+    present in most cards, whose text differs between cards. Candidates are
+    tried best first until one yields fields.
+
+    Returns:
+        dict | None: {"container": css, "fields": {name: css}} or None when no
+        repeating card structure was found.
+    """
+    soup = make_soup(html)
+    for tag in soup.find_all(SKIP_TAGS):
+        tag.decompose()
+
+    for container in _rank_containers(soup)[:MAX_CANDIDATES]:
+        fields = _infer_fields(soup.select(container))
+        if fields:
+            return {"container": container, "fields": fields}
+    return None
+
+def _split(selector):
+    # "div.price" -> ("div", {"class_": "price"}); "h2" -> ("h2", {})
+    tag, _, css_class = selector.partition(".")
+    return tag, {"class_": css_class} if css_class else {}
+
+def apply_template(html, template, base_url=None):
+    """
+    Extracts one row per card with targeted finds; only the card subtrees
+    are parsed.
+
+    Returns:
+        list[dict]: {"Link": ..., <field>: ...} rows.
+    """
+    tag, attrs = _split(template["container"])
+    soup = make_soup(html, only=class_strainer(tag, attrs["class_"]) if attrs else SoupStrainer(tag))
+    fields = [(name, *_split(selector)) for name, selector in template["fields"].items()]
+
+    rows = []
+    for card in soup.find_all(tag, **attrs):
+        link = card.find("a", href=True)
+        row = {"Link": urljoin(base_url or "", link["href"]) if link else ""}
+        for name, field_tag, field_attrs in fields:
+            el = card.find(field_tag, **field_attrs)
+            row[name] = _text(el) if el is not None else ""
+        rows.append(row)
+    return rows
+
+def template_card_js(template):
+    """
+    In-page version of apply_template for one card.
+    """
+    fields = json.dumps(list(template["fields"].items()))
+    return f"""
+(card) => {{
+    const link = card.querySelector("a[href]");
+    const row = {{Link: link ? new URL(link.getAttribute("href"), document.baseURI).href : ""}};
+    for (const [name, selector] of {fields}) row[name] = text(card.querySelector(selector), " ");
+    return row;
+}}
+"""
+
+# ========== Per-domain store ==========
+
+def _domain_of(url):
+    host = urlparse(url).hostname or ""
+    return host[4:] if host.startswith("www.") else host
+
+def _load():
+    global _templates
+    if _templates is None:
+        try:
+            with open(TEMPLATE_FILE, "r", encoding="utf-8") as f:
+                _templates = json.load(f)
+        except (OSError, ValueError):
+            _templates = {}
+    return _templates
+
+def get_template(url):
+    """
+    Returns the stored template for the URL's domain. A template without a
+    container records a failed attempt to learn one.
+    """
+    with _lock:
+        return _load().get(_domain_of(url))
+
+def save_template(url, template):
+    with _lock:
+        _load()[_domain_of(url)] = {**(template or {"container": None}), "learned_at": int(time.time())}
+        try:
+            folder = os.path.dirname(TEMPLATE_FILE)
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+            tmp = f"{TEMPLATE_FILE}.{os.getpid()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(_templates, f, indent=2)
+            os.replace(tmp, TEMPLATE_FILE)
+        except OSError as e:
+            logging.warning(f"Could not persist extraction template: {e}")
+
+async def extract_listing_rows(url, html):
+    """
+    Structured rows for sites without a hand-written extractor.
+
+    Uses the domain's cached template; when there is none, or it stopped
+    matching, a new one is learned from this page and stored. Pages where no
+    card structure can be found fall back to generic content blocks.
+    """
+    template = known = get_template(url)
+    if template and template.get("container"):
+        rows = await run_extractor(apply_template, html, template, url)
+        if rows:
+            return rows
+        logging.info(f"Extraction template for {_domain_of(url)} no longer matches; relearning")
+    elif template and time.time() - template.get("learned_at", 0) < RELEARN_AFTER:
+        return await run_extractor(extract_content_blocks, html)
+
+    template = await run_extractor(learn_template, html)
+    rows = await run_extractor(apply_template, html, template, url) if template else []
+    if rows or not (known and known.get("container")):
+        save_template(url, template if rows else None)
+    if rows:
+        logging.info(f"Learned extraction template for {_domain_of(url)}: {template['container']} "
+                     f"with fields {list(template['fields'])}")
+        return rows
+    return await run_extractor(extract_content_blocks, html)
+
+async def extract_page_rows(page, url):
+    """
+    extract_listing_rows for a loaded page. With a known template the rows are
+    extracted inside the page, so the DOM is never serialized; otherwise the
+    HTML goes through the Python path (which can also learn a template).
+    """
+    template = get_template(url)
+    if BROWSER_EXTRACT and template and template.get("container"):
+        try:
+            with timed("extract"):
+                rows = await page.evaluate(page_rows_js(template["container"], template_card_js(template)))
+            if rows:
+                return rows
+        except Exception as e:
+            logging.warning(f"In-page extraction failed, parsing HTML instead: {e}")
+    with timed("content"):
+        html = await page.content()
+    return await extract_listing_rows(url, html)